@@ -11,7 +11,13 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 # Carga pipeline de tu MVP
-from app.pipeline import analyze_clause
+from app.pipeline import analyze_clause, stage_info
+
+# Backend de recuperación (para /health)
+try:
+    from lex_domus.retriever import backend_info
+except Exception:
+    backend_info = None
 
 # Opcional: MCP health si está presente
 try:
@@ -50,9 +56,18 @@ def health():
         "indices": {
             "chunks": (ROOT / "data" / "docs_chunks" / "chunks.jsonl").exists(),
             "faiss": (ROOT / "indices" / "faiss.index").exists(),
-            "bm25": (ROOT / "indices" / "bm25.pkl").exists(),
+            "bm25": (ROOT / "indices" / "bm25" / "segments.json").exists(),
         },
     }
+    if backend_info is not None:
+        try:
+            data["retrieval"] = backend_info()
+        except Exception as e:
+            data["retrieval"] = {"backend": "error", "error": f"{type(e).__name__}: {e}"}
+    try:
+        data["pipeline"] = stage_info()
+    except Exception as e:
+        data["pipeline"] = {"error": f"{type(e).__name__}: {e}"}
     if HAS_MCP:
         try:
             data["mcp_corpus"] = mcp_health("corpus")
@@ -1,288 +1,550 @@
 # app/pipeline.py — robusto para firmas variadas (SRA, flags, alt, EEE) y entornos Streamlit/Actions
+"""
+AnalysisEngine orquesta el análisis de una cláusula:
+Inquiry -> RAG -> Flags -> Gate -> Opinión -> Alternativa -> EEE.
+
+Las etapas (imports opcionales con fallbacks seguros) se resuelven una vez,
+al construir el motor, cada una en un StageAdapter (app.stages) que fija su
+forma de llamada por firma y cuenta sus errores (stage_info()). La política
+se carga una vez y solo se relee si cambia policies/policy.yaml. analyze_clause() usa un motor de módulo
+compartido; scripts/bench_pipeline.py mide la sobrecarga fija por petición.
+
+La evidencia de los nodos de plantilla (preguntas y encaje_ref) la precalcula
+scripts/build_index.py (lex_domus.evidence); mientras sus huellas de corpus,
+refs.json, versión de índice, plantilla y política coincidan con las vigentes
+se sirve sin recuperar nada.
+
+Caché de resultados (opcional, LEXDOMUS_RESULT_CACHE > 0): el análisis completo
+se memoiza por contenido (app.result_cache) con la clave cláusula normalizada
++ jurisdicción + motor + versión (política, corpus, refs.json, índice,
+plantilla); la respuesta lleva "cache": {"status": "hit"|"miss"|"off", ...}.
+"""
 from pathlib import Path
-import sys, os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import copy, hashlib, json, sys, os, threading
 
 # Asegura que la raíz del repo esté en sys.path
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-def analyze_clause(clause: str, jurisdiction: str):
-    """
-    Orquesta el análisis: Inquiry -> RAG -> Flags -> Gate -> Opinión -> Alternativa -> EEE.
-    Imports perezosos y dispatchers para soportar firmas distintas.
-    """
-    # --- Imports perezosos + fallbacks seguros ---
-    try:
-        from verdiktia.inquiry_engine import decompose_clause
-    except Exception:
-        decompose_clause = None
+from app.stages import StageAdapter
+from app.result_cache import ResultCache, clause_key
+
+try:
+    from lex_domus.evidence import EVIDENCE, INDEX_VERSION, REFS, NodeEvidence, fingerprint, policy_sha, refs_sha
+except Exception:
+    EVIDENCE, INDEX_VERSION, REFS, NodeEvidence, fingerprint, policy_sha, refs_sha = (None,) * 7
+
+POLICY_PATH = ROOT / "policies" / "policy.yaml"
+
+# Hilos del pool de recuperación por nodo del motor de módulo
+NODE_WORKERS = int(os.getenv("LEXDOMUS_NODE_WORKERS", "4"))
+
+# Caché de resultados: entradas en memoria (0 = desactivada), SQLite del nivel de
+# disco ("" = solo memoria), caducidad en segundos y filas máximas en disco
+RESULT_CACHE = int(os.getenv("LEXDOMUS_RESULT_CACHE", "0"))
+RESULT_CACHE_DB = os.getenv("LEXDOMUS_RESULT_CACHE_DB", str(ROOT / "data" / "cache" / "results.sqlite"))
+RESULT_CACHE_TTL = float(os.getenv("LEXDOMUS_RESULT_CACHE_TTL", "86400"))
+RESULT_CACHE_ROWS = int(os.getenv("LEXDOMUS_RESULT_CACHE_ROWS", "10000"))
+
+DEFAULT_POLICY = {
+    "sources": {"allowed": ["BOE", "EUR-Lex", "WIPO", "USC"]},
+    "privacy": {"block_biometrics": True},
+}
 
-    # RAG + Policy
+
+def _resolve(module: str, name: str) -> Optional[Callable]:
+    """Import perezoso y opcional: la función, o None si el módulo no está disponible."""
     try:
-        from lex_domus.rag_pipeline import (
-            source_required_answer as _sra_real,
-            load_policy as _load_policy_real,
-        )
+        mod = __import__(module, fromlist=[name])
+        return getattr(mod, name)
     except Exception:
-        _sra_real = None
-        _load_policy_real = None
+        return None
+
 
-    # Flags + alternativa (firmas variables según repo)
+# --- Fallbacks seguros (etapa no disponible) ---
+
+def _safe_load_policy() -> Dict[str, Any]:
     try:
-        from lex_domus.flagger import detect_flags as _df_real, propose_alternative as _pa_real
+        import yaml  # type: ignore
+        if POLICY_PATH.exists():
+            return yaml.safe_load(POLICY_PATH.read_text(encoding="utf-8"))
     except Exception:
-        _df_real = None
-        _pa_real = None
+        pass
+    return dict(DEFAULT_POLICY)
 
-    # EEE (scoring) — firma variable
+def _safe_sra(question: str, jurisdiction: str = "", policy: Optional[dict] = None, **_ctx):
     try:
-        from metrics_eee.scorer import score_eee as _eee_real
+        from lex_domus.retriever import retrieve_candidates  # type: ignore
+        cands = retrieve_candidates(question, k=6) or []
     except Exception:
-        _eee_real = None
+        cands = []
+    status = "OK" if cands else "NO_EVIDENCE"
+    return {"status": status, "citations": cands}
+
+def _safe_detect_flags(**_ctx):
+    return []
+
+def _safe_propose_alt(**_ctx):
+    return ""
+
+def _safe_eee(**_ctx):
+    return {"T": 0.0, "J": 0.0, "P": 0.0}
+
+def _default_nodes(clause: str = "", jurisdiction: str = "", **_ctx):
+    return [{"title": "Cláusula", "question": "Validez y alcance", "jurisdiction": jurisdiction}]
+
+def _no_log(**_ctx):
+    return None
+
+def _none(**_ctx):
+    return None
+
+def _mock_opinion(_clause, _jur, _per_node, _flags):
+    return {
+        "analysis_md": "*LLM no disponible (modo MOCK)*",
+        "pros": [],
+        "cons": [],
+        "devils_advocate": {},
+    }
+
+
+# --- Normalizadores/dispatchers ---
 
-    # Logging de trazabilidad (opcional)
+def _normalize_retrieval(ret):
+    if ret is None:
+        return {"status": "NO_EVIDENCE", "citations": []}
+    if isinstance(ret, list):
+        return {"status": "OK" if ret else "NO_EVIDENCE", "citations": ret}
+    if isinstance(ret, dict):
+        status = ret.get("status")
+        cits = ret.get("citations")
+        if isinstance(cits, list) and status:
+            return {"status": status, "citations": cits}
+        if "results" in ret and isinstance(ret["results"], list):
+            return {"status": "OK" if ret["results"] else "NO_EVIDENCE", "citations": ret["results"]}
+        inferred = ret.get("items") or ret.get("data") or []
+        if not isinstance(inferred, list):
+            inferred = []
+        st = status or ("OK" if inferred else "NO_EVIDENCE")
+        return {"status": st, "citations": inferred}
+    return {"status": "NO_EVIDENCE", "citations": []}
+
+def _normalize_eee(ret):
+    # Devuelve dict con T, J, P (floats)
+    if isinstance(ret, dict):
+        T = float(ret.get("T", 0) or 0)
+        J = float(ret.get("J", 0) or 0)
+        P = float(ret.get("P", 0) or 0)
+        return {"T": T, "J": J, "P": P}
+    if isinstance(ret, (list, tuple)) and len(ret) >= 3:
+        try:
+            return {"T": float(ret[0]), "J": float(ret[1]), "P": float(ret[2])}
+        except Exception:
+            return {"T": 0.0, "J": 0.0, "P": 0.0}
+    if isinstance(ret, (int, float)):
+        v = float(ret)
+        return {"T": v, "J": v, "P": v}
+    return {"T": 0.0, "J": 0.0, "P": 0.0}
+
+def _normalize_batch(rets):
+    if not isinstance(rets, list):
+        raise TypeError(f"lote de respuestas no es una lista: {type(rets).__name__}")
+    return [_normalize_retrieval(r) for r in rets]
+
+def _normalize_nodes(nodes):
+    if not isinstance(nodes, list):
+        raise TypeError(f"descomposición no es una lista: {type(nodes).__name__}")
+    return nodes
+
+# Formas de llamada aceptadas por etapa, en orden de preferencia (ver app.stages)
+SHAPES = {
+    "inquiry": [
+        (("clause", "jurisdiction"), ()),
+        (("clause",), ()),
+    ],
+    "sra": [
+        (("question",), (("jurisdiction", "jurisdiction"), ("policy", "policy"))),
+        (("question", "jurisdiction", "policy"), ()),
+        (("question",), (("policy", "policy"),)),
+        (("question", "policy"), ()),
+        (("question",), ()),
+    ],
+    "sra_many": [
+        (("questions",), (("jurisdiction", "jurisdiction"), ("policy", "policy"))),
+    ],
+    "pinpoint": [
+        (("ref",), (("jurisdiction", "jurisdiction"), ("policy", "policy"))),
+    ],
+    "flags": [
+        (("clause", "jurisdiction", "per_node"), ()),
+        (("clause", "jurisdiction"), ()),
+        (("clause", "per_node"), ()),
+        (("clause",), ()),
+        ((), (("text", "clause"), ("jurisdiction", "jurisdiction"), ("per_node", "per_node"))),
+    ],
+    "alternative": [
+        (("clause", "jurisdiction", "flags"), ()),
+        (("clause", "flags"), ()),
+        (("clause", "jurisdiction"), ()),
+        (("clause",), ()),
+        ((), (("text", "clause"), ("jurisdiction", "jurisdiction"), ("flags", "flags"))),
+    ],
+    "eee": [
+        ((), (("per_node", "per_node"), ("flags", "flags"), ("gate", "gate"))),
+        (("per_node", "flags", "gate"), ()),
+        (("per_node", "flags"), ()),
+        (("per_node",), ()),
+        (("analysis",), ()),
+        ((), ()),
+    ],
+    "log": [
+        ((), (("clause", "clause"), ("jurisdiction", "jurisdiction"), ("result", "result"))),
+    ],
+}
+
+
+def _stat_key(path: Path) -> Tuple[int, int]:
     try:
-        from metrics_eee.logger import append_log
-    except Exception:
-        def append_log(**_kwargs): return None
+        st = path.stat()
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return 0, -1
+
 
-    # Redacción LLM (o MOCK)
+def _default_result_cache() -> Optional[ResultCache]:
+    if RESULT_CACHE <= 0:
+        return None
     try:
-        from app.writer_llm import draft_opinion_llm
-    except Exception:
-        def draft_opinion_llm(_clause, _jur, _per_node, _flags):
-            return {
-                "analysis_md": "*LLM no disponible (modo MOCK)*",
-                "pros": [],
-                "cons": [],
-                "devils_advocate": {},
-            }
-
-    # --- Helpers: load_policy & fallbacks SRA/flags/alt/EEE ---
-    def _safe_load_policy():
-        if _load_policy_real:
-            try:
-                return _load_policy_real()
-            except Exception:
-                pass
+        return ResultCache(RESULT_CACHE, Path(RESULT_CACHE_DB) if RESULT_CACHE_DB else None,
+                           ttl=RESULT_CACHE_TTL, max_rows=RESULT_CACHE_ROWS)
+    except Exception as e:  # disco no disponible: solo memoria
+        print(f"[pipeline] caché de resultados sin disco ({type(e).__name__}: {e})")
+        return ResultCache(RESULT_CACHE, None, ttl=RESULT_CACHE_TTL)
+
+
+def _stage(name: str, module: str, fn: str, fallback: Callable[..., Any],
+           normalize: Callable[[Any], Any] = lambda r: r) -> StageAdapter:
+    return StageAdapter(name, _resolve(module, fn), SHAPES[name], fallback, normalize)
+
+
+class AnalysisEngine:
+    """
+    Etapas del análisis resueltas una sola vez (imports opcionales con
+    fallbacks seguros) y política cargada una vez. analyze() solo ejecuta.
+    """
+
+    def __init__(self, node_workers: Optional[int] = None, result_cache: Optional[ResultCache] = None):
+        # Caché de resultados completos (None = desactivada; por defecto según LEXDOMUS_RESULT_CACHE)
+        self.result_cache = result_cache if result_cache is not None else _default_result_cache()
+        # Hilos para la recuperación por nodo (pinpoint y SRA sin lotes); <= 1 = secuencial
+        self.node_workers = NODE_WORKERS if node_workers is None else node_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Política (la carga no es una etapa: sin contadores)
+        self.load_policy = _resolve("lex_domus.rag_pipeline", "load_policy")
+        # Etapas con firma variable según repo: forma de llamada elegida aquí, una vez
+        self.stages: Dict[str, StageAdapter] = {
+            "inquiry": _stage("inquiry", "verdiktia.inquiry_engine", "decompose_clause", _default_nodes, _normalize_nodes),
+            "pinpoint": _stage("pinpoint", "lex_domus.rag_pipeline", "pinpoint_answer", _none, _normalize_retrieval),
+            "sra_many": _stage("sra_many", "lex_domus.rag_pipeline", "source_required_answer_many", _none, _normalize_batch),
+            "sra": _stage("sra", "lex_domus.rag_pipeline", "source_required_answer",
+                         lambda **ctx: _normalize_retrieval(_safe_sra(**ctx)), _normalize_retrieval),
+            "flags": _stage("flags", "lex_domus.flagger", "detect_flags", _safe_detect_flags, lambda r: r or []),
+            "alternative": _stage("alternative", "lex_domus.flagger", "propose_alternative", _safe_propose_alt,
+                                 lambda r: r or ""),
+            "eee": _stage("eee", "metrics_eee.scorer", "score_eee", _safe_eee, _normalize_eee),
+            "log": _stage("log", "metrics_eee.logger", "append_log", _no_log),
+        }
+        # Redacción LLM (o MOCK): firma fija, sus errores se propagan como antes
+        self.draft_opinion = _resolve("app.writer_llm", "draft_opinion_llm") or _mock_opinion
+
+        self._lock = threading.Lock()
+        self._policy: Optional[Dict[str, Any]] = None
+        self._policy_key: Optional[Tuple[int, int]] = None
+
+        # Evidencia precalculada: huella de la plantilla (fija en el proceso) y versión del corpus
+        templates_sha = _resolve("verdiktia.inquiry_engine", "templates_sha")
         try:
-            import yaml  # type: ignore
-            policy_path = ROOT / "policies" / "policy.yaml"
-            if policy_path.exists():
-                return yaml.safe_load(policy_path.read_text(encoding="utf-8"))
+            self.templates_sha = templates_sha() if templates_sha else ""
         except Exception:
-            pass
-        return {
-            "sources": {"allowed": ["BOE", "EUR-Lex", "WIPO", "USC"]},
-            "privacy": {"block_biometrics": True},
+            self.templates_sha = ""
+        self.corpus_version = _resolve("lex_domus.retriever", "corpus_version")
+        self.evidence_path = EVIDENCE
+        self.refs_path = REFS
+        self._evidence: Optional[Any] = None
+        self._evidence_key: Optional[Tuple[Any, Tuple[int, int]]] = None
+        self.evidence_hits = 0
+
+    @property
+    def policy(self) -> Dict[str, Any]:
+        """Política vigente: se relee solo si policies/policy.yaml cambió (stat)."""
+        key = _stat_key(POLICY_PATH)
+        if self._policy is None or key != self._policy_key:
+            with self._lock:
+                if self._policy is None or key != self._policy_key:
+                    self._policy = self._read_policy()
+                    self._policy_key = key
+        return self._policy
+
+    def stage_info(self) -> Dict[str, Dict[str, Any]]:
+        """Por etapa: adaptador elegido (implementación + forma de llamada) y contadores."""
+        info = {name: st.info() for name, st in self.stages.items()}
+        table = self.evidence(self.policy)
+        info["evidence"] = {
+            "path": str(self.evidence_path) if self.evidence_path else None,
+            "valid": table is not None,
+            "entries": len(table) if table is not None else 0,
+            "hits": self.evidence_hits,
         }
+        info["result_cache"] = self.result_cache.info() if self.result_cache is not None else {"enabled": False}
+        return info
 
-    def _safe_sra(question: str, jurisdiction: str, policy: dict):
+    def cache_version(self, policy: Dict[str, Any]) -> str:
+        """
+        Versión de lo que determina un resultado además de la entrada: política,
+        corpus, refs.json, versiones de analizador/índice y plantilla.
+        """
         try:
-            from lex_domus.retriever import retrieve_candidates  # type: ignore
-            cands = retrieve_candidates(question, k=6) or []
+            corpus_sha = self.corpus_version() if self.corpus_version else ""
         except Exception:
-            cands = []
-        status = "OK" if cands else "NO_EVIDENCE"
-        return {"status": status, "citations": cands}
-
-    def _safe_detect_flags(_clause, _jur=None, _per_node=None):
-        return []
-
-    def _safe_propose_alt(_clause, _jur=None, _flags=None):
-        return ""
-
-    def _safe_eee(_per_node=None, _flags=None, _gate=None):
-        return {"T": 0.0, "J": 0.0, "P": 0.0}
-
-    # --- Normalizadores/dispatchers ---
-    def _normalize_retrieval(ret):
-        if ret is None:
-            return {"status": "NO_EVIDENCE", "citations": []}
-        if isinstance(ret, list):
-            return {"status": "OK" if ret else "NO_EVIDENCE", "citations": ret}
-        if isinstance(ret, dict):
-            status = ret.get("status")
-            cits = ret.get("citations")
-            if isinstance(cits, list) and status:
-                return {"status": status, "citations": cits}
-            if "results" in ret and isinstance(ret["results"], list):
-                return {"status": "OK" if ret["results"] else "NO_EVIDENCE", "citations": ret["results"]}
-            inferred = ret.get("items") or ret.get("data") or []
-            if not isinstance(inferred, list):
-                inferred = []
-            st = status or ("OK" if inferred else "NO_EVIDENCE")
-            return {"status": st, "citations": inferred}
-        return {"status": "NO_EVIDENCE", "citations": []}
+            corpus_sha = ""
+        psha = policy_sha(policy) if policy_sha else json.dumps(policy, sort_keys=True, default=str)
+        refs = refs_sha(Path(self.refs_path)) if refs_sha and self.refs_path else ""
+        parts = (psha, corpus_sha, refs, INDEX_VERSION or "", self.templates_sha)
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
 
-    def _sra_dispatch(sra_fn, question: str, jurisdiction: str, policy: dict):
-        if sra_fn is None:
-            return _normalize_retrieval(_safe_sra(question, jurisdiction, policy))
-        for call in (
-            lambda: sra_fn(question, jurisdiction=jurisdiction, policy=policy),
-            lambda: sra_fn(question, jurisdiction, policy),
-            lambda: sra_fn(question, policy=policy),
-            lambda: sra_fn(question, policy),
-            lambda: sra_fn(question),
-        ):
-            try:
-                return _normalize_retrieval(call())
-            except TypeError:
-                continue
-            except Exception:
-                continue
-        return _normalize_retrieval(_safe_sra(question, jurisdiction, policy))
-
-    def _flags_dispatch(df_fn, clause: str, jurisdiction: str, per_node):
-        if df_fn is None:
-            return _safe_detect_flags(clause, jurisdiction, per_node)
-        for call in (
-            lambda: df_fn(clause, jurisdiction, per_node),
-            lambda: df_fn(clause, jurisdiction),
-            lambda: df_fn(clause, per_node),
-            lambda: df_fn(clause),
-            lambda: df_fn(text=clause, jurisdiction=jurisdiction, per_node=per_node),
-        ):
-            try:
-                ret = call()
-                return ret or []
-            except TypeError:
-                continue
-            except Exception:
-                continue
-        return _safe_detect_flags(clause, jurisdiction, per_node)
-
-    def _alt_dispatch(pa_fn, clause: str, jurisdiction: str, flags):
-        if pa_fn is None:
-            return _safe_propose_alt(clause, jurisdiction, flags)
-        for call in (
-            lambda: pa_fn(clause, jurisdiction, flags),
-            lambda: pa_fn(clause, flags),
-            lambda: pa_fn(clause, jurisdiction),
-            lambda: pa_fn(clause),
-            lambda: pa_fn(text=clause, jurisdiction=jurisdiction, flags=flags),
-        ):
-            try:
-                ret = call()
-                return ret or ""
-            except TypeError:
-                continue
-            except Exception:
-                continue
-        return _safe_propose_alt(clause, jurisdiction, flags)
-
-    def _normalize_eee(ret):
-        # Devuelve dict con T, J, P (floats)
-        if isinstance(ret, dict):
-            T = float(ret.get("T", 0) or 0)
-            J = float(ret.get("J", 0) or 0)
-            P = float(ret.get("P", 0) or 0)
-            return {"T": T, "J": J, "P": P}
-        if isinstance(ret, (list, tuple)) and len(ret) >= 3:
+    def evidence(self, policy: Dict[str, Any]) -> Optional[Any]:
+        """
+        Tabla de evidencia precalculada (se relee si el fichero cambia), solo si
+        sus huellas coinciden con el corpus, refs.json, el índice, la plantilla
+        y la política vigentes.
+        """
+        if NodeEvidence is None or self.evidence_path is None or not self.templates_sha or not self.corpus_version:
+            return None
+        key = (self.evidence_path, _stat_key(Path(self.evidence_path)))
+        if key != self._evidence_key:
+            with self._lock:
+                if key != self._evidence_key:
+                    self._evidence = NodeEvidence.load(Path(self.evidence_path)) if key[1][1] >= 0 else None
+                    self._evidence_key = key
+        table = self._evidence
+        if table is None:
+            return None
+        try:
+            corpus_sha = self.corpus_version()
+        except Exception:
+            return None
+        refs = refs_sha(Path(self.refs_path)) if self.refs_path else ""
+        return table if table.matches(fingerprint(corpus_sha, self.templates_sha, policy, refs)) else None
+
+    def _precomputed(self, table: Optional[Any], jurisdiction: str,
+                     question: Optional[str] = None, ref: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Respuesta precalculada (copia) para una pregunta o referencia de plantilla; None si no hay."""
+        if table is None:
+            return None
+        entry = table.ref(jurisdiction, ref) if ref else table.question(jurisdiction, question) if question else None
+        if entry is None:
+            return None
+        with self._lock:
+            self.evidence_hits += 1
+        return copy.deepcopy(entry)
+
+    def _read_policy(self) -> Dict[str, Any]:
+        if self.load_policy:
             try:
-                return {"T": float(ret[0]), "J": float(ret[1]), "P": float(ret[2])}
+                return self.load_policy()
             except Exception:
-                return {"T": 0.0, "J": 0.0, "P": 0.0}
-        if isinstance(ret, (int, float)):
-            v = float(ret)
-            return {"T": v, "J": v, "P": v}
-        return {"T": 0.0, "J": 0.0, "P": 0.0}
+                pass
+        return _safe_load_policy()
+
+    def _map(self, fn: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """fn sobre items en el pool de nodos (sin pool si hay un solo item); resultados en orden."""
+        pool = self._pool()
+        if pool is None or len(items) <= 1:
+            return [fn(it) for it in items]
+        return list(pool.map(fn, items))
+
+    def _pool(self) -> Optional[ThreadPoolExecutor]:
+        if self.node_workers <= 1:
+            return None
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.node_workers,
+                                                        thread_name_prefix="lexdomus-node")
+        return self._executor
 
-    def _eee_dispatch(eee_fn, per_node, flags, gate):
+    def _search(self, tries: List[List[str]], jurisdiction: str, policy: Dict[str, Any],
+                known: Optional[List[Optional[Dict[str, Any]]]] = None) -> List[Tuple[Dict[str, Any], str]]:
         """
-        Prueba, en orden:
-          score_eee(per_node=..., flags=..., gate=...)
-          score_eee(per_node, flags, gate)
-          score_eee(per_node, flags)
-          score_eee(per_node)
-          score_eee({"per_node":..., "flags":..., "gate":...})
-          score_eee()
+        (retrieval, consulta usada) por nodo: gana el primer intento que trae
+        citas y el de respaldo solo cuenta si el primero no las trae. `known`
+        trae, por nodo, la respuesta ya resuelta del primer intento (evidencia
+        precalculada) o None; esas no se recuperan.
+
+        Con SRA por lotes, los primeros intentos de todos los nodos se puntúan
+        en una pasada y los de respaldo en otra, solo para los nodos sin citas.
+        Sin lotes, cada intento va al pool de nodos: los primeros se encolan
+        antes que los de respaldo, que se cancelan si su primer intento ya
+        trae citas (si ya habían empezado, su resultado se descarta).
         """
-        if eee_fn is None:
-            return _safe_eee(per_node, flags, gate)
-        for call in (
-            lambda: eee_fn(per_node=per_node, flags=flags, gate=gate),
-            lambda: eee_fn(per_node, flags, gate),
-            lambda: eee_fn(per_node, flags),
-            lambda: eee_fn(per_node),
-            lambda: eee_fn({"per_node": per_node, "flags": flags, "gate": gate}),
-            lambda: eee_fn(),
-        ):
-            try:
-                return _normalize_eee(call())
-            except TypeError:
-                continue
-            except Exception:
+        hit = lambda r: r.get("status") == "OK" and bool(r.get("citations"))
+        firsts: List[Optional[Dict[str, Any]]] = list(known) if known else [None] * len(tries)
+        todo = [i for i, r in enumerate(firsts) if r is None]
+        got = self.stages["sra_many"](questions=[tries[i][0] for i in todo],
+                                      jurisdiction=jurisdiction, policy=policy) if todo else []
+        if got is not None and len(got) == len(todo):
+            for i, r in zip(todo, got):
+                firsts[i] = r
+            need = [i for i, r in enumerate(firsts) if not hit(r)]
+            backs = self.stages["sra_many"](questions=[tries[i][1] for i in need],
+                                            jurisdiction=jurisdiction, policy=policy) if need else []
+            if backs is None or len(backs) != len(need):
+                backs = [self.stages["sra"](question=tries[i][1], jurisdiction=jurisdiction, policy=policy) for i in need]
+            out = [(r, t[0]) for r, t in zip(firsts, tries)]
+            for i, r in zip(need, backs):
+                out[i] = (r, tries[i][1])
+            return out
+
+        sra = lambda q: self.stages["sra"](question=q, jurisdiction=jurisdiction, policy=policy)
+        pool = self._pool()
+        if pool is None:
+            out = []
+            for (first, back), r in zip(tries, firsts):
+                r = r if r is not None else sra(first)
+                out.append((r, first) if hit(r) else (sra(back), back))
+            return out
+        f_first = [pool.submit(sra, t[0]) if r is None else None for t, r in zip(tries, firsts)]
+        f_back = [pool.submit(sra, t[1]) if r is None or not hit(r) else None for t, r in zip(tries, firsts)]
+        out = []
+        for (first, back), r, f1, f2 in zip(tries, firsts, f_first, f_back):
+            r = f1.result() if f1 is not None else r
+            if hit(r):
+                if f2 is not None:
+                    f2.cancel()
+                out.append((r, first))
+            else:
+                out.append((f2.result(), back))
+        return out
+
+    def _retrieve(self, clause: str, jurisdiction: str, nodes: List[Any], policy: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # Nodos con encaje_ref resoluble: evidencia pinpoint del índice de referencias, sin búsqueda
+        # (en paralelo por nodo). Resto: 2 intentos, pregunta del nodo -> cláusula completa (_search).
+        # Las preguntas y referencias de plantilla con evidencia precalculada no se recuperan.
+        table = self.evidence(policy)
+        ref_of = lambda node: node.get("encaje_ref") if isinstance(node, dict) else None
+        def pinpoint(node):
+            return self.stages["pinpoint"](ref=ref_of(node), jurisdiction=jurisdiction, policy=policy)
+        pins = [self._precomputed(table, jurisdiction, ref=ref_of(n)) if ref_of(n) else None for n in nodes]
+        todo = [i for i, (n, p) in enumerate(zip(nodes, pins)) if p is None and ref_of(n)]
+        for i, pin in zip(todo, self._map(pinpoint, [nodes[i] for i in todo])):
+            pins[i] = pin
+        pins = [p if p is not None and p.get("status") == "OK" and p.get("citations") else None for p in pins]
+
+        plans = []
+        for node, pin in zip(nodes, pins):
+            if pin is not None:
                 continue
-        return _safe_eee(per_node, flags, gate)
+            if isinstance(node, dict):
+                q_base = node.get("question") or node.get("pregunta") or ""
+            else:
+                q_base = str(node)
+            plans.append([
+                q_base,
+                f"{q_base}\n\n[Texto de la cláusula]\n{clause}\n\n[Jurisdicción objetivo] {jurisdiction}",
+            ])
+        known = [self._precomputed(table, jurisdiction, question=p[0]) for p in plans]
+        found = iter(self._search(plans, jurisdiction, policy, known))
 
-    # --- Policy ---
-    policy = _safe_load_policy()
+        per_node = []
+        for node, pin in zip(nodes, pins):
+            if pin is not None:
+                per_node.append({"node": node, "retrieval": pin, "used_query": node.get("encaje_ref")})
+            else:
+                retr, used_q = next(found)
+                per_node.append({"node": node, "retrieval": retr, "used_query": used_q})
+        return per_node
 
-    # --- Inquiry (descomposición) ---
-    if callable(decompose_clause):
-        try:
-            nodes = decompose_clause(clause, jurisdiction)
-        except Exception:
-            nodes = [{"title": "Cláusula", "question": "Validez y alcance", "jurisdiction": jurisdiction}]
-    else:
-        nodes = [{"title": "Cláusula", "question": "Validez y alcance", "jurisdiction": jurisdiction}]
-
-    # --- RAG por nodo (2 intentos: pregunta del nodo -> cláusula completa) ---
-    per_node = []
-    for node in nodes:
-        q_base = node.get("question") if isinstance(node, dict) else str(node)
-        tries = [
-            q_base,
-            f"{q_base}\n\n[Texto de la cláusula]\n{clause}\n\n[Jurisdicción objetivo] {jurisdiction}",
-        ]
-        used_q = q_base
-        retr = {"status": "NO_EVIDENCE", "citations": []}
-        for q_try in tries:
-            r = _sra_dispatch(_sra_real, q_try, jurisdiction, policy)
-            # nos quedamos con el primer intento que traiga citas
-            if r.get("status") == "OK" and r.get("citations"):
-                retr = r
-                used_q = q_try
-                break
-            # guarda el último intento incluso si no hay evidencia (para debug)
-            retr = r
-            used_q = q_try
-        per_node.append({"node": node, "retrieval": retr, "used_query": used_q})
-
-    # --- Flags + Gate ---
-    flags = _flags_dispatch(_df_real, clause, jurisdiction, per_node) or []
-    gate_status = "OK" if any(
-        (it.get("retrieval", {}).get("status") == "OK" and it.get("retrieval", {}).get("citations"))
-        for it in per_node
-    ) else "NO_EVIDENCE"
-    gate = {"status": gate_status}
-
-    # --- Opinión LLM / MOCK ---
-    opinion = draft_opinion_llm(clause, jurisdiction, per_node, flags) or {}
-    if "analysis_md" not in opinion and "analysis" in opinion:
-        opinion["analysis_md"] = opinion.get("analysis")
-
-    # --- Cláusula alternativa ---
-    alternative = _alt_dispatch(_pa_real, clause, jurisdiction, flags) or ""
-
-    # --- EEE (dispatcher robusto) ---
-    score = _eee_dispatch(_eee_real, per_node, flags, gate)
-
-    result = {
-        "engine": "LLM" if os.getenv("USE_LLM", "0") == "1" else "MOCK",
-        "per_node": per_node,
-        "flags": flags,
-        "gate": gate,
-        "opinion": opinion,
-        "alternative_clause": alternative,
-        "EEE": score,
-    }
+    def analyze(self, clause: str, jurisdiction: str) -> Dict[str, Any]:
+        policy = self.policy
+        engine = "LLM" if os.getenv("USE_LLM", "0") == "1" else "MOCK"
+        cache = self.result_cache
+        if cache is None:
+            result = self._analyze(clause, jurisdiction, policy, engine)
+            result["cache"] = {"status": "off"}
+            return result
+        version = self.cache_version(policy)
+        key = clause_key(clause, jurisdiction, engine, version)
+        cached, tier = cache.get(key, version)
+        if cached is not None:
+            cached["cache"] = {"status": "hit", "tier": tier, "key": key[:16]}
+            return cached
+        result = self._analyze(clause, jurisdiction, policy, engine)
+        cache.put(key, version, result)
+        result["cache"] = {"status": "miss", "key": key[:16]}
+        return result
 
-    try:
-        append_log(clause=clause, jurisdiction=jurisdiction, result=result)
-    except Exception:
-        pass
+    def _analyze(self, clause: str, jurisdiction: str, policy: Dict[str, Any], engine: str) -> Dict[str, Any]:
+
+        # --- Inquiry (descomposición) + RAG por nodo ---
+        nodes = self.stages["inquiry"](clause=clause, jurisdiction=jurisdiction)
+        per_node = self._retrieve(clause, jurisdiction, nodes, policy)
+
+        # --- Flags + Gate ---
+        flags = self.stages["flags"](clause=clause, jurisdiction=jurisdiction, per_node=per_node) or []
+        gate_status = "OK" if any(
+            (it.get("retrieval", {}).get("status") == "OK" and it.get("retrieval", {}).get("citations"))
+            for it in per_node
+        ) else "NO_EVIDENCE"
+        gate = {"status": gate_status}
+
+        # --- Opinión LLM / MOCK ---
+        opinion = self.draft_opinion(clause, jurisdiction, per_node, flags) or {}
+        if "analysis_md" not in opinion and "analysis" in opinion:
+            opinion["analysis_md"] = opinion.get("analysis")
+
+        # --- Cláusula alternativa ---
+        alternative = self.stages["alternative"](clause=clause, jurisdiction=jurisdiction, flags=flags) or ""
 
-    return result
+        # --- EEE ---
+        score = self.stages["eee"](per_node=per_node, flags=flags, gate=gate,
+                                   analysis={"per_node": per_node, "flags": flags, "gate": gate})
+
+        result = {
+            "engine": engine,
+            "per_node": per_node,
+            "flags": flags,
+            "gate": gate,
+            "opinion": opinion,
+            "alternative_clause": alternative,
+            "EEE": score,
+        }
+
+        self.stages["log"](clause=clause, jurisdiction=jurisdiction, result=result)
+
+        return result
+
+
+_ENGINE: Optional[AnalysisEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+def get_engine() -> AnalysisEngine:
+    """Motor compartido del proceso (se construye en la primera petición)."""
+    global _ENGINE
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                _ENGINE = AnalysisEngine()
+    return _ENGINE
+
+def stage_info() -> Dict[str, Dict[str, Any]]:
+    return get_engine().stage_info()
+
+def analyze_clause(clause: str, jurisdiction: str):
+    """
+    Orquesta el análisis: Inquiry -> RAG -> Flags -> Gate -> Opinión -> Alternativa -> EEE.
+    Envoltorio del AnalysisEngine de módulo (etapas resueltas una vez).
+    """
+    return get_engine().analyze(clause, jurisdiction)
@@ -0,0 +1,149 @@
+# app/result_cache.py — memoización de resultados completos de analyze_clause
+"""
+Las mismas cláusulas llegan una y otra vez (/analyze, scripts de evaluación,
+badge, reintentos de la UI). ResultCache guarda el resultado completo del
+análisis bajo una clave de contenido:
+
+    sha256(cláusula normalizada, jurisdicción, motor LLM/MOCK, versión)
+
+donde la versión (ver AnalysisEngine.cache_version) resume la política, el
+corpus indexado, refs.json, las versiones de analizador e índice y la
+plantilla de nodos. Dos niveles:
+
+  - memoria: LRU acotada del proceso;
+  - disco:   SQLite (opcional), compartido entre procesos y ejecuciones.
+
+Cada entrada guarda su versión y solo se sirve a quien pide esa misma
+versión: un resultado nunca sale con otro corpus u otra política. Las de
+versiones anteriores no se borran al cambiar de versión (en un despliegue
+con varios workers, unos pueden ir aún con la versión vieja y otros con la
+nueva sobre el mismo SQLite): caducan a los `ttl` segundos o salen por la
+poda LRU a `max_rows`, como el resto. Los resultados se guardan como JSON,
+así que cada acierto devuelve una copia independiente.
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import hashlib, json, re, sqlite3, threading, time
+
+from lex_domus.analyzer import normalize_text
+
+_WS = re.compile(r"\s+")
+
+
+def clause_key(clause: str, jurisdiction: str, engine: str, version: str) -> str:
+    """Clave de contenido: mismo texto (NFC, espacios colapsados) y contexto, misma clave."""
+    norm = _WS.sub(" ", normalize_text(clause)).strip()
+    payload = json.dumps([norm, jurisdiction or "", engine, version], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, maxsize: int = 256, path: Optional[Path] = None,
+                 ttl: float = 86400.0, max_rows: int = 10000):
+        self.maxsize = maxsize
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._mem: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, version TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._db.commit()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def get(self, key: str, version: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """(resultado, nivel "memory"/"disk") o (None, None) si no está o caducó."""
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None and item[1] == version:
+                if now - item[0] <= self.ttl:
+                    self._mem.move_to_end(key)
+                    self.hits_memory += 1
+                    return json.loads(item[2]), "memory"
+                del self._mem[key]
+                self.expired += 1
+            if self._db is not None:
+                row = self._db.execute("SELECT created, payload FROM results WHERE key = ? AND version = ?",
+                                       (key, version)).fetchone()
+                if row is not None and now - row[0] <= self.ttl:
+                    self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row[0], version, row[1])
+                    self.hits_disk += 1
+                    return json.loads(row[1]), "disk"
+                if row is not None:
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.expired += 1
+            self.misses += 1
+            return None, None
+
+    def put(self, key: str, version: str, result: Dict[str, Any]) -> None:
+        payload = json.dumps(result, ensure_ascii=False, default=str)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, version, payload)
+            self.stores += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, version, created, accessed, payload) VALUES (?, ?, ?, ?, ?)",
+                    (key, version, now, now, payload),
+                )
+                self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+                self._db.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (max(0, self.max_rows),),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, created: float, version: str, payload: str) -> None:
+        if self.maxsize <= 0:
+            return
+        self._mem[key] = (created, version, payload)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxsize:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = versions = None
+            if self._db is not None:
+                rows, versions = self._db.execute("SELECT COUNT(*), COUNT(DISTINCT version) FROM results").fetchone()
+        hits = self.hits_memory + self.hits_disk
+        total = hits + self.misses
+        return {
+            "size": len(self._mem),
+            "maxsize": self.maxsize,
+            "disk": str(self.path) if self.path is not None else None,
+            "disk_rows": rows,
+            "disk_versions": versions,
+            "ttl_s": self.ttl,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "hit_rate": round(hits / total, 3) if total else None,
+        }
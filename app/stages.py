@@ -0,0 +1,138 @@
+# app/stages.py — adaptadores de etapa: forma de llamada resuelta por firma, una vez
+"""
+Las etapas del pipeline (SRA, flags, alternativa, EEE...) tienen firmas
+distintas según el repo del que vengan. Antes cada petición probaba hasta
+seis formas de llamada capturando cualquier excepción, así que una etapa que
+fallaba dentro de su cuerpo (no al enlazar argumentos) se ejecutaba varias
+veces antes de caer al fallback.
+
+StageAdapter elige la forma al construirse, con inspect.signature: la
+primera de `shapes` que enlaza con la firma y cuyos parámetros posicionales
+tienen nombres compatibles (un parámetro llamado "jurisdiction" no recibe
+las flags). En cada petición la etapa se ejecuta exactamente una vez; si
+falla, se usa el fallback y el error queda en los contadores (info()).
+"""
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import inspect, threading
+
+# Forma de llamada: (claves del contexto posicionales, (parámetro, clave del contexto) por nombre)
+Shape = Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]]
+
+# Nombres de parámetro que se aceptan para cada clave del contexto
+ALIASES: Dict[str, Tuple[str, ...]] = {
+    "clause": ("clause", "text", "clausula"),
+    "question": ("question", "query", "q", "pregunta"),
+    "questions": ("questions", "queries"),
+    "ref": ("ref", "encaje_ref", "reference"),
+    "jurisdiction": ("jurisdiction", "jur", "juris"),
+    "policy": ("policy",),
+    "per_node": ("per_node", "nodes"),
+    "flags": ("flags",),
+    "gate": ("gate",),
+    "analysis": ("analysis", "payload", "data"),
+    "result": ("result",),
+}
+
+
+class _Slot:
+    """Marcador de argumento al enlazar la firma (no se ejecuta nada)."""
+    __slots__ = ("key",)
+
+    def __init__(self, key: str):
+        self.key = key
+
+
+def _label(shape: Shape) -> str:
+    args = list(shape[0]) + [f"{p}={k}" for p, k in shape[1]]
+    return f"({', '.join(args)})"
+
+
+def _name(fn: Callable) -> str:
+    return f"{getattr(fn, '__module__', '?')}.{getattr(fn, '__qualname__', repr(fn))}"
+
+
+def select_shape(fn: Callable, shapes: Sequence[Shape]) -> Optional[Shape]:
+    """Primera forma que enlaza con la firma de `fn` con nombres compatibles; None si ninguna."""
+    try:
+        sig = inspect.signature(fn)
+    except (TypeError, ValueError):
+        return shapes[0] if shapes else None  # sin firma inspeccionable: la forma preferida
+    known = {n for s in shapes for k in s[0] for n in ALIASES.get(k, (k,))}
+    for shape in shapes:
+        positional, keywords = shape
+        try:
+            bound = sig.bind(*(_Slot(k) for k in positional), **{p: _Slot(k) for p, k in keywords})
+        except TypeError:
+            continue
+        ok = True
+        for pname, value in bound.arguments.items():
+            if sig.parameters[pname].kind is inspect.Parameter.VAR_POSITIONAL or not isinstance(value, _Slot):
+                continue
+            if pname in known and pname not in ALIASES.get(value.key, (value.key,)):
+                ok = False
+                break
+        if ok:
+            return shape
+    return None
+
+
+class StageAdapter:
+    """
+    Una etapa con su implementación enlazada una vez. adapter(**ctx) ejecuta la
+    implementación con la forma elegida y `normalize` sobre su resultado; si
+    no hay implementación, ninguna forma enlaza o la llamada falla, devuelve
+    fallback(**ctx).
+    """
+
+    def __init__(self, name: str, fn: Optional[Callable], shapes: Sequence[Shape],
+                 fallback: Callable[..., Any], normalize: Callable[[Any], Any] = lambda r: r):
+        self.name = name
+        self.fn = fn
+        self.shape = select_shape(fn, shapes) if fn is not None else None
+        self.fallback = fallback
+        self.normalize = normalize
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def selected(self) -> str:
+        if self.fn is None:
+            return "fallback (no disponible)"
+        if self.shape is None:
+            return f"fallback (firma incompatible: {_name(self.fn)})"
+        return f"{_name(self.fn)}{_label(self.shape)}"
+
+    def _count(self, error: Optional[BaseException] = None, fallback: bool = False) -> None:
+        with self._lock:
+            self.calls += 1
+            if error is not None:
+                self.errors += 1
+                self.last_error = f"{type(error).__name__}: {error}"
+            if fallback:
+                self.fallbacks += 1
+
+    def __call__(self, **ctx: Any) -> Any:
+        if self.shape is None:
+            self._count(fallback=True)
+            return self.fallback(**ctx)
+        positional, keywords = self.shape
+        try:
+            ret = self.fn(*(ctx[k] for k in positional), **{p: ctx[k] for p, k in keywords})
+            out = self.normalize(ret)
+        except Exception as e:
+            self._count(e, fallback=True)
+            return self.fallback(**ctx)
+        self._count()
+        return out
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "adapter": self.selected,
+            "calls": self.calls,
+            "errors": self.errors,
+            "fallbacks": self.fallbacks,
+            "last_error": self.last_error,
+        }
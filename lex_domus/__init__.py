@@ -1,9 +1,12 @@
 # Hace que lex_domus sea un paquete y reexporta lo esencial
-from .rag_pipeline import load_policy, source_required_answer  # y cualquier helper que uses
+from .rag_pipeline import load_policy, pinpoint_answer, source_required_answer, source_required_answer_many  # y cualquier helper que uses
+from .refs import resolve_refs
 try:
-    from .retriever import retrieve_candidates
+    from .retriever import pinpoint_candidates, retrieve_candidates, retrieve_candidates_many
 except Exception:
+    pinpoint_candidates = None
     retrieve_candidates = None
+    retrieve_candidates_many = None
 
 # Opcional: si tienes este módulo en el repo
 try:
@@ -15,7 +18,12 @@ except Exception:
 __all__ = [
     "load_policy",
     "source_required_answer",
+    "source_required_answer_many",
+    "pinpoint_answer",
+    "resolve_refs",
     "retrieve_candidates",
+    "retrieve_candidates_many",
+    "pinpoint_candidates",
     "detect_flags",
     "propose_alternative",
 ]
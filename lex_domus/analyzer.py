@@ -0,0 +1,84 @@
+# lex_domus/analyzer.py — analizador léxico común (ingest, build_index y consultas)
+"""
+Un único analizador para documentos y consultas: así el índice guarda la
+forma analizada de cada término y una consulta solo analiza su propio texto.
+
+Pasos: normalización Unicode -> minúsculas -> plegado de acentos ("cesión" ->
+"cesion") -> stopwords ES/EN -> stemming ligero ES/EN (plurales y vocal de
+género). Los tokens con dígitos ("14", "6bis", "106") no se tocan: son
+referencias a artículos/secciones.
+"""
+from typing import List, Tuple
+import re, unicodedata
+
+# Cambia si cambia cualquier paso: los índices persistidos lo comprueban al cargar
+ANALYZER_ID = "es-en-light-v1"
+
+_WORD = re.compile(r"\w+", re.U)
+
+STOPWORDS_ES = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aquel aquella aquellas aquello aquellos aqui
+asi aun aunque cada como con contra cual cuales cualquier cuando de del desde donde dos e el ella ellas
+ello ellos en entre era eran es esa esas ese eso esos esta estaba estado estan estar este esto estos fue
+fueron ha haber habia han hasta hay la las le les lo los mas me mi mis mismo muy nada ni no nos nosotros
+o os otra otras otro otros para pero poco por porque que quien quienes se segun ser si sido siempre
+sin sino sobre sois solo son su sus tal tambien tanto te tiene tienen todo todos tras tu tus u un una
+unas uno unos usted vosotros y ya
+""".split())
+
+STOPWORDS_EN = frozenset("""
+a about above after again against all am an and any are as at be been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just may me more most must my
+myself no nor not now of off on once only or other our ours ourselves out over own same shall she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up upon very was we were what when where which while who whom why will
+with would you your yours yourself
+""".split())
+
+STOPWORDS = STOPWORDS_ES | STOPWORDS_EN
+
+
+def normalize_text(text: str) -> str:
+    """Normalización de texto bruto compartida con ingest: NFC y saltos de línea \\n."""
+    return re.sub(r"\r\n?", "\n", unicodedata.normalize("NFC", text or ""))
+
+
+def fold(token: str) -> str:
+    """Minúsculas y sin diacríticos ("Artículo" -> "articulo", "ñ" -> "n")."""
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def stem(token: str) -> str:
+    """
+    Stemming ligero ES/EN: plurales (-ciones, -es tras consonante, -s) y vocal
+    final de género (-a/-o/-e) en palabras largas. Conservador a propósito:
+    prefiere no unir a unir mal.
+    """
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if token.endswith("ciones"):
+        token = token[:-2]
+    elif token.endswith("es") and len(token) > 4 and token[-3] not in "aeiou":
+        token = token[:-2]
+    elif token.endswith("s") and token[-2] not in "su":
+        token = token[:-1]
+    if len(token) > 4 and token[-1] in "aoe":
+        token = token[:-1]
+    return token
+
+
+def analyze_positions(text: str) -> List[Tuple[str, int]]:
+    """(término analizado, posición en el texto original contando stopwords)."""
+    out = []
+    for pos, raw in enumerate(_WORD.findall(text or "")):
+        tok = fold(raw)
+        if tok in STOPWORDS:
+            continue
+        out.append((stem(tok), pos))
+    return out
+
+
+def analyze(text: str) -> List[str]:
+    return [t for t, _ in analyze_positions(text)]
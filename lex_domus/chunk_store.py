@@ -0,0 +1,267 @@
+# lex_domus/chunk_store.py — almacén binario de chunks con acceso aleatorio (mmap)
+"""
+data/docs_chunks/chunks.lxcs: los mismos registros que chunks.jsonl en un
+contenedor LXIDX (index_file.py), por columnas:
+
+    text_blob / text_off         texto de cada chunk (offsets de ancho fijo, int64)
+    docid_blob / docid_off       doc_id de cada chunk
+    docid_slots                  tabla hash doc_id -> fila (direccionamiento abierto, -1 = libre)
+    <campo>_blob / <campo>_off   diccionario de valores de cada campo categórico
+    <campo>                      código por fila (uint32; 0 = campo ausente)
+    line_start / line_end        int64 (-1 = ausente)
+    pinpoint                     uint8 (0/1; 2 = ausente)
+    extra_blob / extra_off       JSON con cualquier otro campo ("" si no hay)
+
+Un chunk por fila o por doc_id se lee cortando el mmap, sin parsear JSON;
+contar por family/source/jurisdiction es un bincount de códigos. ingest lo
+escribe junto a chunks.jsonl, que sigue siendo el formato legible (y el que
+se puede regenerar con export_jsonl).
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib, json
+
+import numpy as np
+
+from .chunk_table import _NO_FLAG, _NO_INT, CATEGORICAL, FLAGS, INTEGERS
+from .index import _string_table, file_sha256
+from .index_file import open_index, write_index
+
+ROOT = Path(__file__).resolve().parents[1]
+CHUNKS = ROOT / "data" / "docs_chunks" / "chunks.jsonl"
+STORE = ROOT / "data" / "docs_chunks" / "chunks.lxcs"
+
+STORE_SCHEMA = 1
+
+
+def _slot_hash(doc_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(doc_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _docid_slots(doc_ids: List[str]) -> np.ndarray:
+    """Tabla hash de tamaño potencia de 2 (>= 2n) con sondeo lineal; la primera fila de cada doc_id gana."""
+    size = 1
+    while size < 2 * max(len(doc_ids), 1):
+        size *= 2
+    slots = np.full(size, -1, dtype=np.int32)
+    seen = set()
+    for row, doc_id in enumerate(doc_ids):
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        i = _slot_hash(doc_id) & (size - 1)
+        while slots[i] != -1:
+            i = (i + 1) & (size - 1)
+        slots[i] = row
+    return slots
+
+
+def write_store(records: Iterable[Dict[str, Any]], path: Path = STORE, corpus_sha: str = "",
+                chunks_size: Optional[int] = None, chunks_mtime_ns: Optional[int] = None) -> int:
+    """Escribe el almacén de `records` (en su orden). Devuelve el nº de filas."""
+    records = list(records)
+    n = len(records)
+    texts, doc_ids, extras = [], [], []
+    values: Dict[str, Dict[str, int]] = {f: {} for f in CATEGORICAL}
+    codes = {f: np.zeros(n, dtype=np.uint32) for f in CATEGORICAL}
+    ints = {f: np.full(n, _NO_INT, dtype=np.int64) for f in INTEGERS}
+    flags = {f: np.full(n, _NO_FLAG, dtype=np.uint8) for f in FLAGS}
+    for row, rec in enumerate(records):
+        texts.append(rec.get("text", ""))
+        doc_ids.append(rec.get("doc_id", ""))
+        extra = {}
+        for key, v in rec.items():
+            if key in ("text", "doc_id"):
+                continue
+            if key in values and isinstance(v, str):
+                codes[key][row] = values[key].setdefault(v, len(values[key]) + 1)
+            elif key in ints and type(v) is int and v >= 0:
+                ints[key][row] = v
+            elif key in flags and isinstance(v, bool):
+                flags[key][row] = int(v)
+            else:
+                extra[key] = v
+        extras.append(json.dumps(extra, ensure_ascii=False) if extra else "")
+
+    sections = {}
+    sections["text_blob"], sections["text_off"] = _string_table(texts)
+    sections["docid_blob"], sections["docid_off"] = _string_table(doc_ids)
+    sections["docid_slots"] = _docid_slots(doc_ids)
+    sections["extra_blob"], sections["extra_off"] = _string_table(extras)
+    for field in CATEGORICAL:
+        table = sorted(values[field], key=values[field].get)
+        sections[f"{field}_blob"], sections[f"{field}_off"] = _string_table([""] + table)
+        sections[field] = codes[field]
+    sections.update(ints)
+    sections.update(flags)
+    write_index(path, sections, {
+        "kind": "chunks",
+        "schema": STORE_SCHEMA,
+        "n_rows": n,
+        "corpus_sha": corpus_sha,
+        "chunks_size": chunks_size,
+        "chunks_mtime_ns": chunks_mtime_ns,
+    })
+    return n
+
+
+def _ints(arr: np.ndarray) -> memoryview:
+    # memoryview tipado sobre la sección: indexar devuelve int de Python sin pasar por numpy
+    return memoryview(np.ascontiguousarray(arr)).cast("B").cast(arr.dtype.char)
+
+
+class _Strings:
+    """Blob UTF-8 + offsets leídos a través de memoryview (acceso por fila sin numpy)."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = memoryview(blob).cast("B")
+        self._off = _ints(offsets)
+
+    def __len__(self) -> int:
+        return len(self._off) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return str(self._blob[self._off[i]:self._off[i + 1]], "utf-8")
+
+
+class ChunkStore:
+    """Vista de solo lectura sobre chunks.lxcs; filas en el orden de chunks.jsonl."""
+
+    def __init__(self, meta: Dict[str, Any], s: Dict[str, np.ndarray], mm=None):
+        self.meta = meta
+        self._mm = mm
+        self._text = _Strings(s["text_blob"], s["text_off"])
+        self._docids = _Strings(s["docid_blob"], s["docid_off"])
+        self._slots = _ints(s["docid_slots"])
+        self._extra = _Strings(s["extra_blob"], s["extra_off"])
+        # diccionarios pequeños: se decodifican una vez (código 0 = ausente -> None)
+        self._values = {}
+        for f in CATEGORICAL:
+            table = _Strings(s[f"{f}_blob"], s[f"{f}_off"])
+            self._values[f] = [None] + [table[i] for i in range(1, len(table))]
+        self._code_cols = {f: s[f] for f in CATEGORICAL}
+        self._codes = {f: _ints(s[f]) for f in CATEGORICAL}
+        self._ints = {f: _ints(s[f]) for f in INTEGERS}
+        self._flags = {f: _ints(s[f]) for f in FLAGS}
+
+    @classmethod
+    def open(cls, path: Path = STORE) -> "ChunkStore":
+        meta, s, mm = open_index(path)
+        if meta.get("kind") != "chunks" or meta.get("schema") != STORE_SCHEMA:
+            raise ValueError(f"{path.name}: almacén de chunks de otro esquema; vuelve a ejecutar ingest")
+        return cls(meta, s, mm)
+
+    @property
+    def corpus_sha(self) -> str:
+        return self.meta.get("corpus_sha", "")
+
+    def __len__(self) -> int:
+        return len(self._docids)
+
+    # --------- Acceso por fila / doc_id ---------
+
+    def text(self, row: int) -> str:
+        return self._text[row]
+
+    def doc_id(self, row: int) -> str:
+        return self._docids[row]
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        """Fila de `doc_id` en O(1) (tabla hash del almacén); None si no existe."""
+        mask = len(self._slots) - 1
+        i = _slot_hash(doc_id) & mask
+        while True:
+            row = self._slots[i]
+            if row == -1:
+                return None
+            if self._docids[row] == doc_id:
+                return row
+            i = (i + 1) & mask
+
+    def value(self, field: str, row: int) -> Any:
+        """Valor de un campo de la fila (None si el chunk no lo tiene)."""
+        if field in self._codes:
+            return self._values[field][self._codes[field][row]]
+        if field in self._ints:
+            v = self._ints[field][row]
+            return None if v == _NO_INT else v
+        if field in self._flags:
+            v = self._flags[field][row]
+            return None if v == _NO_FLAG else bool(v)
+        if field == "text":
+            return self.text(row)
+        if field == "doc_id":
+            return self.doc_id(row)
+        extra = self._extra[row]
+        return json.loads(extra).get(field) if extra else None
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """Registro completo de la fila, igual al de chunks.jsonl."""
+        rec: Dict[str, Any] = {"doc_id": self.doc_id(row)}
+        for field, codes in self._codes.items():
+            v = self._values[field][codes[row]]
+            if v is not None:
+                rec[field] = v
+        for field, col in self._flags.items():
+            if col[row] != _NO_FLAG:
+                rec[field] = bool(col[row])
+        for field, col in self._ints.items():
+            if col[row] != _NO_INT:
+                rec[field] = col[row]
+        extra = self._extra[row]
+        if extra:
+            rec.update(json.loads(extra))
+        rec["text"] = self.text(row)
+        return rec
+
+    __getitem__ = record
+
+    def by_doc_id(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self.row_of(doc_id)
+        return None if row is None else self.record(row)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.record(i) for i in range(len(self)))
+
+    # --------- Columnas ---------
+
+    def codes(self, field: str) -> Tuple[List[str], np.ndarray]:
+        """(diccionario de valores, código por fila) de un campo categórico; código 0 = ausente."""
+        return [""] + self._values[field][1:], self._code_cols[field]
+
+    def value_counts(self, field: str, missing: Optional[str] = None) -> Dict[Optional[str], int]:
+        """Nº de chunks por valor del campo (los que no lo tienen cuentan como `missing`)."""
+        table, codes = self.codes(field)
+        counts: Dict[Optional[str], int] = {}
+        for code, n in enumerate(np.bincount(codes, minlength=len(table)).tolist()):
+            if n:
+                key = table[code] if code else missing
+                counts[key] = counts.get(key, 0) + n
+        return counts
+
+    def export_jsonl(self, path: Path) -> int:
+        """Vuelca el almacén a JSONL (mismo formato que escribe ingest)."""
+        with open(path, "w", encoding="utf-8") as f:
+            for rec in self:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        return len(self)
+
+
+def load_store(path: Path = STORE, chunks: Path = CHUNKS) -> Optional[ChunkStore]:
+    """
+    El almacén si existe y corresponde a `chunks`; None si falta o está
+    desfasado: el llamador vuelve a leer chunks.jsonl. Con el mismo tamaño y
+    mtime que cuando se escribió se da por bueno; si solo coincide el tamaño
+    (edición del mismo tamaño, checkout, copia) se comprueba que el sha de
+    chunks.jsonl sea su corpus_sha.
+    """
+    try:
+        store = ChunkStore.open(path)
+        st = chunks.stat()
+        if store.meta.get("chunks_size") != st.st_size:
+            return None
+        if store.meta.get("chunks_mtime_ns") == st.st_mtime_ns:
+            return store
+        return store if store.corpus_sha and store.corpus_sha == file_sha256(chunks) else None
+    except (OSError, ValueError):
+        return None
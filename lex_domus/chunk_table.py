@@ -0,0 +1,173 @@
+# lex_domus/chunk_table.py — tabla de chunks compacta en memoria (columnas + códigos)
+"""
+Los registros de chunks.jsonl como dicts repiten en cada chunk las mismas
+cadenas (source, jurisdiction, title, family, ref_url...) y pagan la
+sobrecarga de un dict por chunk. ChunkTable guarda una columna por campo:
+los categóricos como códigos enteros (array) sobre un diccionario de valores
+internados, los números en arrays y el texto en una lista. Una fila es un
+ChunkRow (__slots__, interfaz Mapping de solo lectura) que lee de las
+columnas al pedir cada campo; el dict solo se construye para las filas que
+acaban en una cita (ver retriever._citation).
+
+scripts/bench_memory.py mide los bytes por chunk de cada representación.
+"""
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import sys
+
+# Columnas, en el orden en que ingest escribe los campos (así se itera una fila)
+CATEGORICAL = ("source", "jurisdiction", "title", "family", "ref_label", "ref_url")
+FLAGS = ("pinpoint",)
+INTEGERS = ("line_start", "line_end")
+
+_NO_INT = -1
+_NO_FLAG = 2
+
+
+class ChunkRow(Mapping):
+    """Fila de ChunkTable con interfaz de dict de solo lectura (sin copiar los campos)."""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table: "ChunkTable", row: int):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        v = self._table.value(key, self._row)
+        if v is None and key not in self._table.extra_keys(self._row):
+            raise KeyError(key)
+        return v
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table.keys(self._row))
+
+    def __len__(self) -> int:
+        return len(self._table.keys(self._row))
+
+    def __repr__(self) -> str:
+        return f"ChunkRow({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._table.record(self._row)
+
+    def meta(self) -> Dict[str, Any]:
+        return self._table.meta(self._row)
+
+
+class ChunkTable:
+    """
+    Registros de chunks por columnas. Se indexa como una lista de registros
+    (table[i] -> ChunkRow, len, iteración), que es lo que esperan
+    InvertedIndex y el retriever.
+    """
+
+    __slots__ = ("doc_ids", "texts", "_values", "_lookup", "_codes", "_ints", "_flags", "_extra")
+
+    def __init__(self):
+        self.doc_ids: List[str] = []
+        self.texts: List[str] = []
+        self._values: Dict[str, List[Optional[str]]] = {f: [None] for f in CATEGORICAL}  # código 0 = ausente
+        self._lookup: Dict[str, Dict[str, int]] = {f: {} for f in CATEGORICAL}
+        self._codes = {f: array("H") for f in CATEGORICAL}
+        self._ints = {f: array("q") for f in INTEGERS}
+        self._flags = {f: bytearray() for f in FLAGS}
+        self._extra: Dict[int, Dict[str, Any]] = {}  # campos fuera de las columnas (raros)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping]) -> "ChunkTable":
+        table = cls()
+        for rec in records:
+            table.append(rec)
+        return table
+
+    def _code(self, field: str, value: str) -> int:
+        code = self._lookup[field].get(value)
+        if code is None:
+            code = self._lookup[field][value] = len(self._values[field])
+            self._values[field].append(sys.intern(value))
+            if code > 0xFFFF and self._codes[field].typecode == "H":
+                self._codes[field] = array("I", self._codes[field])
+        return code
+
+    def append(self, rec: Mapping) -> None:
+        row = len(self.doc_ids)
+        self.doc_ids.append(rec.get("doc_id", ""))
+        self.texts.append(rec.get("text", ""))
+        seen = set()
+        for field in CATEGORICAL:
+            v = rec.get(field)
+            if isinstance(v, str):
+                self._codes[field].append(self._code(field, v))
+                seen.add(field)
+            else:
+                self._codes[field].append(0)
+        for field in INTEGERS:
+            v = rec.get(field)
+            ok = type(v) is int and v >= 0
+            self._ints[field].append(v if ok else _NO_INT)
+            if ok:
+                seen.add(field)
+        for field in FLAGS:
+            v = rec.get(field)
+            ok = isinstance(v, bool)
+            self._flags[field].append(int(v) if ok else _NO_FLAG)
+            if ok:
+                seen.add(field)
+        extra = {k: v for k, v in rec.items() if k not in seen and k not in ("doc_id", "text")}
+        if extra:
+            self._extra[row] = extra
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __getitem__(self, row: int) -> ChunkRow:
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return ChunkRow(self, row % len(self))
+
+    def __iter__(self) -> Iterator[ChunkRow]:
+        return (ChunkRow(self, i) for i in range(len(self)))
+
+    # --------- Acceso por columnas ---------
+
+    def value(self, field: str, row: int) -> Any:
+        """Valor de un campo de la fila (None si el chunk no lo tiene)."""
+        if field in self._codes:
+            v = self._values[field][self._codes[field][row]]
+            if v is not None:
+                return v
+        elif field in self._ints:
+            v = self._ints[field][row]
+            if v != _NO_INT:
+                return v
+        elif field in self._flags:
+            v = self._flags[field][row]
+            if v != _NO_FLAG:
+                return bool(v)
+        elif field == "text":
+            return self.texts[row]
+        elif field == "doc_id":
+            return self.doc_ids[row]
+        return self._extra.get(row, {}).get(field)
+
+    def extra_keys(self, row: int):
+        return self._extra.get(row, {}).keys()
+
+    def keys(self, row: int) -> List[str]:
+        out = ["doc_id"]
+        out += [f for f in CATEGORICAL if self._codes[f][row]]
+        out += [f for f in FLAGS if self._flags[f][row] != _NO_FLAG]
+        out += [f for f in INTEGERS if self._ints[f][row] != _NO_INT]
+        out += [k for k in self.extra_keys(row) if k not in out]
+        out.append("text")
+        return out
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """dict del registro (el que se escribiría en chunks.jsonl)."""
+        return {k: self.value(k, row) for k in self.keys(row)}
+
+    def meta(self, row: int) -> Dict[str, Any]:
+        """Metadatos de la fila para una cita: todos los campos menos el texto."""
+        return {k: self.value(k, row) for k in self.keys(row) if k != "text"}
@@ -0,0 +1,147 @@
+# lex_domus/dedup.py — detección de chunks casi duplicados (MinHash + LSH)
+"""
+El corpus tiene versiones solapadas de la misma norma (es_lpi, es_lpi_excerpt,
+es_lpi_full...). ingest agrupa aquí los chunks casi idénticos entre todas
+ellas: firma MinHash de los shingles de palabras de cada chunk, LSH por
+bandas para proponer candidatos y Jaccard exacta de los shingles para
+confirmarlos (>= DEDUP_THRESHOLD). Cada grupo conserva un chunk canónico
+(el de la versión más completa, la que más chunks tiene) y los demás pasan
+a ser alias suyos: el índice solo indexa el canónico.
+"""
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+import re, zlib
+
+import numpy as np
+
+from .analyzer import fold
+
+# Jaccard mínima de shingles para considerar dos chunks el mismo texto
+DEDUP_THRESHOLD = 0.8
+
+SHINGLE = 3      # palabras por shingle
+NUM_PERM = 64    # funciones hash de la firma MinHash
+BANDS = 16       # bandas LSH (NUM_PERM / BANDS filas por banda): umbral efectivo ~0.5
+SHINGLE_CACHE = 1024  # shingles de candidatos retenidos al confirmar en streaming
+
+_WORD = re.compile(r"\w+", re.U)
+
+# Permutaciones (a*x + b) mod 2^32 con a impar: fijas para que la ingesta sea reproducible
+_RNG = np.random.default_rng(20240817)
+_A = (_RNG.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+_B = _RNG.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def is_alias(rec: Mapping) -> bool:
+    """Chunk marcado por ingest como casi duplicado de otro ("dup_of"): no se indexa."""
+    return bool(rec.get("dup_of"))
+
+
+def shingles(text: str, size: int = SHINGLE) -> Set[int]:
+    """Hashes (crc32) de los n-gramas de palabras del texto plegado (sin acentos ni mayúsculas)."""
+    words = [fold(w) for w in _WORD.findall(text or "")]
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+def minhash(sh: Set[int]) -> np.ndarray:
+    """Firma MinHash (NUM_PERM,) de un conjunto de shingles."""
+    if not sh:
+        return np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    x = np.fromiter(sh, dtype=np.uint64, count=len(sh))
+    return ((np.outer(_A, x) + _B[:, None]) & _MASK32).min(axis=1)
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _lsh_groups(sigs: Iterable[Optional[np.ndarray]], shingles_of: Callable[[int], Set[int]],
+                threshold: float) -> List[List[int]]:
+    """
+    Grupos (de 2 o más) de índices casi idénticos. `sigs` trae la firma de
+    cada elemento en orden (None = sin shingles, nunca se agrupa); de ella
+    solo se guardan las bandas. `shingles_of(i)` da los shingles del
+    elemento i para confirmar cada candidato con la Jaccard exacta.
+    """
+    rows = NUM_PERM // BANDS
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    n = 0
+    for i, sig in enumerate(sigs):
+        n += 1
+        if sig is None:
+            continue
+        for band in range(BANDS):
+            buckets.setdefault((band, sig[band * rows:(band + 1) * rows].tobytes()), []).append(i)
+
+    parent = list(range(n))
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked: Set[Tuple[int, int]] = set()
+    for members in buckets.values():
+        for j, a in enumerate(members):
+            for b in members[j + 1:]:
+                if (a, b) in checked or find(a) == find(b):
+                    continue
+                checked.add((a, b))
+                if jaccard(shingles_of(a), shingles_of(b)) >= threshold:
+                    parent[find(b)] = find(a)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return sorted((g for g in groups.values() if len(g) > 1), key=lambda g: g[0])
+
+
+def near_duplicates(texts: Sequence[str], threshold: float = DEDUP_THRESHOLD) -> List[List[int]]:
+    """Grupos (de 2 o más) de índices de `texts` casi idénticos, cada grupo ordenado."""
+    sets = [shingles(t) for t in texts]
+    return _lsh_groups((minhash(s) if s else None for s in sets), sets.__getitem__, threshold)
+
+
+def collapse_stream(records: Iterable[Tuple[str, str]], text_of: Callable[[int], str],
+                    threshold: float = DEDUP_THRESHOLD) -> Dict[str, List[str]]:
+    """
+    collapse() en streaming: `records` son pares (doc_id, texto) en orden de
+    corpus y solo se retienen los doc_id y las bandas LSH de cada firma. Los
+    candidatos se confirman releyendo su texto con text_of(i) (p. ej. por
+    offset en chunks.jsonl), con una caché acotada de shingles.
+    """
+    doc_ids: List[str] = []
+
+    def sigs() -> Iterator[Optional[np.ndarray]]:
+        for doc_id, text in records:
+            doc_ids.append(doc_id)
+            sh = shingles(text)
+            yield minhash(sh) if sh else None
+
+    shingles_of = lru_cache(maxsize=SHINGLE_CACHE)(lambda i: frozenset(shingles(text_of(i))))
+    groups = _lsh_groups(sigs(), shingles_of, threshold)
+    version = [d.split("#")[0] for d in doc_ids]
+    size: Dict[str, int] = {}
+    for v in version:
+        size[v] = size.get(v, 0) + 1
+    out: Dict[str, List[str]] = {}
+    for group in groups:
+        canon = min(group, key=lambda i: (-size[version[i]], i))
+        out[doc_ids[canon]] = [doc_ids[i] for i in group if i != canon]
+    return out
+
+
+def collapse(records: Sequence[Mapping], id_key: str = "doc_id",
+             threshold: float = DEDUP_THRESHOLD) -> Dict[str, List[str]]:
+    """
+    canónico -> [alias] de los chunks casi duplicados de `records`. El canónico
+    de cada grupo es el chunk de la versión (prefijo del doc_id antes de '#')
+    con más chunks; a igualdad, el primero en orden de corpus.
+    """
+    return collapse_stream(((str(r.get(id_key, "")), r.get("text", "")) for r in records),
+                           lambda i: records[i].get("text", ""), threshold)
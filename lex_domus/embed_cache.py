@@ -0,0 +1,121 @@
+# lex_domus/embed_cache.py — caché persistente de embeddings (SQLite)
+"""
+Caché de vectores para scripts/build_index.py (build_faiss), clave
+(modelo, hash del texto normalizado). Una pasada solo codifica los textos
+que no están en la caché, por lotes de `batch_size`, y monta la matriz con
+los aciertos. Cada vector guarda lo que costó codificarlo (ms), así que el
+tiempo ahorrado de una pasada es la suma de lo que costaron sus aciertos.
+
+La caché vive en indices/embed_cache.sqlite, junto a embeddings.npy: el
+workflow la commitea con los índices y persiste entre ejecuciones.
+"""
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+import hashlib, re, sqlite3
+
+import numpy as np
+
+from .analyzer import normalize_text
+
+ROOT = Path(__file__).resolve().parents[1]
+EMBED_CACHE = ROOT / "indices" / "embed_cache.sqlite"
+
+# Lote por defecto de model.encode
+BATCH_SIZE = 64
+
+# (textos) -> matriz (len(textos), dim) float32
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+
+def text_key(text: str) -> str:
+    """Hash del texto normalizado (NFC, espacios colapsados): mismo texto, misma clave."""
+    norm = re.sub(r"\s+", " ", normalize_text(text)).strip()
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path = EMBED_CACHE, model: str = ""):
+        self.path = path
+        self.model = model
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " vec BLOB NOT NULL, encode_ms REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model,)).fetchone()[0]
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Tuple[np.ndarray, float]]:
+        """{clave: (vector, ms que costó codificarlo)} de las claves presentes."""
+        out: Dict[str, Tuple[np.ndarray, float]] = {}
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), 500):  # límite de parámetros de SQLite
+            part = keys[i:i + 500]
+            rows = self._db.execute(
+                f"SELECT text_hash, vec, encode_ms FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(part))})",
+                [self.model, *part],
+            )
+            for key, blob, ms in rows:
+                out[key] = (np.frombuffer(blob, dtype=np.float32), ms)
+        return out
+
+    def put_many(self, items: Sequence[Tuple[str, np.ndarray, float]]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vec, encode_ms) VALUES (?, ?, ?, ?, ?)",
+            [(self.model, key, int(vec.size), np.asarray(vec, dtype=np.float32).tobytes(), ms)
+             for key, vec, ms in items],
+        )
+        self._db.commit()
+
+    def encode(self, texts: Sequence[str], encode_fn: EncodeFn,
+               batch_size: int = BATCH_SIZE) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Matriz (len(texts), dim) con los vectores de la caché y los de los
+        textos no vistos, codificados con encode_fn por lotes y guardados.
+        Devuelve además hits/misses, hit_rate, segundos de codificación y
+        segundos ahorrados.
+        """
+        keys = [text_key(t) for t in texts]
+        found = self.get_many(keys)
+        todo = {k: t for k, t in zip(keys, texts) if k not in found}  # textos repetidos: una vez
+        todo_keys = list(todo)
+        spent = 0.0
+        for i in range(0, len(todo_keys), max(1, batch_size)):
+            batch = todo_keys[i:i + max(1, batch_size)]
+            t0 = perf_counter()
+            X = np.asarray(encode_fn([todo[k] for k in batch]), dtype=np.float32)
+            dt = perf_counter() - t0
+            spent += dt
+            ms = dt * 1000.0 / len(batch)
+            self.put_many([(k, X[j], ms) for j, k in enumerate(batch)])
+            found.update((k, (X[j], ms)) for j, k in enumerate(batch))
+        hits = len(keys) - sum(1 for k in keys if k in todo)
+        dim = len(next(iter(found.values()))[0]) if found else 0
+        out = np.zeros((len(keys), dim), dtype=np.float32)
+        for i, k in enumerate(keys):
+            out[i] = found[k][0]
+        saved = sum(found[k][1] for k in keys if k not in todo) / 1000.0
+        return out, {
+            "texts": len(keys),
+            "hits": hits,
+            "misses": len(keys) - hits,
+            "encoded": len(todo_keys),
+            "hit_rate": round(hits / len(keys), 3) if keys else None,
+            "encode_s": round(spent, 3),
+            "saved_s": round(saved, 3),
+        }
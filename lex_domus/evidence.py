@@ -0,0 +1,122 @@
+# lex_domus/evidence.py — evidencia precalculada de los nodos de plantilla
+"""
+Las preguntas y referencias (encaje_ref) de los nodos de plantilla de
+verdiktia.inquiry_engine no dependen de la cláusula: su evidencia solo
+depende del corpus, de refs.json (pinpoints), de la versión del
+analizador y de los formatos de índice, de la política y de la propia
+plantilla. build_index la precalcula por jurisdicción en
+indices/node_evidence.json:
+
+    {"schema": 2, "corpus_sha": "...", "templates_sha": "...", "policy_sha": "...",
+     "refs_sha": "...", "index_version": "...",
+     "jurisdictions": {"ES": {"questions": {pregunta: respuesta SRA},
+                              "refs": {encaje_ref: respuesta pinpoint}}, ...}}
+
+y app.pipeline la sirve sin recuperar nada mientras todas las huellas
+coincidan con las vigentes; si alguna cambia, se ignora (y el siguiente
+build_index la regenera).
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import hashlib, json, os
+
+from .analyzer import ANALYZER_ID
+from .index import INDEX_SCHEMA, file_sha256
+from .refs import REFS, REFS_SCHEMA
+from .segments import SEGMENTS_SCHEMA
+
+ROOT = Path(__file__).resolve().parents[1]
+EVIDENCE = ROOT / "indices" / "node_evidence.json"
+EVIDENCE_SCHEMA = 2
+
+# Versión de todo lo que, sin cambiar el corpus, cambia lo que se recupera
+INDEX_VERSION = f"{ANALYZER_ID}|index{INDEX_SCHEMA}|segments{SEGMENTS_SCHEMA}|refs{REFS_SCHEMA}"
+
+_REFS_SHA: Dict[Path, Tuple[Tuple[int, int], str]] = {}
+
+
+def policy_sha(policy: Optional[Mapping[str, Any]]) -> str:
+    payload = json.dumps(policy or {}, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def refs_sha(path: Path = REFS) -> str:
+    """sha256 de refs.json ("" si no existe); se recalcula solo si cambian su tamaño o mtime."""
+    try:
+        st = path.stat()
+    except OSError:
+        return ""
+    key = (st.st_size, st.st_mtime_ns)
+    hit = _REFS_SHA.get(path)
+    if hit is None or hit[0] != key:
+        hit = _REFS_SHA[path] = (key, file_sha256(path))
+    return hit[1]
+
+
+def fingerprint(corpus_sha: str, templates_sha: str, policy: Optional[Mapping[str, Any]],
+                refs: str = "") -> Dict[str, str]:
+    return {"corpus_sha": corpus_sha, "templates_sha": templates_sha, "policy_sha": policy_sha(policy),
+            "refs_sha": refs, "index_version": INDEX_VERSION}
+
+
+class NodeEvidence:
+    """Tabla de evidencia precalculada (solo lectura)."""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self._jur: Dict[str, Dict[str, Dict[str, Any]]] = data.get("jurisdictions", {})
+
+    @classmethod
+    def load(cls, path: Path = EVIDENCE) -> Optional["NodeEvidence"]:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return None
+        return cls(data) if data.get("schema") == EVIDENCE_SCHEMA else None
+
+    def matches(self, fp: Mapping[str, str]) -> bool:
+        if not all(fp.get(k) for k in ("corpus_sha", "templates_sha", "policy_sha")):
+            return False
+        return all(self.data.get(k) == v for k, v in fp.items())
+
+    def question(self, jurisdiction: str, question: str) -> Optional[Dict[str, Any]]:
+        return self._jur.get(jurisdiction, {}).get("questions", {}).get(question)
+
+    def ref(self, jurisdiction: str, ref: str) -> Optional[Dict[str, Any]]:
+        return self._jur.get(jurisdiction, {}).get("refs", {}).get(ref)
+
+    def __len__(self) -> int:
+        return sum(len(j.get("questions", {})) + len(j.get("refs", {})) for j in self._jur.values())
+
+
+def build_evidence(nodes_by_jurisdiction: Mapping[str, List[Mapping[str, Any]]], corpus_sha: str,
+                   templates_sha: str, policy: Dict[str, Any], path: Path = EVIDENCE,
+                   force: bool = False, refs_path: Path = REFS) -> Dict[str, Any]:
+    """
+    Precalcula la respuesta SRA de cada pregunta y la pinpoint de cada
+    encaje_ref de los nodos, por jurisdicción, con las mismas funciones que
+    usa el pipeline. No rehace nada si las huellas del fichero ya coinciden.
+    """
+    from .rag_pipeline import pinpoint_answer, source_required_answer_many
+
+    fp = fingerprint(corpus_sha, templates_sha, policy, refs_sha(refs_path))
+    current = NodeEvidence.load(path)
+    if not force and current is not None and current.matches(fp):
+        return {"rebuilt": False, "entries": len(current)}
+
+    out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for jur, nodes in nodes_by_jurisdiction.items():
+        questions = list(dict.fromkeys(n.get("question") or n.get("pregunta") or "" for n in nodes))
+        questions = [q for q in questions if q]
+        refs = list(dict.fromkeys(n["encaje_ref"] for n in nodes if n.get("encaje_ref")))
+        answers = source_required_answer_many(questions, jurisdiction=jur, policy=policy) if questions else []
+        out[jur] = {
+            "questions": dict(zip(questions, answers)),
+            "refs": {ref: pinpoint_answer(ref, jurisdiction=jur, policy=policy) for ref in refs},
+        }
+    table = NodeEvidence({"schema": EVIDENCE_SCHEMA, **fp, "jurisdictions": out})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(table.data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    return {"rebuilt": True, "entries": len(table)}
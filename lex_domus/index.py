@@ -0,0 +1,648 @@
+# lex_domus/index.py — índice invertido CSR (término x documento) sobre chunks.jsonl
+from pathlib import Path
+from functools import reduce
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import hashlib, heapq, json, mmap, re
+
+import numpy as np
+
+from .analyzer import ANALYZER_ID, analyze_positions
+from .chunk_table import ChunkTable
+from .dedup import is_alias
+from .index_file import open_index, write_index
+
+# Parámetros BM25 (mismos valores por defecto que rank_bm25.BM25Okapi)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Versión del esquema de secciones que escribe/lee InvertedIndex
+INDEX_SCHEMA = 5
+
+# Campos con bitmap de filtrado (un bitmap por valor distinto)
+FILTER_FIELDS = ("source", "jurisdiction", "family")
+
+Filters = Optional[Dict[str, Iterable[str]]]
+
+# Frases entre comillas en la consulta: "a b c" (exacta) o "a b c"~N (proximidad:
+# los términos, en cualquier orden, hasta N posiciones más separados que en la frase)
+_PHRASE = re.compile(r'"([^"]+)"(?:~(\d+))?')
+
+# Refuerzo aditivo de un documento que contiene la frase: la exacta vuelve a
+# sumar la puntuación de sus términos; la de proximidad, la mitad
+PHRASE_BOOST = 1.0
+NEAR_BOOST = 0.5
+
+# ((término, offset relativo), ...), slop (None = frase exacta)
+Phrase = Tuple[Tuple[Tuple[str, int], ...], Optional[int]]
+
+Analyzer = Callable[[str], List[Tuple[str, int]]]
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def scan_chunks(path: Path) -> Tuple[List[Dict[str, Any]], List[int], List[int]]:
+    """Registros de chunks.jsonl con el offset/longitud en bytes de cada línea."""
+    records, offsets, lengths = [], [], []
+    pos = 0
+    with path.open("rb") as f:
+        for raw in f:
+            line = raw.rstrip(b"\r\n")
+            start, pos = pos, pos + len(raw)
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except Exception:
+                continue
+            offsets.append(start)
+            lengths.append(len(line))
+    return records, offsets, lengths
+
+
+def read_chunks(path: Path) -> List[Dict[str, Any]]:
+    return scan_chunks(path)[0]
+
+
+def parse_query(query: str, analyzer: Analyzer = analyze_positions) -> Tuple[List[str], List[Phrase]]:
+    """
+    Términos analizados de la consulta (comillas incluidas) y sus frases. Una
+    sola palabra entre comillas no es frase: cuenta como término normal.
+    """
+    phrases: List[Phrase] = []
+    for m in _PHRASE.finditer(query or ""):
+        toks = analyzer(m.group(1))
+        if len(toks) < 2:
+            continue
+        p0 = toks[0][1]
+        slop = int(m.group(2)) if m.group(2) is not None else None
+        phrases.append((tuple((t, p - p0) for t, p in toks), slop))
+    plain = _PHRASE.sub(lambda m: f" {m.group(1)} ", query or "")
+    return [t for t, _ in analyzer(plain)], phrases
+
+
+def _min_window(pos_lists: Sequence[np.ndarray]) -> int:
+    """Menor (max - min) de una ventana con una posición de cada lista (listas ordenadas)."""
+    heap = [(int(p[0]), i, 0) for i, p in enumerate(pos_lists)]
+    heapq.heapify(heap)
+    hi = max(h[0] for h in heap)
+    best = hi - heap[0][0]
+    while True:
+        lo, i, j = heapq.heappop(heap)
+        best = min(best, hi - lo)
+        if j + 1 == len(pos_lists[i]):
+            return best
+        nxt = int(pos_lists[i][j + 1])
+        hi = max(hi, nxt)
+        heapq.heappush(heap, (nxt, i, j + 1))
+
+
+def _top_k(scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """Top-k por puntuación descendente (solo > 0); empates en orden de corpus."""
+    cand = np.flatnonzero(scores > 0)
+    if k <= 0 or cand.size == 0:
+        return []
+    if cand.size > k:
+        # argpartition deja en cabeza los k mayores (sin ordenar); se amplía
+        # hasta el k-ésimo valor para no romper empates por orden de corpus
+        part = cand[np.argpartition(-scores[cand], k - 1)[:k]]
+        kth = scores[part].min()
+        cand = cand[scores[cand] >= kth]
+    order = np.lexsort((cand, -scores[cand]))[:k]
+    top = cand[order]
+    return [(int(d), float(scores[d])) for d in top]
+
+
+def source_key(label: str) -> str:
+    """
+    Forma canónica de una etiqueta de fuente para comparar metadatos y política:
+    "WIPO/OMPI" -> "wipo", "USC (Cornell/LII)" -> "usc", "EUR-Lex" -> "eur-lex".
+    """
+    return re.split(r"\s*[/(]", (label or "").strip(), maxsplit=1)[0].strip().casefold()
+
+
+def _build_bitmaps(records: Sequence[Dict[str, Any]]) -> Dict[str, Tuple[List[str], np.ndarray]]:
+    """Por campo: (valores distintos, bitmaps empaquetados n_valores x ceil(n_docs/8))."""
+    out = {}
+    for field in FILTER_FIELDS:
+        values: Dict[str, int] = {}
+        codes = np.fromiter(
+            (values.setdefault(str(r.get(field) or ""), len(values)) for r in records),
+            dtype=np.int32, count=len(records),
+        )
+        dense = np.zeros((len(values), len(records)), dtype=bool)
+        dense[codes, np.arange(len(records))] = True
+        out[field] = (list(values), np.packbits(dense, axis=1))
+    return out
+
+
+def _string_table(items: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode("utf-8") for s in items]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class _StringTable:
+    """Tabla de cadenas (blob UTF-8 + offsets) leída bajo demanda del mmap."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._off = offsets
+
+    def __len__(self) -> int:
+        return len(self._off) - 1
+
+    def raw(self, i: int) -> bytes:
+        return self._blob[int(self._off[i]):int(self._off[i + 1])].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode("utf-8")
+
+
+class _SortedVocab(_StringTable):
+    """Vocabulario ordenado por bytes UTF-8: búsqueda binaria, sin dict en memoria."""
+
+    def get(self, term: str, default: Optional[int] = None) -> Optional[int]:
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self.raw(lo) == key:
+            return lo
+        return default
+
+
+class _ChunkRecords:
+    """Registros de chunks.jsonl referenciados por offset: se parsean al pedirlos."""
+
+    def __init__(self, path: Path, offsets: np.ndarray, lengths: np.ndarray):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._off = offsets
+        self._len = lengths
+
+    def __len__(self) -> int:
+        return len(self._off)
+
+    def raw(self, doc: int) -> bytes:
+        o = int(self._off[doc])
+        return self._mm[o:o + int(self._len[doc])]
+
+    def __getitem__(self, doc: int) -> Dict[str, Any]:
+        return json.loads(self.raw(doc))
+
+
+class BM25Stats:
+    """
+    Estadísticas BM25 de una colección (nº de docs vivos, longitud media y df
+    por término) compartidas por varios índices: con ellas el peso de cada
+    posting se calcula al consultar desde tf, en vez de leer post_w.
+    """
+
+    def __init__(self, n_docs: int, avgdl: float, df: Callable[[str], int]):
+        self.n_docs = n_docs
+        self.avgdl = avgdl or 1.0
+        self._df = df
+        self._idf: Dict[str, float] = {}
+
+    def idf(self, term: str) -> float:
+        v = self._idf.get(term)
+        if v is None:
+            df = self._df(term)
+            v = self._idf[term] = float(np.log1p((self.n_docs - df + 0.5) / (df + 0.5)))
+        return v
+
+
+class _Searchable:
+    """Consulta de texto sobre score/score_many (compartido por InvertedIndex y SegmentedIndex)."""
+
+    analyzer: Analyzer = staticmethod(analyze_positions)
+
+    def terms(self, text: str) -> List[str]:
+        return [t for t, _ in self.analyzer(text)]
+
+    def parse(self, query: str) -> Tuple[List[str], List[Phrase]]:
+        return parse_query(query, self.analyzer)
+
+    def query_key(self, query: str) -> Tuple:
+        """Clave hashable de lo que determina el ranking de `query` (términos y frases)."""
+        terms, phrases = self.parse(query)
+        return frozenset(terms), tuple(phrases)
+
+    def search(self, query: str, k: int = 6, scoring: str = "overlap",
+               filters: Filters = None) -> List[Tuple[int, float]]:
+        """
+        Top-k (doc, score) por puntuación descendente; empates en orden de corpus.
+        Admite frases entre comillas: "derechos morales", "obras futuras"~3.
+        """
+        terms, phrases = self.parse(query)
+        return _top_k(self.score(terms, scoring=scoring, filters=filters, phrases=phrases), k)
+
+    def search_many(self, queries: Sequence[str], k: int = 6, scoring: str = "overlap",
+                    filters: Filters = None) -> List[List[Tuple[int, float]]]:
+        parsed = [self.parse(q) for q in queries]
+        scores = self.score_many([t for t, _ in parsed], scoring=scoring, filters=filters,
+                                 phrases=[p for _, p in parsed])
+        return [_top_k(row, k) for row in scores]
+
+
+class InvertedIndex(_Searchable):
+    """
+    Matriz término x documento en CSR (indptr / post_docs / post_tf) con el
+    peso BM25 de cada posting precalculado (o calculado al consultar con las
+    estadísticas `stats` de la colección, si es un segmento de SegmentedIndex).
+    Puntuar una consulta es sumar las filas de sus términos (producto
+    disperso); varias consultas se puntúan de una vez. `corpus_sha` identifica el chunks.jsonl del que se construyó.
+
+    Construido en memoria guarda los registros; cargado de disco (load) todo
+    son vistas sobre el mmap del índice y los chunks se leen por offset.
+
+    Los términos son la forma analizada (lex_domus.analyzer): el texto de los
+    documentos se analiza una sola vez al construir; las consultas pasan por
+    el mismo `analyzer`. Cada posting guarda además las posiciones del término
+    en el documento (pos_ptr / positions, contando también las stopwords), lo
+    que permite reforzar frases exactas y de proximidad sin releer el texto.
+
+    Guardado sin offsets (segmentos) solo lleva los doc_id: los registros
+    los resuelve quien lo abre (SegmentedIndex, contra el chunks.jsonl vigente).
+    """
+
+    def __init__(self, vocab, indptr: np.ndarray, post_docs: np.ndarray,
+                 post_tf: np.ndarray, doc_len: np.ndarray, records,
+                 corpus_sha: str = "", post_w: Optional[np.ndarray] = None,
+                 doc_table=None, chunk_off=None, chunk_len=None, bitmaps=None,
+                 pos_ptr: Optional[np.ndarray] = None, positions: Optional[np.ndarray] = None,
+                 analyzer: Analyzer = analyze_positions):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.post_docs = post_docs
+        self.post_tf = post_tf
+        self.doc_len = doc_len
+        self.records = records
+        self.corpus_sha = corpus_sha
+        self.post_w = post_w if post_w is not None else self._bm25_weights()
+        if doc_table is None:
+            doc_table = records.doc_ids if isinstance(records, ChunkTable) else [r.get("doc_id", "") for r in records]
+        self.doc_table = doc_table
+        self.chunk_off = chunk_off
+        self.chunk_len = chunk_len
+        self.bitmaps = bitmaps if bitmaps is not None else _build_bitmaps(records)
+        self.pos_ptr = pos_ptr
+        self.positions = positions
+        self.analyzer = analyzer
+        self.stats: Optional[BM25Stats] = None
+        self.sections: Dict[str, np.ndarray] = {}
+        self._masks: Dict[Tuple, Optional[np.ndarray]] = {}
+        self._doc_index: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.vocab)
+
+    @property
+    def n_postings(self) -> int:
+        return int(self.post_docs.size)
+
+    def _bm25_weights(self) -> np.ndarray:
+        n_docs = len(self.doc_len)
+        if not n_docs or not self.post_docs.size:
+            return np.zeros(0, dtype=np.float32)
+        avgdl = float(self.doc_len.mean()) or 1.0
+        df = np.diff(self.indptr).astype(np.float64)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        term_of = np.repeat(np.arange(len(df)), np.diff(self.indptr))
+        tf = self.post_tf.astype(np.float64)
+        norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_len[self.post_docs] / avgdl)
+        return (idf[term_of] * tf * (BM25_K1 + 1.0) / norm).astype(np.float32)
+
+    # --------- Construcción ---------
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], corpus_sha: str = "",
+                     analyzer: Analyzer = analyze_positions, **kwargs) -> "InvertedIndex":
+        # en memoria, los registros van por columnas (ChunkTable), no como un dict por chunk
+        records = records if isinstance(records, ChunkTable) else ChunkTable.from_records(records)
+        seen: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        pos_lists: List[List[int]] = []
+        doc_len = np.zeros(len(records), dtype=np.int32)
+        for doc, rec in enumerate(records):
+            tokens = analyzer(rec.get("text", ""))
+            doc_len[doc] = len(tokens)
+            occ: Dict[str, List[int]] = {}
+            for t, p in tokens:
+                occ.setdefault(t, []).append(p)
+            for t, ps in occ.items():
+                rows.append(seen.setdefault(t, len(seen)))
+                cols.append(doc)
+                pos_lists.append(ps)
+        # ids de término = rango en el vocabulario ordenado (bytes UTF-8)
+        terms = sorted(seen, key=lambda t: t.encode("utf-8"))
+        rank = np.empty(len(terms), dtype=np.int32)
+        rank[[seen[t] for t in terms]] = np.arange(len(terms), dtype=np.int32)
+        row_arr = rank[np.asarray(rows, dtype=np.int32)] if rows else np.zeros(0, dtype=np.int32)
+        order = np.argsort(row_arr, kind="stable")  # dentro de cada término, doc ascendente
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_arr, minlength=len(terms)), out=indptr[1:])
+        counts = np.fromiter((len(pos_lists[i]) for i in order), dtype=np.int64, count=len(order))
+        pos_ptr = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(counts, out=pos_ptr[1:])
+        positions = np.fromiter(
+            chain.from_iterable(pos_lists[i] for i in order), dtype=np.uint32, count=int(pos_ptr[-1])
+        )
+        return cls(
+            vocab={t: i for i, t in enumerate(terms)},
+            indptr=indptr,
+            post_docs=np.asarray(cols, dtype=np.int32)[order],
+            post_tf=np.minimum(counts, 0xFFFF).astype(np.uint16),
+            doc_len=doc_len,
+            records=records,
+            corpus_sha=corpus_sha,
+            pos_ptr=pos_ptr,
+            positions=positions,
+            analyzer=analyzer,
+            **kwargs,
+        )
+
+    @classmethod
+    def from_chunks(cls, path: Path) -> "InvertedIndex":
+        """Índice de chunks.jsonl sin los chunks alias de otro (casi duplicados, ver lex_domus.dedup)."""
+        records, offsets, lengths = scan_chunks(path)
+        keep = [i for i, r in enumerate(records) if not is_alias(r)]
+        if len(keep) < len(records):
+            records = [records[i] for i in keep]
+            offsets = [offsets[i] for i in keep]
+            lengths = [lengths[i] for i in keep]
+        return cls.from_records(
+            records,
+            corpus_sha=file_sha256(path),
+            chunk_off=np.asarray(offsets, dtype=np.int64),
+            chunk_len=np.asarray(lengths, dtype=np.int32),
+        )
+
+    # --------- Persistencia (formato LXIDX, ver index_file.py) ---------
+
+    def save(self, path: Path, offsets: bool = True,
+             extra: Optional[Dict[str, np.ndarray]] = None) -> None:
+        """
+        Escribe el índice. Por defecto referencia los chunks por offset en
+        chunks.jsonl (índice construido con from_chunks); con offsets=False
+        no guarda nada de los registros salvo el doc_id. `extra` = secciones adicionales.
+        """
+        if self.chunk_off is None and offsets:
+            raise ValueError("solo se persisten índices construidos desde chunks.jsonl (from_chunks)")
+        if self.analyzer is not analyze_positions:
+            raise ValueError("solo se persisten índices con el analizador por defecto")
+        terms = sorted(self.vocab, key=self.vocab.__getitem__)
+        vocab_blob, vocab_off = _string_table(terms)
+        docid_blob, docid_off = _string_table(list(self.doc_table))
+        sections = {}
+        for field, (values, packed) in self.bitmaps.items():
+            sections[f"bm_{field}_blob"], sections[f"bm_{field}_off"] = _string_table(list(values))
+            sections[f"bm_{field}"] = packed
+        if offsets:
+            sections["chunk_off"], sections["chunk_len"] = self.chunk_off, self.chunk_len
+        write_index(path, {
+            "vocab_blob": vocab_blob,
+            "vocab_off": vocab_off,
+            "indptr": self.indptr,
+            "post_docs": self.post_docs,
+            "post_tf": self.post_tf,
+            "post_w": self.post_w,
+            "pos_ptr": self.pos_ptr,
+            "positions": self.positions,
+            "doc_len": self.doc_len,
+            "docid_blob": docid_blob,
+            "docid_off": docid_off,
+            **sections,
+            **(extra or {}),
+        }, {
+            "kind": "bm25",
+            "schema": INDEX_SCHEMA,
+            "analyzer": ANALYZER_ID,
+            "corpus_sha": self.corpus_sha,
+            "offsets": offsets,
+            "n_docs": len(self),
+            "n_terms": self.n_terms,
+            "k1": BM25_K1,
+            "b": BM25_B,
+        })
+
+    @classmethod
+    def load(cls, path: Path, chunks: Optional[Path] = None, records=None) -> "InvertedIndex":
+        """
+        Abre un índice LXIDX; con offsets, `chunks` debe ser su chunks.jsonl.
+        Sin offsets (segmentos) los registros los aporta `records`; si no se
+        dan, el índice puntúa y da doc_id pero no registros.
+        """
+        meta, s, _mm = open_index(path)
+        if meta.get("schema", 1) != INDEX_SCHEMA:
+            raise ValueError(f"esquema de índice {meta.get('schema', 1)} != {INDEX_SCHEMA}; reconstruye el índice")
+        if meta.get("analyzer") != ANALYZER_ID:
+            raise ValueError(f"analizador {meta.get('analyzer')} != {ANALYZER_ID}; reconstruye el índice")
+        if (meta.get("k1"), meta.get("b")) != (BM25_K1, BM25_B):
+            raise ValueError("parámetros BM25 distintos; reconstruye el índice")
+        if meta.get("offsets"):
+            if chunks is None or meta.get("corpus_sha") != file_sha256(chunks):
+                raise ValueError("índice desalineado con chunks.jsonl")
+            records = _ChunkRecords(chunks, s["chunk_off"], s["chunk_len"])
+        idx = cls(
+            vocab=_SortedVocab(s["vocab_blob"], s["vocab_off"]),
+            indptr=s["indptr"],
+            post_docs=s["post_docs"],
+            post_tf=s["post_tf"],
+            post_w=s["post_w"],
+            pos_ptr=s["pos_ptr"],
+            positions=s["positions"],
+            doc_len=s["doc_len"],
+            records=records,
+            corpus_sha=meta["corpus_sha"],
+            doc_table=_StringTable(s["docid_blob"], s["docid_off"]),
+            chunk_off=s.get("chunk_off"),
+            chunk_len=s.get("chunk_len"),
+            bitmaps={
+                f: (_StringTable(s[f"bm_{f}_blob"], s[f"bm_{f}_off"]), s[f"bm_{f}"]) for f in FILTER_FIELDS
+            },
+        )
+        idx.sections = s
+        return idx
+
+    # --------- Filtros (bitmaps por valor de metadato) ---------
+
+    def mask(self, filters: Filters) -> Optional[np.ndarray]:
+        """
+        Máscara booleana (n_docs,) de documentos admitidos: AND entre campos,
+        OR entre valores de un campo. Las fuentes se comparan por source_key
+        ("WIPO" admite "WIPO/OMPI"). Los documentos sin valor en un campo no
+        se excluyen por ese campo. None = sin filtro.
+        """
+        if not filters:
+            return None
+        spec = tuple(sorted(
+            (field, frozenset(values)) for field, values in filters.items() if values is not None
+        ))
+        if spec in self._masks:
+            return self._masks[spec]
+        n_docs = len(self.doc_len)
+        packed_all = None
+        for field, wanted in spec:
+            if field not in self.bitmaps:
+                raise ValueError(f"campo sin bitmap de filtrado: {field}")
+            values, packed = self.bitmaps[field]
+            norm = source_key if field == "source" else (lambda v: v)
+            keys = {norm(w) for w in wanted}
+            rows = [i for i in range(len(values)) if values[i] == "" or norm(values[i]) in keys]
+            field_bits = (np.bitwise_or.reduce(packed[rows], axis=0) if rows
+                          else np.zeros(packed.shape[1], dtype=np.uint8))
+            packed_all = field_bits if packed_all is None else packed_all & field_bits
+        mask = None if packed_all is None else np.unpackbits(packed_all, count=n_docs).astype(bool)
+        if len(self._masks) >= 64:
+            self._masks.clear()
+        self._masks[spec] = mask
+        return mask
+
+    # --------- Consulta ---------
+
+    def _lookup(self, query_tokens: Iterable[str]) -> List[Tuple[int, str]]:
+        """(id, término) de los términos de la consulta presentes en el vocabulario, por id."""
+        found = ((self.vocab.get(t), t) for t in set(query_tokens))
+        return sorted((i, t) for i, t in found if i is not None)
+
+    def _term_ids(self, query_tokens: Iterable[str]) -> List[int]:
+        return [i for i, _ in self._lookup(query_tokens)]
+
+    def _weights(self, term: str, idx) -> np.ndarray:
+        """Peso BM25 de las postings `idx` (slice o array) de `term`."""
+        if self.stats is None:
+            return self.post_w[idx]
+        tf = self.post_tf[idx].astype(np.float64)
+        norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_len[self.post_docs[idx]] / self.stats.avgdl)
+        return (self.stats.idf(term) * tf * (BM25_K1 + 1.0) / norm).astype(np.float32)
+
+    def _postings(self, terms: Sequence[Tuple[int, str]], scoring: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if scoring not in ("overlap", "bm25"):
+            raise ValueError(f"scoring desconocido: {scoring}")
+        if not terms:
+            return np.zeros(0, dtype=np.int32), None
+        sl = [(slice(self.indptr[t], self.indptr[t + 1]), term) for t, term in terms]
+        docs = np.concatenate([self.post_docs[s] for s, _ in sl])
+        w = np.concatenate([self._weights(term, s) for s, term in sl]) if scoring == "bm25" else None
+        return docs, w
+
+    def _positions(self, posting: int) -> np.ndarray:
+        return self.positions[self.pos_ptr[posting]:self.pos_ptr[posting + 1]]
+
+    def phrase_match(self, phrase: Phrase, scoring: str = "bm25") -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (docs, refuerzo) de los documentos que contienen la frase: exacta si
+        slop es None (mismos offsets relativos), o con todos sus términos en
+        una ventana de como mucho span + slop posiciones. El refuerzo es la
+        puntuación de los términos de la frase en el doc (x PHRASE_BOOST o
+        NEAR_BOOST). Se resuelve solo con postings y posiciones.
+        """
+        terms, slop = phrase
+        empty = (np.zeros(0, dtype=np.int32), np.zeros(0))
+        if self.positions is None:
+            return empty
+        ids = [self.vocab.get(t) for t, _ in terms]
+        if not ids or any(i is None for i in ids):
+            return empty
+        uniq = sorted(set(ids))
+        docs = reduce(np.intersect1d, [self.post_docs[self.indptr[t]:self.indptr[t + 1]] for t in uniq])
+        if not docs.size:
+            return empty
+        # índice de posting de (término, doc): post_docs está ordenado por doc dentro de cada término
+        pidx = {
+            t: self.indptr[t] + np.searchsorted(self.post_docs[self.indptr[t]:self.indptr[t + 1]], docs)
+            for t in uniq
+        }
+        span = max(off for _, off in terms)
+        keep = np.zeros(docs.size, dtype=bool)
+        for j in range(docs.size):
+            pos = {t: self._positions(int(pidx[t][j])) for t in uniq}
+            if slop is None:
+                starts = reduce(np.intersect1d, [pos[t].astype(np.int64) - off for t, (_, off) in zip(ids, terms)])
+                keep[j] = starts.size > 0
+            else:
+                keep[j] = _min_window(list(pos.values())) <= span + slop
+        if scoring == "bm25":
+            term_of = dict(zip(ids, (t for t, _ in terms)))
+            boost = np.sum([self._weights(term_of[t], pidx[t][keep]) for t in uniq], axis=0, dtype=np.float64)
+        else:
+            boost = np.full(int(keep.sum()), float(len(uniq)))
+        return docs[keep], boost * (PHRASE_BOOST if slop is None else NEAR_BOOST)
+
+    def _boost(self, scores: np.ndarray, phrases: Sequence[Phrase], scoring: str) -> None:
+        for phrase in phrases:
+            docs, boost = self.phrase_match(phrase, scoring)
+            scores[docs] += boost
+
+    def score(self, query_tokens: Iterable[str], scoring: str = "overlap", filters: Filters = None,
+              phrases: Sequence[Phrase] = ()) -> np.ndarray:
+        """
+        Vector de puntuaciones (n_docs,) para términos ya analizados:
+        - overlap: nº de términos distintos de la consulta presentes en el doc.
+        - bm25: Okapi BM25 (idf no negativo).
+        Más el refuerzo de cada frase de `phrases` (ver phrase_match).
+        Los documentos fuera de `filters` puntúan 0 (no entran en el top-k).
+        """
+        docs, w = self._postings(self._lookup(query_tokens), scoring)
+        scores = np.bincount(docs, weights=w, minlength=len(self.doc_len)).astype(np.float64)
+        self._boost(scores, phrases, scoring)
+        mask = self.mask(filters)
+        if mask is not None:
+            scores *= mask
+        return scores
+
+    def score_many(self, queries_tokens: Sequence[Iterable[str]], scoring: str = "overlap",
+                   filters: Filters = None, phrases: Optional[Sequence[Sequence[Phrase]]] = None) -> np.ndarray:
+        """
+        Matriz (n_queries, n_docs) = Q · W con Q la matriz consulta x término:
+        un único bincount sobre las postings de todas las consultas.
+        `phrases`, si se da, es la lista de frases de cada consulta.
+        """
+        n_docs = len(self.doc_len)
+        flat, weights = [], []
+        for qi, toks in enumerate(queries_tokens):
+            docs, w = self._postings(self._lookup(toks), scoring)
+            flat.append(docs.astype(np.int64) + qi * n_docs)
+            weights.append(w if w is not None else np.ones(docs.size, dtype=np.float32))
+        nq = len(flat)
+        if not nq:
+            return np.zeros((0, n_docs))
+        scores = np.bincount(
+            np.concatenate(flat), weights=np.concatenate(weights), minlength=nq * n_docs
+        ).reshape(nq, n_docs)
+        for qi, qphrases in enumerate(phrases or ()):
+            self._boost(scores[qi], qphrases, scoring)
+        mask = self.mask(filters)
+        if mask is not None:
+            scores *= mask
+        return scores
+
+    def record(self, doc: int) -> Mapping[str, Any]:
+        return self.records[doc]
+
+    def doc_id(self, doc: int) -> str:
+        return self.doc_table[doc]
+
+    def doc_index(self, doc_id: str) -> Optional[int]:
+        """Posición de `doc_id` en el índice (dict inverso construido la primera vez)."""
+        if self._doc_index is None:
+            self._doc_index = {self.doc_table[i]: i for i in range(len(self.doc_table))}
+        return self._doc_index.get(doc_id)
@@ -0,0 +1,67 @@
+# lex_domus/index_file.py — contenedor binario versionado para índices (mmap)
+"""
+Formato (little-endian):
+
+    MAGIC (8 bytes) | versión u32 | longitud cabecera u32 | cabecera JSON | secciones
+
+La cabecera describe cada sección {dtype, shape, offset} más metadatos libres
+(corpus_sha, parámetros BM25...). Las secciones van alineadas a 8 bytes para
+poder abrirlas como vistas np.frombuffer sobre un mmap de solo lectura: abrir
+el índice no copia datos y la memoria residente crece solo con lo que se lee.
+"""
+from pathlib import Path
+from typing import Any, Dict, Tuple
+import json, mmap, os, struct
+
+import numpy as np
+
+MAGIC = b"LXIDX\x00\x00\x00"
+VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+_ALIGN = 8
+
+
+def _pad(n: int) -> int:
+    return (-n) % _ALIGN
+
+
+def write_index(path: Path, sections: Dict[str, np.ndarray], meta: Dict[str, Any]) -> None:
+    """Escribe atómicamente (tmp + rename) para no dejar índices a medias."""
+    arrays = {name: np.ascontiguousarray(arr) for name, arr in sections.items()}
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += arr.nbytes + _pad(arr.nbytes)
+    header = json.dumps({"meta": meta, "sections": layout}, ensure_ascii=False).encode("utf-8")
+    header += b" " * _pad(_PREFIX.size + len(header))
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for arr in arrays.values():
+            f.write(arr.tobytes())
+            f.write(b"\0" * _pad(arr.nbytes))
+    os.replace(tmp, path)
+
+
+def open_index(path: Path) -> Tuple[Dict[str, Any], Dict[str, np.ndarray], mmap.mmap]:
+    """Devuelve (meta, secciones como vistas de solo lectura, mmap)."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, hlen = _PREFIX.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path.name}: no es un índice LXIDX")
+    if version != VERSION:
+        raise ValueError(f"{path.name}: versión {version} no soportada (esperada {VERSION})")
+    header = json.loads(mm[_PREFIX.size:_PREFIX.size + hlen].decode("utf-8"))
+    base = _PREFIX.size + hlen
+    sections = {}
+    for name, s in header["sections"].items():
+        dtype = np.dtype(s["dtype"])
+        count = int(np.prod(s["shape"])) if s["shape"] else 1
+        if count == 0:
+            sections[name] = np.zeros(s["shape"], dtype=dtype)
+            continue
+        arr = np.frombuffer(mm, dtype=dtype, count=count, offset=base + s["offset"])
+        sections[name] = arr.reshape(s["shape"])
+    return header["meta"], sections, mm
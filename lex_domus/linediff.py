@@ -0,0 +1,177 @@
+# lex_domus/linediff.py — diff de textos largos por huellas de línea (tiempo ~lineal)
+"""
+difflib.SequenceMatcher es cuadrático en el peor caso: con la LPI completa
+(~470 KB) un snapshot cambiado puede tardar minutos. Aquí cada línea se
+reduce a una huella (hash de la línea con la misma normalización que aplica
+ingest: NFC y sin espacios de borde; los espacios internos cuentan, porque
+ingest los conserva en el texto de los chunks) y el alineamiento trabaja
+solo con huellas:
+
+  1. prefijo y sufijo comunes;
+  2. anclas: huellas que aparecen una sola vez en cada versión, quedándose
+     con la subsecuencia creciente más larga (estilo patience diff,
+     O(n log n));
+  3. entre anclas consecutivas se extienden las coincidencias por delante
+     y por detrás; lo que queda es un bloque reemplazado.
+
+Los opcodes tienen la forma de difflib (tag, i1, i2, j1, j2), y unified_diff
+produce el mismo formato que difflib.unified_diff. La similitud es el
+coeficiente de Dice sobre el multiconjunto de huellas de líneas no vacías.
+"""
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterator, List, Sequence, Tuple
+import hashlib
+
+from .analyzer import normalize_text
+
+Opcode = Tuple[str, int, int, int, int]
+
+def fingerprint(line: str) -> int:
+    """Huella de 64 bits de la línea tal como la ve ingest (0 = línea en blanco)."""
+    norm = normalize_text(line).strip()
+    if not norm:
+        return 0
+    return int.from_bytes(hashlib.blake2b(norm.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+def fingerprints(lines: Sequence[str]) -> List[int]:
+    return [fingerprint(l) for l in lines]
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Dice de las huellas compartidas (1.0 = mismas líneas; ignora líneas en blanco)."""
+    ca = Counter(h for h in a if h)
+    cb = Counter(h for h in b if h)
+    total = sum(ca.values()) + sum(cb.values())
+    if not total:
+        return 1.0
+    shared = sum(min(n, cb[h]) for h, n in ca.items() if h in cb)
+    return 2.0 * shared / total
+
+
+def _anchors(a: Sequence[int], b: Sequence[int], alo: int, ahi: int, blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """Pares (i, j) de huellas únicas en ambos tramos, en la subsecuencia creciente más larga."""
+    count: Dict[int, List[int]] = {}
+    for i in range(alo, ahi):
+        c = count.setdefault(a[i], [0, i, 0, -1])
+        c[0] += 1
+    for j in range(blo, bhi):
+        c = count.get(b[j])
+        if c is not None:
+            c[2] += 1
+            c[3] = j
+    pairs = sorted((c[1], c[3]) for h, c in count.items() if h and c[0] == 1 and c[2] == 1)
+    # LIS sobre j (patience sorting): tails[k] = índice del par que termina la mejor secuencia de longitud k+1
+    tails: List[int] = []
+    tail_j: List[int] = []
+    prev = [-1] * len(pairs)
+    for k, (_i, j) in enumerate(pairs):
+        pos = bisect_left(tail_j, j)
+        if pos:
+            prev[k] = tails[pos - 1]
+        if pos == len(tails):
+            tails.append(k)
+            tail_j.append(j)
+        else:
+            tails[pos] = k
+            tail_j[pos] = j
+    out: List[Tuple[int, int]] = []
+    k = tails[-1] if tails else -1
+    while k != -1:
+        out.append(pairs[k])
+        k = prev[k]
+    return out[::-1]
+
+
+def opcodes(a: Sequence[int], b: Sequence[int]) -> List[Opcode]:
+    """Opcodes estilo difflib que transforman la secuencia de huellas `a` en `b`."""
+    ops: List[Opcode] = []
+
+    def emit(tag: str, i1: int, i2: int, j1: int, j2: int) -> None:
+        if i1 == i2 and j1 == j2:
+            return
+        if ops and ops[-1][0] == tag:
+            ops[-1] = (tag, ops[-1][1], i2, ops[-1][3], j2)
+        else:
+            ops.append((tag, i1, i2, j1, j2))
+
+    def gap(i1: int, i2: int, j1: int, j2: int) -> None:
+        # tramo sin anclas: coincidencias por delante y por detrás, el resto reemplazado
+        s = 0
+        while i1 + s < i2 and j1 + s < j2 and a[i1 + s] == b[j1 + s]:
+            s += 1
+        e = 0
+        while i2 - e > i1 + s and j2 - e > j1 + s and a[i2 - e - 1] == b[j2 - e - 1]:
+            e += 1
+        emit("equal", i1, i1 + s, j1, j1 + s)
+        i1, j1 = i1 + s, j1 + s
+        if i1 < i2 - e and j1 < j2 - e:
+            emit("replace", i1, i2 - e, j1, j2 - e)
+        elif i1 < i2 - e:
+            emit("delete", i1, i2 - e, j1, j1)
+        elif j1 < j2 - e:
+            emit("insert", i1, i1, j1, j2 - e)
+        emit("equal", i2 - e, i2, j2 - e, j2)
+
+    i, j = 0, 0
+    for ai, bj in _anchors(a, b, 0, len(a), 0, len(b)):
+        gap(i, ai, j, bj)
+        emit("equal", ai, ai + 1, bj, bj + 1)
+        i, j = ai + 1, bj + 1
+    gap(i, len(a), j, len(b))
+    return ops
+
+
+def _grouped(ops: List[Opcode], n: int = 3) -> Iterator[List[Opcode]]:
+    """Hunks con `n` líneas de contexto (misma lógica que SequenceMatcher.get_grouped_opcodes)."""
+    codes = list(ops) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    nn = n + n
+    group: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > nn:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _range(start: int, stop: int) -> str:
+    length = stop - start
+    beginning = start + 1
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified_diff(a: Sequence[str], b: Sequence[str], ops: List[Opcode],
+                 fromfile: str = "", tofile: str = "", n: int = 3) -> Iterator[str]:
+    """Líneas del diff unificado de `a` a `b` según `ops` (formato de difflib, lineterm="")."""
+    started = False
+    for group in _grouped(ops, n):
+        if not started:
+            started = True
+            yield f"--- {fromfile}"
+            yield f"+++ {tofile}"
+        first, last = group[0], group[-1]
+        yield f"@@ -{_range(first[1], last[2])} +{_range(first[3], last[4])} @@"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    yield " " + line
+                continue
+            for line in a[i1:i2]:
+                yield "-" + line
+            for line in b[j1:j2]:
+                yield "+" + line
@@ -2,6 +2,8 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional
 import json
 
+from .index import source_key
+
 ROOT = Path(__file__).resolve().parents[1]
 POLICY_PATH = ROOT / "policies" / "policy.yaml"
 
@@ -15,12 +17,26 @@ def load_policy() -> Dict[str, Any]:
     # Política mínima por defecto
     return {"sources": {"allowed": ["BOE", "EUR-Lex", "WIPO", "USC"]}}
 
+def _allowed_sources(policy: Dict[str, Any]) -> List[str]:
+    return list((policy.get("sources", {}) or {}).get("allowed", []) or [])
+
+def _source_filters(policy: Dict[str, Any]) -> Optional[Dict[str, List[str]]]:
+    """Filtro de índice equivalente a policy.sources.allowed (None = sin restricción)."""
+    allow = _allowed_sources(policy)
+    return {"source": allow} if allow else None
+
 def _allowed(policy: Dict[str, Any], meta: Dict[str, Any]) -> bool:
-    allow = set((policy.get("sources", {}) or {}).get("allowed", []))
+    allow = {source_key(a) for a in _allowed_sources(policy)}
     if not allow:
         return True
     src = (meta or {}).get("source", "")
-    return (src in allow) if src else True
+    return (source_key(src) in allow) if src else True
+
+def _answer(cands: List[Dict[str, Any]], policy: Dict[str, Any]) -> Dict[str, Any]:
+    # El filtrado ya lo hace el índice; _allowed es solo una salvaguarda barata sobre k citas
+    filtered = [c for c in cands if _allowed(policy, c.get("meta", {}))]
+    status = "OK" if filtered else "NO_EVIDENCE"
+    return {"status": status, "citations": filtered}
 
 def source_required_answer(question: str,
                            jurisdiction: Optional[str] = None,
@@ -31,11 +47,39 @@ def source_required_answer(question: str,
     policy = policy or load_policy()
     try:
         from .retriever import retrieve_candidates
-        cands = retrieve_candidates(question, k=6) or []
+        cands = retrieve_candidates(question, k=6, filters=_source_filters(policy)) or []
     except Exception:
         cands = []
+    return _answer(cands, policy)
+
+def source_required_answer_many(questions: List[str],
+                                jurisdiction: Optional[str] = None,
+                                policy: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Versión por lotes de source_required_answer: todas las preguntas se puntúan
+    en una sola pasada por el índice. Devuelve una respuesta por pregunta, en orden.
+    """
+    policy = policy or load_policy()
+    questions = list(questions)
+    try:
+        from .retriever import retrieve_candidates_many
+        batches = retrieve_candidates_many(questions, k=6, filters=_source_filters(policy))
+    except Exception:
+        batches = [[] for _ in questions]
+    return [_answer(cands or [], policy) for cands in batches]
 
-    filtered = [c for c in cands if _allowed(policy, c.get("meta", {}))]
-    status = "OK" if filtered else "NO_EVIDENCE"
-    return {"status": status, "citations": filtered}
 
+def pinpoint_answer(ref: str,
+                    jurisdiction: Optional[str] = None,
+                    policy: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Evidencia directa para una referencia normativa ("LPI art. 14; Berna art. 6bis"):
+    resuelve los artículos en el índice de referencias, sin búsqueda, y aplica política.
+    """
+    policy = policy or load_policy()
+    try:
+        from .retriever import pinpoint_candidates
+        cands = pinpoint_candidates(ref, k=6, filters=_source_filters(policy)) or []
+    except Exception:
+        cands = []
+    return _answer(cands, policy)
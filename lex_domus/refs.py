@@ -0,0 +1,188 @@
+# lex_domus/refs.py — índice de referencias normativas (familia + artículo -> chunks)
+"""
+scripts/ingest.py detecta los encabezados de artículo/sección de cada texto
+(ArticleScanner) y escribe data/docs_chunks/refs.json:
+
+    {"schema": 1, "refs": {"LPI": {"14": [{"doc_id", "line_start", "line_end"}, ...]}}}
+
+con las líneas del artículo dentro de cada chunk que lo contiene. Aquí se
+resuelve una referencia tipo InquiryNode.encaje_ref ("LPI art. 14; Berna
+art. 6bis", "LPI art. 17-23") con búsquedas directas en ese dict: sin pasar
+por el índice de búsqueda.
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json, re, threading
+
+ROOT = Path(__file__).resolve().parents[1]
+REFS = ROOT / "data" / "docs_chunks" / "refs.json"
+
+REFS_SCHEMA = 1
+
+# Nombre de la familia en el texto de la referencia -> family de ingest (detect_meta)
+FAMILY_ALIASES = {
+    "lpi": "LPI",
+    "trlpi": "LPI",
+    "berna": "BERNE",
+    "berne": "BERNE",
+    "convenio de berna": "BERNE",
+    "infosoc": "INFOSOC",
+    "directiva 2001/29": "INFOSOC",
+    "directiva 2001/29/ce": "INFOSOC",
+    "usc": "USC17",
+    "17 usc": "USC17",
+    "17 u.s.c.": "USC17",
+}
+
+FAMILY_LABELS = {"LPI": "LPI", "BERNE": "Berna", "INFOSOC": "InfoSoc", "USC17": "17 USC"}
+
+_SUFFIXES = "bis|ter|quater|quinquies|sexies|septies|octies|nonies|decies"
+
+# Encabezados: "Artículo 14. ...", "Article 6" (+ línea "bis"), "§106", "17 U.S. Code § 201 - ..."
+_ARTICLE = re.compile(rf"^(?:art[íi]culo|article|art\.)\s+(\d+)\s*({_SUFFIXES})?\b", re.I)
+_SECTION = re.compile(r"^(?:17\s+U\.?\s?S\.?\s+Code\s+)?§\s*(\d+)\b", re.I)
+_SUFFIX_LINE = re.compile(rf"^({_SUFFIXES})$", re.I)
+
+# En una referencia: "art. 17-23", "arts. 14 y 6bis", "§106", "§§ 106, 201"
+_REF_ARTS = re.compile(r"\b(?:art[íi]culos?|arts?\.?|articles?|sec(?:tion)?s?\.?)\s*|§+\s*", re.I)
+_REF_ITEM = re.compile(rf"(\d+)\s*({_SUFFIXES})?(?:\s*[-–]\s*(\d+))?", re.I)
+
+
+def article_key(number: str, suffix: Optional[str] = None) -> str:
+    """Clave normalizada de artículo: ("6", "BIS") -> "6bis", ("014", None) -> "14"."""
+    return f"{int(number)}{(suffix or '').lower()}"
+
+
+class ArticleScanner:
+    """
+    Detección de encabezados en streaming: feed() línea a línea (1-indexed,
+    mismas líneas que agrupa ingest) y spans() al final. Solo guarda los
+    encabezados, no las líneas.
+    """
+
+    def __init__(self):
+        self.heads: List[Tuple[str, int]] = []
+        self.n_lines = 0
+        self._pending: Optional[Tuple[str, int]] = None  # encabezado sin sufijo: puede venir "bis" en la línea siguiente
+
+    def feed(self, line: str) -> None:
+        self.n_lines += 1
+        if self._pending is not None:
+            number, at = self._pending
+            self._pending = None
+            suffix = line if _SUFFIX_LINE.match(line) else None
+            self.heads.append((article_key(number, suffix), at))
+        m = _ARTICLE.match(line) or _SECTION.match(line)
+        if not m:
+            return
+        suffix = m.group(2) if m.re is _ARTICLE else None
+        if suffix:
+            self.heads.append((article_key(m.group(1), suffix), self.n_lines))
+        else:
+            self._pending = (m.group(1), self.n_lines)
+
+    def spans(self) -> List[Tuple[str, int, int]]:
+        """
+        (clave, línea inicial, línea final) de cada artículo. Un artículo llega
+        hasta el siguiente encabezado; los que no tienen cuerpo se descartan.
+        Si una clave se repite (entrada de índice con una línea de sumario y
+        luego el artículo), se queda la aparición con el cuerpo más largo (a
+        igualdad, la última).
+        """
+        heads = list(self.heads)
+        if self._pending is not None:
+            heads.append((article_key(self._pending[0]), self._pending[1]))
+        best: Dict[str, Tuple[int, int]] = {}
+        for j, (key, start) in enumerate(heads):
+            end = heads[j + 1][1] - 1 if j + 1 < len(heads) else self.n_lines
+            if end > start and (key not in best or end - start >= best[key][1] - best[key][0]):
+                best[key] = (start, end)
+        return sorted(((key, start, end) for key, (start, end) in best.items()), key=lambda s: s[1])
+
+
+def find_articles(lines: Iterable[str]) -> List[Tuple[str, int, int]]:
+    """(clave, línea inicial, línea final) de cada artículo en `lines` (ver ArticleScanner)."""
+    scanner = ArticleScanner()
+    for line in lines:
+        scanner.feed(line)
+    return scanner.spans()
+
+
+def parse_refs(ref: str) -> List[Tuple[str, str]]:
+    """
+    "LPI art. 17-23; Berna art. 6bis" -> [("LPI", "17"), ..., ("LPI", "23"), ("BERNE", "6bis")].
+    Partes separadas por ';'. Las familias desconocidas se ignoran.
+    """
+    out: List[Tuple[str, str]] = []
+    for part in (ref or "").split(";"):
+        m = _REF_ARTS.search(part)
+        if not m:
+            continue
+        family = FAMILY_ALIASES.get(re.sub(r"\s+", " ", part[:m.start()]).strip().casefold())
+        if not family:
+            continue
+        for item in _REF_ITEM.finditer(part[m.end():]):
+            first, suffix, last = item.groups()
+            if last and not suffix and int(last) >= int(first):
+                out.extend((family, str(n)) for n in range(int(first), int(last) + 1))
+            else:
+                out.append((family, article_key(first, suffix)))
+    return list(dict.fromkeys(out))
+
+
+def ref_label(family: str, article: str) -> str:
+    sign = "§" if family == "USC17" else "art. "
+    return f"{FAMILY_LABELS.get(family, family)} {sign}{article}"
+
+
+class RefIndex:
+    """refs.json en memoria: family -> artículo -> [{doc_id, line_start, line_end}]."""
+
+    def __init__(self, refs: Dict[str, Dict[str, List[Dict[str, Any]]]]):
+        self.refs = refs
+
+    @classmethod
+    def load(cls, path: Path) -> "RefIndex":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("schema") != REFS_SCHEMA:
+            raise ValueError(f"esquema de refs.json {data.get('schema')} != {REFS_SCHEMA}; vuelve a ejecutar ingest")
+        return cls(data.get("refs") or {})
+
+    def lookup(self, family: str, article: str) -> List[Dict[str, Any]]:
+        return list((self.refs.get(family) or {}).get(article, []))
+
+    def resolve(self, ref: str) -> List[Dict[str, Any]]:
+        """Ubicaciones de cada artículo citado en `ref`, en el orden de la referencia."""
+        out = []
+        for family, article in parse_refs(ref):
+            for loc in self.lookup(family, article):
+                out.append({"family": family, "article": article, "ref_label": ref_label(family, article), **loc})
+        return out
+
+
+# Índice único por proceso; se recarga si refs.json cambia (como el retriever)
+_REFS: Optional[RefIndex] = None
+_REFS_KEY: Optional[Tuple] = None
+_LOCK = threading.Lock()
+
+def get_ref_index() -> Optional[RefIndex]:
+    global _REFS, _REFS_KEY
+    try:
+        st = REFS.stat()
+        key = (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None
+    if _REFS_KEY != key:
+        with _LOCK:
+            if _REFS_KEY != key:
+                try:
+                    _REFS = RefIndex.load(REFS)
+                except Exception:
+                    _REFS = None
+                _REFS_KEY = key
+    return _REFS
+
+def resolve_refs(ref: str) -> List[Dict[str, Any]]:
+    """resolve() sobre data/docs_chunks/refs.json; [] si ingest aún no lo generó."""
+    index = get_ref_index()
+    return index.resolve(ref) if index is not None else []
@@ -1,49 +1,322 @@
 from pathlib import Path
-from typing import List, Dict, Any
-import json, re
+from typing import List, Dict, Any, Mapping, Optional, Sequence, Tuple, Union
+from collections import OrderedDict, deque
+from time import perf_counter
+import os, sys, threading
+
+from .chunk_store import ChunkStore, load_store
+from .chunk_table import ChunkRow
+from .dedup import is_alias
+from .index import Filters, InvertedIndex
+from .segments import MANIFEST_NAME, SegmentedIndex
+from .refs import resolve_refs
 
 ROOT = Path(__file__).resolve().parents[1]
 CHUNKS = ROOT / "data" / "docs_chunks" / "chunks.jsonl"
+INDICES = ROOT / "indices"
+BM25_PATH = INDICES / "bm25" / MANIFEST_NAME
+STORE_NAME = "chunks.lxcs"  # almacén binario junto a chunks.jsonl
+FAISS_PATH = INDICES / "faiss.index"
+
+# Tamaño de la caché LRU de consultas (0 = desactivada)
+QUERY_CACHE_SIZE = int(os.getenv("LEXDOMUS_QUERY_CACHE", "1024"))
+
+
+class QueryCache:
+    """
+    LRU acotada de resultados top-k (doc, score). La clave es el conjunto de
+    términos analizados de la consulta (y sus frases), k y la huella del
+    corpus/índice; el ranking solo depende de eso, así que dos redacciones
+    con los mismos términos comparten entrada.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple, List[Tuple[int, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple) -> Optional[List[Tuple[int, float]]]:
+        with self._lock:
+            top = self._data.get(key)
+            if top is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return list(top)
+
+    def put(self, key: Tuple, top: List[Tuple[int, float]]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = list(top)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
 
-_WORD = re.compile(r"\w+", re.U)
+    def clear(self) -> None:
+        with self._lock:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
 
-def _tok(s: str) -> set:
-    return set(_WORD.findall((s or "").lower()))
+    def info(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
 
-def _score(query_tokens: set, text: str) -> int:
-    if not text:
-        return 0
-    return len(query_tokens & _tok(text))
 
-def retrieve_candidates(query: str, k: int = 6) -> List[Dict[str, Any]]:
+_CACHE = QueryCache(QUERY_CACHE_SIZE)
+
+
+class RetrievalBackend:
     """
-    Fallback universal: si no hay FAISS/BM25 disponibles,
-    escanea chunks.jsonl y puntúa por solapamiento de tokens.
-    Devuelve una lista de citas estilo {'text':..., 'meta':{...}}.
+    Backend de recuperación activo en el proceso:
+      - bm25: índice por segmentos de scripts/build_index.py (indices/bm25/)
+      - scan: sin índice construido; solapamiento de tokens sobre chunks.jsonl
+    Guarda la latencia de las últimas consultas para /health y sirve las
+    repetidas desde la caché LRU del proceso. Con el almacén binario de
+    chunks (chunks.lxcs) alineado, los registros de las citas salen de él.
     """
+
+    def __init__(self, name: str, index: Union[InvertedIndex, SegmentedIndex], scoring: str, source: Path, load_ms: float,
+                 fingerprint: Tuple = (), store: Optional[ChunkStore] = None):
+        self.name = name
+        self.index = index
+        self.store = store
+        self.scoring = scoring
+        self.source = source
+        self.load_ms = load_ms
+        self.fingerprint = (name, index.corpus_sha) + tuple(fingerprint)
+        self.queries = 0
+        self.batches = 0
+        self._lat_ms: deque = deque(maxlen=512)
+        # motivo por el que no se sirve el índice BM25 (None = todo en orden); sale en /health
+        self.warning: Optional[str] = None
+
+    def _cache_key(self, query: str, k: int, filters: Filters = None) -> Tuple:
+        spec = tuple(sorted((f, frozenset(v)) for f, v in (filters or {}).items() if v is not None))
+        return (self.index.query_key(query), k, spec, self.fingerprint)
+
+    def search(self, query: str, k: int, filters: Filters = None) -> List[Tuple[int, float]]:
+        key = self._cache_key(query, k, filters)
+        top = _CACHE.get(key)
+        if top is not None:
+            return top
+        t0 = perf_counter()
+        top = self.index.search(query, k=k, scoring=self.scoring, filters=filters)
+        self.queries += 1
+        self._lat_ms.append((perf_counter() - t0) * 1000.0)
+        _CACHE.put(key, top)
+        return top
+
+    def search_many(self, queries: Sequence[str], k: int, filters: Filters = None) -> List[List[Tuple[int, float]]]:
+        """
+        Lote de consultas: las que están en caché se sirven de ella y el resto
+        se puntúa en una sola pasada (Q·W); latencia media por consulta.
+        """
+        keys = [self._cache_key(q, k, filters) for q in queries]
+        tops: List[Optional[List[Tuple[int, float]]]] = [_CACHE.get(key) for key in keys]
+        todo = [i for i, top in enumerate(tops) if top is None]
+        if todo:
+            t0 = perf_counter()
+            fresh = self.index.search_many([queries[i] for i in todo], k=k, scoring=self.scoring, filters=filters)
+            self.queries += len(todo)
+            self.batches += 1
+            self._lat_ms.append((perf_counter() - t0) * 1000.0 / len(todo))
+            for i, top in zip(todo, fresh):
+                tops[i] = top
+                _CACHE.put(keys[i], top)
+        return tops  # type: ignore[return-value]
+
+    def record(self, doc: int) -> Dict[str, Any]:
+        if self.store is not None:
+            row = self.store.row_of(self.index.doc_id(doc))
+            if row is not None:
+                return self.store.record(row)
+        return self.index.record(doc)
+
+    def info(self) -> Dict[str, Any]:
+        lat = sorted(self._lat_ms)
+        def _pct(p: float) -> Optional[float]:
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))], 3) if lat else None
+        return {
+            "backend": self.name,
+            "scoring": self.scoring,
+            "source": str(self.source.relative_to(ROOT)) if self.source.is_relative_to(ROOT) else str(self.source),
+            "docs": len(self.index),
+            "terms": self.index.n_terms,
+            "load_ms": round(self.load_ms, 2),
+            "chunk_store": self.store is not None,
+            "queries": self.queries,
+            "batches": self.batches,
+            "query_ms": {
+                "last": round(self._lat_ms[-1], 3) if self._lat_ms else None,
+                "mean": round(sum(lat) / len(lat), 3) if lat else None,
+                "p50": _pct(0.50),
+                "p95": _pct(0.95),
+                "max": round(lat[-1], 3) if lat else None,
+            },
+            # FAISS (denso) se detecta pero no se sirve: faiss/sentence-transformers
+            # no están en requirements.txt (imagen de 512 MB)
+            "faiss_index": FAISS_PATH.exists(),
+            "cache": _CACHE.info(),
+            "warning": self.warning,
+        }
+
+
+# Backend único por proceso; se recarga si chunks.jsonl o el manifiesto de segmentos cambian
+_BACKEND: Optional[RetrievalBackend] = None
+_BACKEND_KEY: Optional[Tuple] = None
+_LOCK = threading.Lock()
+
+def _stat_key(*paths: Path) -> Tuple:
+    key = []
+    for p in paths:
+        try:
+            st = p.stat()
+            key.append((st.st_size, st.st_mtime_ns))
+        except OSError:
+            key.append(None)
+    return tuple(key)
+
+def _load_backend(key: Tuple) -> Optional[RetrievalBackend]:
+    t0 = perf_counter()
     if not CHUNKS.exists():
+        return None
+    store_path = CHUNKS.with_name(STORE_NAME)
+    store = load_store(store_path, CHUNKS)
+    if BM25_PATH.exists():
+        try:
+            idx = SegmentedIndex.load(BM25_PATH.parent, CHUNKS)
+            if store is not None and store.corpus_sha != idx.corpus_sha:
+                store = None
+            return RetrievalBackend("bm25", idx, "bm25", BM25_PATH, (perf_counter() - t0) * 1000.0, key, store)
+        except Exception as e:  # índice desalineado con chunks.jsonl o dañado -> scan
+            warning = f"índice BM25 inservible ({type(e).__name__}: {e})"
+    else:
+        warning = f"falta {BM25_PATH.relative_to(ROOT) if BM25_PATH.is_relative_to(ROOT) else BM25_PATH}"
+    warning += "; se sirve el backend 'scan' (solapamiento de tokens): ejecuta scripts/build_index.py"
+    print(f"[retriever] WARN: {warning}", file=sys.stderr)
+    if store is not None:
+        # sin índice: se construye en memoria desde el almacén, sin parsear el JSONL
+        idx = InvertedIndex.from_records((r for r in store if not is_alias(r)), corpus_sha=store.corpus_sha)
+        backend = RetrievalBackend("scan", idx, "overlap", store_path, (perf_counter() - t0) * 1000.0, key)
+    else:
+        idx = InvertedIndex.from_chunks(CHUNKS)
+        backend = RetrievalBackend("scan", idx, "overlap", CHUNKS, (perf_counter() - t0) * 1000.0, key)
+    backend.warning = warning
+    return backend
+
+def get_backend() -> Optional[RetrievalBackend]:
+    global _BACKEND, _BACKEND_KEY
+    key = _stat_key(CHUNKS, BM25_PATH, CHUNKS.with_name(STORE_NAME))
+    if _BACKEND_KEY == key:
+        return _BACKEND
+    with _LOCK:
+        if _BACKEND_KEY != key:
+            # corpus o índice reconstruidos: los resultados cacheados ya no valen
+            _CACHE.clear()
+            _BACKEND = _load_backend(key)
+            _BACKEND_KEY = key
+    return _BACKEND
+
+def corpus_version() -> str:
+    """sha del corpus que sirve el backend vigente ("" si no hay índice)."""
+    backend = get_backend()
+    return (backend.index.corpus_sha or "") if backend is not None else ""
+
+def backend_info() -> Dict[str, Any]:
+    backend = get_backend()
+    if backend is None:
+        return {"backend": "none", "faiss_index": FAISS_PATH.exists(), "cache": _CACHE.info()}
+    return backend.info()
+
+def _citation(rec: Mapping) -> Dict[str, Any]:
+    # chunks.jsonl guarda los metadatos planos junto al texto; una fila de
+    # ChunkTable construye aquí su dict, solo para las citas devueltas
+    if isinstance(rec, ChunkRow):
+        return {"text": rec.get("text", ""), "meta": rec.meta()}
+    meta = rec.get("meta") or {key: v for key, v in rec.items() if key != "text"}
+    return {"text": rec.get("text", ""), "meta": meta}
+
+def retrieve_candidates(query: str, k: int = 6, filters: Filters = None) -> List[Dict[str, Any]]:
+    """
+    Recupera del backend activo: BM25 si hay índice construido en indices/,
+    si no solapamiento de tokens sobre chunks.jsonl.
+    `filters` ({"source"|"jurisdiction"|"family": [valores]}) se aplica al
+    puntuar, así que las k citas son k documentos admitidos.
+    Devuelve una lista de citas estilo {'text':..., 'meta':{...}}.
+    """
+    backend = get_backend()
+    if backend is None:
         return []
+    return [_citation(backend.record(doc)) for doc, _score in backend.search(query, k, filters)]
 
-    q_tokens = _tok(query)
-    scored: List[Dict[str, Any]] = []
-    with CHUNKS.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                rec = json.loads(line)
-            except Exception:
-                continue
-            text = rec.get("text", "")
-            meta = rec.get("meta", {})
-            sc = _score(q_tokens, text)
-            if sc > 0:
-                scored.append({"text": text, "meta": meta, "_score": sc})
-
-    scored.sort(key=lambda r: r.get("_score", 0), reverse=True)
-    top = scored[:k]
-    for r in top:
-        r.pop("_score", None)
-    return top
+def retrieve_candidates_many(queries: Sequence[str], k: int = 6,
+                             filters: Filters = None) -> List[List[Dict[str, Any]]]:
+    """
+    Igual que retrieve_candidates para varias consultas, puntuadas todas en
+    una única pasada por el índice. Devuelve una lista de citas por consulta.
+    """
+    backend = get_backend()
+    if backend is None:
+        return [[] for _ in queries]
+    return [
+        [_citation(backend.record(doc)) for doc, _score in top]
+        for top in backend.search_many(list(queries), k, filters)
+    ]
 
+def _pinpoint_citation(rec: Dict[str, Any], loc: Dict[str, Any]) -> Dict[str, Any]:
+    # el texto del chunk son sus líneas line_start..line_end unidas por \n
+    l0 = int(rec.get("line_start") or 1)
+    lines = rec.get("text", "").split("\n")[loc["line_start"] - l0:loc["line_end"] - l0 + 1]
+    cit = _citation(rec)
+    cit["text"] = "\n".join(lines) or cit["text"]
+    cit["meta"] = dict(cit["meta"], ref_label=loc["ref_label"], pinpoint=True,
+                       line_start=loc["line_start"], line_end=loc["line_end"])
+    return cit
+
+def pinpoint_candidates(ref: str, k: int = 6, filters: Filters = None) -> List[Dict[str, Any]]:
+    """
+    Citas de los artículos de `ref` ("LPI art. 14; Berna art. 6bis") vía
+    data/docs_chunks/refs.json, sin puntuar: el texto es el del artículo
+    dentro del chunk. Reparte las k citas entre los artículos citados (una
+    ubicación de cada uno por turno) y respeta `filters` como la búsqueda.
+    """
+    backend = get_backend()
+    if backend is None or k <= 0:
+        return []
+    mask = backend.index.mask(filters)
+    by_article: "OrderedDict[Tuple[str, str], deque]" = OrderedDict()
+    for loc in resolve_refs(ref):
+        by_article.setdefault((loc["family"], loc["article"]), deque()).append(loc)
+    out, seen = [], set()
+    while by_article and len(out) < k:
+        for key in list(by_article):
+            locs = by_article[key]
+            while locs:
+                loc = locs.popleft()
+                doc = backend.index.doc_index(loc["doc_id"])
+                if doc is None or loc["doc_id"] in seen or (mask is not None and not mask[doc]):
+                    continue
+                seen.add(loc["doc_id"])
+                out.append(_pinpoint_citation(backend.record(doc), loc))
+                break
+            if not locs:
+                del by_article[key]
+            if len(out) >= k:
+                break
+    return out
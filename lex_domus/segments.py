@@ -0,0 +1,312 @@
+# lex_domus/segments.py — índice BM25 por segmentos (actualización incremental)
+"""
+El índice de indices/bm25/ es una lista de segmentos inmutables (ficheros
+LXIDX de InvertedIndex, sin los registros: solo postings y doc_id) más
+segments.json:
+
+    {"schema": 2, "analyzer": "...", "corpus_sha": "...", "next_id": 4,
+     "segments": [{"name": "seg_000001.idx", "docs": 870, "deleted": [12, 13]}, ...]}
+
+y rows.idx, que da para cada documento (numerados segmento tras segmento)
+su offset y longitud en el chunks.jsonl vigente (-1 si está borrado). Los
+segmentos no cambian al reescribirse chunks.jsonl; rows.idx se regenera en
+cada pasada, así que los registros siempre se leen del JSONL actual.
+
+update_segments() compara chunks.jsonl con lo indexado (doc_id + hash de la
+línea): los chunks nuevos o cambiados van a un segmento nuevo y pequeño, y
+sus versiones anteriores (y los chunks borrados) quedan marcados en
+"deleted" (tombstones). Una reforma de un artículo reindexa solo sus chunks.
+merge (explícito, o automático por nº de segmentos / proporción de
+tombstones) compacta todo en un único segmento en orden de corpus.
+
+SegmentedIndex consulta todos los segmentos: puntúa cada uno con las
+estadísticas BM25 de la colección viva (N, longitud media, df sin
+tombstones) y concatena; los documentos borrados puntúan 0. Hasta el
+siguiente merge, los empates se ordenan por segmento, no por corpus.
+"""
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib, json, os
+
+import numpy as np
+
+from .analyzer import ANALYZER_ID
+from .dedup import is_alias
+from .index import BM25Stats, Filters, InvertedIndex, Phrase, _ChunkRecords, _Searchable, file_sha256, scan_chunks
+from .index_file import open_index, write_index
+
+SEGMENTS_SCHEMA = 2
+MANIFEST_NAME = "segments.json"
+ROWS_NAME = "rows.idx"
+
+# Política de merge automático
+MAX_SEGMENTS = 8
+MAX_DELETED_RATIO = 0.3
+
+
+def record_hash(line: bytes) -> int:
+    """Huella de 64 bits de una línea de chunks.jsonl (detecta chunks cambiados)."""
+    return int.from_bytes(hashlib.blake2b(line, digest_size=8).digest(), "little")
+
+
+def _segment_name(seg_id: int) -> str:
+    return f"seg_{seg_id:06d}.idx"
+
+
+def read_manifest(root: Path) -> Optional[Dict[str, Any]]:
+    try:
+        manifest = json.loads((root / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("schema") != SEGMENTS_SCHEMA or manifest.get("analyzer") != ANALYZER_ID:
+        return None
+    return manifest
+
+
+def _write_manifest(root: Path, manifest: Dict[str, Any]) -> None:
+    tmp = root / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, root / MANIFEST_NAME)
+
+
+class SegmentedIndex(_Searchable):
+    """
+    Vista de consulta sobre los segmentos de segments.json, con la misma
+    interfaz que InvertedIndex (score/score_many/search/mask/record/doc_id/
+    doc_index). Los documentos se numeran segmento tras segmento; los
+    borrados siguen ocupando su número pero nunca puntúan.
+    """
+
+    def __init__(self, segments: Sequence[InvertedIndex], deleted: Sequence[Sequence[int]], corpus_sha: str = ""):
+        self.segments = list(segments)
+        self.corpus_sha = corpus_sha
+        self.alive = []
+        for seg, dead in zip(self.segments, deleted):
+            alive = np.ones(len(seg), dtype=bool)
+            alive[np.asarray(dead, dtype=np.int64)] = False
+            self.alive.append(alive)
+        sizes = [len(seg) for seg in self.segments]
+        self.base = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.base[1:])
+        self._alive_all = np.concatenate(self.alive) if self.alive else np.zeros(0, dtype=bool)
+        self._doc_index: Optional[Dict[str, int]] = None
+        self._n_terms: Optional[int] = None
+        # Un único segmento sin tombstones puntúa con su post_w precalculado
+        if len(self.segments) > 1 or not self._alive_all.all():
+            n_live = int(self._alive_all.sum())
+            total_len = sum(int(seg.doc_len[alive].sum()) for seg, alive in zip(self.segments, self.alive))
+            stats = BM25Stats(n_live, total_len / n_live if n_live else 1.0, self._df)
+            for seg in self.segments:
+                seg.stats = stats
+
+    @classmethod
+    def load(cls, root: Path, chunks: Path) -> "SegmentedIndex":
+        """Abre indices/bm25/ comprobando que corresponde a `chunks`, de donde salen los registros."""
+        manifest = read_manifest(root)
+        if manifest is None:
+            raise ValueError(f"{root / MANIFEST_NAME} ausente o de otro esquema; reconstruye el índice")
+        if manifest.get("corpus_sha") != file_sha256(chunks):
+            raise ValueError("índice desalineado con chunks.jsonl")
+        meta, rows, _mm = open_index(root / ROWS_NAME)
+        if meta.get("corpus_sha") != manifest.get("corpus_sha"):
+            raise ValueError(f"{ROWS_NAME} desalineado con {MANIFEST_NAME}; reconstruye el índice")
+        entries = manifest.get("segments") or []
+        segments, start = [], 0
+        for e in entries:
+            end = start + e["docs"]
+            records = _ChunkRecords(chunks, rows["chunk_off"][start:end], rows["chunk_len"][start:end])
+            segments.append(InvertedIndex.load(root / e["name"], records=records))
+            start = end
+        return cls(segments, [e.get("deleted") or [] for e in entries], manifest.get("corpus_sha", ""))
+
+    def __len__(self) -> int:
+        return int(self._alive_all.sum())
+
+    @property
+    def n_terms(self) -> int:
+        """Términos distintos entre todos los segmentos (incluidos los de docs borrados)."""
+        if self._n_terms is None:
+            if len(self.segments) == 1:
+                self._n_terms = self.segments[0].n_terms
+            else:
+                self._n_terms = len({seg.vocab[i] for seg in self.segments for i in range(seg.n_terms)})
+        return self._n_terms
+
+    @property
+    def n_postings(self) -> int:
+        return sum(seg.n_postings for seg in self.segments)
+
+    def _df(self, term: str) -> int:
+        df = 0
+        for seg, alive in zip(self.segments, self.alive):
+            t = seg.vocab.get(term)
+            if t is not None:
+                df += int(alive[seg.post_docs[seg.indptr[t]:seg.indptr[t + 1]]].sum())
+        return df
+
+    def _locate(self, doc: int) -> Tuple[InvertedIndex, int]:
+        s = int(np.searchsorted(self.base, doc, side="right")) - 1
+        return self.segments[s], doc - int(self.base[s])
+
+    # --------- Consulta ---------
+
+    def mask(self, filters: Filters) -> Optional[np.ndarray]:
+        """Máscara de documentos vivos admitidos por `filters` (None = sin filtro)."""
+        if not filters:
+            return None
+        parts = []
+        for seg, alive in zip(self.segments, self.alive):
+            m = seg.mask(filters)
+            parts.append(alive if m is None else m & alive)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=bool)
+
+    def score(self, query_tokens, scoring: str = "overlap", filters: Filters = None,
+              phrases: Sequence[Phrase] = ()) -> np.ndarray:
+        query_tokens = list(query_tokens)
+        parts = [seg.score(query_tokens, scoring=scoring, filters=filters, phrases=phrases) for seg in self.segments]
+        scores = np.concatenate(parts) if parts else np.zeros(0)
+        return scores * self._alive_all
+
+    def score_many(self, queries, scoring: str = "overlap", filters: Filters = None,
+                   phrases: Optional[Sequence[Sequence[Phrase]]] = None) -> np.ndarray:
+        queries = [list(q) for q in queries]
+        parts = [seg.score_many(queries, scoring=scoring, filters=filters, phrases=phrases) for seg in self.segments]
+        scores = np.hstack(parts) if parts else np.zeros((len(queries), 0))
+        return scores * self._alive_all
+
+    def record(self, doc: int) -> Dict[str, Any]:
+        seg, local = self._locate(doc)
+        return seg.record(local)
+
+    def doc_id(self, doc: int) -> str:
+        seg, local = self._locate(doc)
+        return seg.doc_id(local)
+
+    def doc_index(self, doc_id: str) -> Optional[int]:
+        """Número del documento vivo `doc_id` (dict inverso construido la primera vez)."""
+        if self._doc_index is None:
+            self._doc_index = {
+                seg.doc_id(i): int(base) + i
+                for seg, alive, base in zip(self.segments, self.alive, self.base)
+                for i in np.flatnonzero(alive).tolist()
+            }
+        return self._doc_index.get(doc_id)
+
+
+# --------- Escritura ---------
+
+def _write_segment(root: Path, seg_id: int, records: List[Dict[str, Any]], hashes: List[int]) -> Dict[str, Any]:
+    name = _segment_name(seg_id)
+    seg = InvertedIndex.from_records(records)
+    seg.save(root / name, offsets=False, extra={"rec_hash": np.asarray(hashes, dtype=np.uint64)})
+    return {"name": name, "docs": len(records), "deleted": []}
+
+
+def _write_rows(root: Path, entries: List[Dict[str, Any]], where: Dict[str, Tuple[int, int]],
+                corpus_sha: str) -> None:
+    """rows.idx: offset/longitud en chunks.jsonl de cada documento de los segmentos (-1/0 si borrado)."""
+    off, length = [], []
+    for e in entries:
+        seg = InvertedIndex.load(root / e["name"])
+        dead = set(e["deleted"])
+        for i in range(len(seg)):
+            o, n = (-1, 0) if i in dead else where[seg.doc_id(i)]
+            off.append(o)
+            length.append(n)
+    write_index(root / ROWS_NAME, {
+        "chunk_off": np.asarray(off, dtype=np.int64),
+        "chunk_len": np.asarray(length, dtype=np.int32),
+    }, {"kind": "segment_rows", "corpus_sha": corpus_sha})
+
+
+def update_segments(chunks: Path, root: Path, merge: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Sincroniza indices/bm25/ con chunks.jsonl. merge=True compacta siempre
+    en un segmento; None aplica la política automática (MAX_SEGMENTS,
+    MAX_DELETED_RATIO); False no compacta. Devuelve un resumen de la pasada.
+    """
+    t0 = perf_counter()
+    root.mkdir(parents=True, exist_ok=True)
+    records, offsets, lengths = scan_chunks(chunks)
+    data = chunks.read_bytes()
+    corpus_sha = hashlib.sha256(data).hexdigest()
+    # los alias de otro chunk (casi duplicados, ver lex_domus.dedup) no se indexan
+    keep = [i for i, r in enumerate(records) if not is_alias(r)]
+    records = [records[i] for i in keep]
+    hashes = [record_hash(data[offsets[i]:offsets[i] + lengths[i]]) for i in keep]
+    doc_ids = [r.get("doc_id", "") for r in records]
+
+    manifest = previous = read_manifest(root)
+    entries: List[Dict[str, Any]] = []
+    if manifest is not None and len(set(doc_ids)) == len(doc_ids):
+        try:
+            entries = [dict(e, deleted=list(e.get("deleted") or [])) for e in manifest.get("segments") or []]
+            # doc_id -> (segmento, doc local, hash) de lo indexado y vivo
+            live: Dict[str, Tuple[int, int, int]] = {}
+            for s, e in enumerate(entries):
+                seg = InvertedIndex.load(root / e["name"])
+                seg_hash = seg.sections["rec_hash"]
+                dead = set(e["deleted"])
+                for i in range(len(seg)):
+                    if i not in dead:
+                        live[seg.doc_id(i)] = (s, i, int(seg_hash[i]))
+        except Exception:
+            manifest, entries = None, []  # segmento ausente o dañado -> reconstrucción completa
+    else:
+        manifest = None
+
+    n_added = n_deleted = 0
+    if manifest is not None:
+        current = dict(zip(doc_ids, hashes))
+        fresh = [i for i, (d, h) in enumerate(zip(doc_ids, hashes)) if live.get(d, (0, 0, None))[2] != h]
+        for d, (s, i, h) in live.items():
+            if current.get(d) != h:
+                entries[s]["deleted"].append(i)
+                n_deleted += 1
+        entries = [e for e in entries if len(e["deleted"]) < e["docs"]]
+        next_id = int(manifest.get("next_id", len(entries) + 1))
+        if fresh:
+            entries.append(_write_segment(root, next_id, [records[i] for i in fresh], [hashes[i] for i in fresh]))
+            next_id += 1
+        n_added = len(fresh)
+        indexed = sum(e["docs"] for e in entries)
+        dead = sum(len(e["deleted"]) for e in entries)
+        if merge is None:
+            merge = len(entries) > MAX_SEGMENTS or (indexed and dead / indexed > MAX_DELETED_RATIO)
+        if (not (fresh or n_deleted or merge) and manifest.get("corpus_sha") == corpus_sha
+                and (root / ROWS_NAME).exists()):
+            return {"docs": len(records), "added": 0, "deleted": 0, "merged": False, "segments": len(entries),
+                    "tombstones": dead, "seconds": round(perf_counter() - t0, 3)}
+    else:
+        merge, next_id = True, int((previous or {}).get("next_id", 1))
+
+    if merge:
+        if manifest is None:
+            n_added = len(records)
+        entries = [_write_segment(root, next_id, records, hashes)] if records else []
+        next_id += 1
+    for e in entries:
+        e["deleted"].sort()
+    _write_rows(root, entries, {doc_ids[k]: (offsets[i], lengths[i]) for k, i in enumerate(keep)}, corpus_sha)
+    _write_manifest(root, {
+        "schema": SEGMENTS_SCHEMA,
+        "analyzer": ANALYZER_ID,
+        "corpus_sha": corpus_sha,
+        "next_id": next_id,
+        "segments": entries,
+    })
+    # segmentos que ya no figuran en el manifiesto (compactados o vacíos)
+    keep = {e["name"] for e in entries}
+    for path in root.glob("seg_*.idx"):
+        if path.name not in keep:
+            path.unlink()
+    return {
+        "docs": len(records),
+        "added": n_added,
+        "deleted": n_deleted,
+        "merged": bool(merge),
+        "segments": len(entries),
+        "tombstones": sum(len(e["deleted"]) for e in entries),
+        "seconds": round(perf_counter() - t0, 3),
+    }
@@ -0,0 +1,70 @@
+"""
+Benchmark de memoria: bytes por chunk de cada representación de los
+registros de chunks.jsonl que puede tener un worker en memoria.
+
+  - dicts:  lista de dicts (json.loads de cada línea; lo que había antes)
+  - table:  lex_domus.chunk_table.ChunkTable (columnas + códigos internados)
+  - store:  lex_domus.chunk_store.ChunkStore (mmap: solo cuenta el heap)
+
+Se mide con tracemalloc (heap de Python reservado por la estructura, con
+el texto incluido) y se separa el coste del texto para ver la sobrecarga
+de los metadatos. El corpus sintético replica los chunks reales (doc_id
+distinto) hasta N.
+
+    python scripts/bench_memory.py --sizes 870,20000
+"""
+import argparse, gc, json, sys, tempfile, tracemalloc
+from pathlib import Path
+from typing import Any, Callable, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from lex_domus.chunk_store import ChunkStore, write_store
+from lex_domus.chunk_table import ChunkTable
+
+CHUNKS = ROOT / "data" / "docs_chunks" / "chunks.jsonl"
+
+def synth_lines(base: List[str], n: int) -> List[str]:
+    out = []
+    for i in range(n):
+        rec = json.loads(base[i % len(base)])
+        rec["doc_id"] = f"{rec.get('doc_id', 'doc')}~{i // len(base)}"
+        out.append(json.dumps(rec, ensure_ascii=False))
+    return out
+
+def heap_bytes(build: Callable[[], Any]) -> int:
+    """Bytes de heap que siguen reservados por el resultado de build()."""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="870,20000")
+    args = ap.parse_args()
+    base = [l for l in CHUNKS.read_text(encoding="utf-8").splitlines() if l.strip()]
+
+    print(f"{'chunks':>8} | {'texto B/chunk':>13} | {'dicts B/chunk':>13} | {'table B/chunk':>13} | {'store B/chunk':>13}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        lines = synth_lines(base, n)
+        text_b = heap_bytes(lambda: [json.loads(l)["text"] for l in lines])
+        dicts_b = heap_bytes(lambda: [json.loads(l) for l in lines])
+        table_b = heap_bytes(lambda: ChunkTable.from_records(json.loads(l) for l in lines))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "chunks.lxcs"
+            write_store((json.loads(l) for l in lines), path)
+            store_b = heap_bytes(lambda: ChunkStore.open(path))
+        row = [text_b / n, dicts_b / n, table_b / n, store_b / n]
+        print(f"{n:>8} | " + " | ".join(f"{v:>13.0f}" for v in row))
+        print(f"{'':>8}   metadatos (sin texto): dicts {(dicts_b - text_b) / n:.0f} B/chunk, "
+              f"table {(table_b - text_b) / n:.0f} B/chunk")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark de la sobrecarga fija por petición de app.pipeline.
+
+  - motor por petición: un AnalysisEngine nuevo en cada petición (resolver
+    etapas y cargar la política cada vez). Es una aproximación al patrón
+    del analyze_clause anterior, no su código: aquel ya no existe en el
+    árbol y sus imports perezosos, tras la primera llamada, salen de
+    sys.modules igual que aquí
+  - motor compartido:   el motor de módulo, con las etapas ya resueltas
+
+Las mismas cláusulas se repiten (casos_frontera.jsonl), así que tras el
+calentamiento la recuperación sale de la caché del retriever y lo que se
+mide es, sobre todo, el coste fijo de la orquestación. La caché de
+resultados (LEXDOMUS_RESULT_CACHE) se desactiva: con ella se mediría un
+acierto de caché, no el análisis. Se informa además del coste de construir
+el motor.
+
+    python scripts/bench_pipeline.py --rounds 200
+"""
+import argparse, json, os, statistics, sys, time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+os.environ["LEXDOMUS_RESULT_CACHE"] = "0"
+from app.pipeline import AnalysisEngine, get_engine
+
+CASES = ROOT / "tests" / "casos_frontera.jsonl"
+
+def load_cases() -> List[Tuple[str, str]]:
+    out = []
+    for line in CASES.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            rec = json.loads(line)
+            out.append((rec["clause"], rec["jurisdiction"]))
+    return out
+
+def timed(fn: Callable[[], object], rounds: int) -> List[float]:
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return samples
+
+def report(name: str, samples: List[float]) -> float:
+    med = statistics.median(samples)
+    p95 = sorted(samples)[int(0.95 * (len(samples) - 1))]
+    print(f"{name:<22} mediana {med:>9.1f} µs   p95 {p95:>9.1f} µs")
+    return med
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=200)
+    args = ap.parse_args()
+    cases = load_cases()
+    engine = get_engine()
+    for clause, jur in cases:  # calienta índice, caché del retriever y política
+        engine.analyze(clause, jur)
+
+    it = iter(range(1 << 62))
+    def case():
+        return cases[next(it) % len(cases)]
+
+    build = report("construir motor", timed(AnalysisEngine, args.rounds))
+    per_call = report("motor por petición", timed(lambda: AnalysisEngine().analyze(*case()), args.rounds))
+    shared = report("motor compartido", timed(lambda: engine.analyze(*case()), args.rounds))
+    print(f"sobrecarga fija ahorrada por petición al compartir el motor: {per_call - shared:.1f} µs "
+          f"({build:.1f} µs de resolución)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark de recuperación: latencia por consulta según crece el corpus.
+
+Compara el escaneo lineal de chunks.jsonl (implementación anterior del
+retriever) con el índice CSR de lex_domus.index, consulta a consulta y
+en lote (search_many). El corpus sintético se obtiene replicando los
+chunks reales (con doc_id distinto) hasta N.
+
+--analyzers compara además el tokenizador anterior (\\w+ en minúsculas)
+con lex_domus.analyzer: latencia, postings recorridas y tamaño del
+conjunto de candidatos (docs con puntuación > 0) por consulta.
+
+    python scripts/bench_retrieval.py --sizes 870,10000,100000
+    python scripts/bench_retrieval.py --sizes 870,20000 --analyzers
+"""
+import argparse, json, re, statistics, sys, tempfile, time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from lex_domus.index import InvertedIndex
+
+CHUNKS = ROOT / "data" / "docs_chunks" / "chunks.jsonl"
+CASES = ROOT / "tests" / "casos_frontera.jsonl"
+
+QUERIES = [
+    "¿Qué derechos patrimoniales se transfieren?",
+    "¿Se respetan los derechos morales?",
+]
+
+_WORD = re.compile(r"\w+", re.U)
+
+def tokenize(s: str) -> List[str]:
+    # Tokenizador previo al analizador (retriever y bench originales)
+    return _WORD.findall((s or "").lower())
+
+def load_queries() -> List[str]:
+    qs = list(QUERIES)
+    if CASES.exists():
+        for line in CASES.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                qs.append(json.loads(line)["clause"])
+    return qs
+
+def synth_corpus(base: List[Dict[str, Any]], n: int, out: Path) -> None:
+    with out.open("w", encoding="utf-8") as f:
+        for i in range(n):
+            rec = dict(base[i % len(base)])
+            rec["doc_id"] = f"{rec.get('doc_id', 'doc')}~{i // len(base)}"
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+def scan_query(path: Path, query: str, k: int) -> List[Dict[str, Any]]:
+    # Copia fiel del retriever previo: parsea y tokeniza todo en cada consulta
+    q = set(tokenize(query))
+    scored = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            sc = len(q & set(tokenize(rec.get("text", ""))))
+            if sc > 0:
+                scored.append((sc, rec))
+    scored.sort(key=lambda r: r[0], reverse=True)
+    return [r for _, r in scored[:k]]
+
+def _ms(samples: List[float]) -> str:
+    return f"{statistics.mean(samples) * 1000:8.2f}"
+
+def compare_analyzers(path: Path, queries: List[str]) -> None:
+    """Antes/después del analizador sobre el mismo corpus (BM25, consulta a consulta)."""
+    print(f"{'analyzer':>8} | {'terms':>7} | {'postings':>9} | {'bm25 ms/q':>9} | {'postings/q':>10} | {'cands/q':>8}")
+    legacy = lambda s: [(t, p) for p, t in enumerate(tokenize(s))]
+    for name, kwargs in (("legacy", {"analyzer": legacy}), ("es-en", {})):
+        records = [json.loads(l) for l in path.open("r", encoding="utf-8") if l.strip()]
+        idx = InvertedIndex.from_records(records, **kwargs)
+        samples, touched, cands = [], [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            scores = idx.score(idx.terms(q), scoring="bm25")
+            samples.append(time.perf_counter() - t0)
+            ids = idx._term_ids(idx.terms(q))
+            touched.append(sum(int(idx.indptr[t + 1] - idx.indptr[t]) for t in ids))
+            cands.append(int((scores > 0).sum()))
+        print(f"{name:>8} | {idx.n_terms:>7} | {idx.n_postings:>9} | {_ms(samples):>9} | "
+              f"{statistics.mean(touched):>10.0f} | {statistics.mean(cands):>8.0f}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="870,5000,20000,100000")
+    ap.add_argument("--k", type=int, default=6)
+    ap.add_argument("--scan-max", type=int, default=20000,
+                    help="no ejecutar el escaneo lineal por encima de este tamaño")
+    ap.add_argument("--analyzers", action="store_true",
+                    help="comparar tokenizador anterior vs analizador en cada tamaño")
+    args = ap.parse_args()
+
+    with CHUNKS.open("r", encoding="utf-8") as f:
+        base = [json.loads(l) for l in f if l.strip()]
+    queries = load_queries()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    print(f"{'chunks':>8} | {'scan ms/q':>9} | {'build s':>8} | {'overlap ms/q':>12} | {'bm25 ms/q':>9} | {'batch ms/q':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = Path(tmp) / f"chunks_{n}.jsonl"
+            synth_corpus(base, n, path)
+
+            scan = "      n/a"
+            if n <= args.scan_max:
+                samples = []
+                for q in queries:
+                    t0 = time.perf_counter()
+                    scan_query(path, q, args.k)
+                    samples.append(time.perf_counter() - t0)
+                scan = f"{_ms(samples):>9}"
+
+            t0 = time.perf_counter()
+            idx = InvertedIndex.from_chunks(path)
+            build = time.perf_counter() - t0
+
+            res = {}
+            for scoring in ("overlap", "bm25"):
+                samples = []
+                for q in queries:
+                    t0 = time.perf_counter()
+                    idx.search(q, k=args.k, scoring=scoring)
+                    samples.append(time.perf_counter() - t0)
+                res[scoring] = samples
+            # todas las consultas en un solo producto Q·W
+            t0 = time.perf_counter()
+            idx.search_many(queries, k=args.k, scoring="bm25")
+            batch = [(time.perf_counter() - t0) / len(queries)]
+            print(f"{n:>8} | {scan} | {build:8.2f} | {_ms(res['overlap']):>12} | {_ms(res['bm25']):>9} | {_ms(batch):>10}")
+            if args.analyzers:
+                compare_analyzers(path, queries)
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,58 @@
-import os, json, pickle, pathlib
+import os, sys, json, pathlib, argparse
 import numpy as np
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 CHUNKS = ROOT / "data" / "docs_chunks" / "chunks.jsonl"
 INDICES = ROOT / "indices"
 INDICES.mkdir(parents=True, exist_ok=True)
 
-# ---- BM25 ----
-from rank_bm25 import BM25Okapi
-
-def build_bm25():
-    docs, metas = [], []
-    with open(CHUNKS, "r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-            docs.append(rec["text"])
-            metas.append(rec)
-    tokenized = [d.lower().split() for d in docs]
-    bm25 = BM25Okapi(tokenized)
-    with open(INDICES / "bm25.pkl", "wb") as f:
-        pickle.dump({"bm25": bm25, "tokenized": tokenized, "metas": metas}, f)
-    print("BM25 index listo.")
+# ---- BM25 (índice por segmentos que sirve lex_domus.retriever) ----
+from lex_domus.segments import update_segments
+
+def build_bm25(merge=None):
+    """
+    Actualiza indices/bm25/: solo los chunks nuevos o cambiados se indexan
+    (segmento nuevo + tombstones). merge=True compacta en un segmento,
+    None deja decidir a la política automática.
+    """
+    st = update_segments(CHUNKS, INDICES / "bm25", merge=merge)
+    how = "merge" if st["merged"] else "incremental"
+    print(f"BM25 index listo ({how}: {st['docs']} chunks, +{st['added']} / -{st['deleted']}, "
+          f"{st['segments']} segmentos, {st['tombstones']} tombstones, {st['seconds']:.2f}s).")
+
+# ---- Evidencia precalculada de los nodos de plantilla ----
+from lex_domus.evidence import build_evidence
+
+def build_node_evidence(force=False):
+    """
+    Top-k de cada pregunta y pinpoint de cada encaje_ref de la plantilla de
+    verdiktia.inquiry_engine, por jurisdicción (indices/node_evidence.json).
+    Se rehace solo si cambiaron el corpus, refs.json, la versión del índice,
+    la plantilla o la política.
+    """
+    from lex_domus.rag_pipeline import load_policy
+    from lex_domus.retriever import corpus_version
+    from verdiktia.inquiry_engine import JURISDICTIONS, template_nodes, templates_sha
+    corpus_sha = corpus_version()
+    if not corpus_sha:
+        print("Sin índice BM25: no se precalcula evidencia de nodos.")
+        return
+    nodes = {jur: template_nodes(jur) for jur in JURISDICTIONS}
+    st = build_evidence(nodes, corpus_sha, templates_sha(), load_policy(), force=force)
+    how = "regenerada" if st["rebuilt"] else "al día"
+    print(f"Evidencia de nodos {how} ({st['entries']} entradas, {len(nodes)} jurisdicciones).")
 
 # ---- FAISS (opcional, híbrido) ----
-def build_faiss():
+from lex_domus.chunk_store import STORE, load_store
+from lex_domus.dedup import is_alias
+from lex_domus.embed_cache import BATCH_SIZE, EMBED_CACHE, EmbeddingCache
+from lex_domus.index import file_sha256
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+def build_faiss(batch_size=BATCH_SIZE):
     try:
         from sentence_transformers import SentenceTransformer
         import faiss
@@ -31,23 +60,43 @@ def build_faiss():
         print("FAISS/embeddings no disponibles en este entorno. Solo BM25.")
         return
 
-    texts, metas = [], []
-    with open(CHUNKS, "r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-            texts.append(rec["text"])
-            metas.append(rec)
+    # solo chunks canónicos: los alias (casi duplicados) no se indexan
+    store = load_store(STORE, CHUNKS)
+    if store is not None:
+        rows = [i for i in range(len(store)) if not store.value("dup_of", i)]
+        texts = [store.text(i) for i in rows]
+        doc_ids = [store.doc_id(i) for i in rows]
+    else:
+        texts, doc_ids = [], []
+        with open(CHUNKS, "r", encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                if is_alias(rec):
+                    continue
+                texts.append(rec["text"])
+                doc_ids.append(rec.get("doc_id", ""))
 
-    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    X = model.encode(texts, normalize_embeddings=True, show_progress_bar=False).astype("float32")
+    model = SentenceTransformer(EMBED_MODEL)
+    encode = lambda batch: model.encode(batch, batch_size=len(batch), normalize_embeddings=True,
+                                        show_progress_bar=False)
+    with EmbeddingCache(EMBED_CACHE, EMBED_MODEL) as cache:
+        X, st = cache.encode(texts, encode, batch_size=batch_size)
     index = faiss.IndexFlatIP(X.shape[1])
     index.add(X)
     faiss.write_index(index, str(INDICES / "faiss.index"))
     np.save(INDICES / "embeddings.npy", X)
+    # fila i del índice = doc_ids[i]; los metadatos se leen del almacén de chunks por doc_id
     with open(INDICES / "vector_meta.json", "w", encoding="utf-8") as f:
-        json.dump({"metas": metas}, f, ensure_ascii=False)
-    print("FAISS index listo.")
+        json.dump({"schema": 2, "chunks_sha": file_sha256(CHUNKS), "doc_ids": doc_ids}, f, ensure_ascii=False)
+    print(f"FAISS index listo ({st['encoded']} codificados en {st['encode_s']:.2f}s, "
+          f"hit rate {st['hit_rate'] or 0:.0%}, {st['saved_s']:.2f}s ahorrados por la caché).")
 
 if __name__ == "__main__":
-    build_bm25()
-    build_faiss()
+    ap = argparse.ArgumentParser(description="Construye/actualiza los índices BM25 y FAISS desde chunks.jsonl")
+    ap.add_argument("--merge", action="store_true", help="compacta los segmentos BM25 en uno")
+    ap.add_argument("--no-merge", action="store_true", help="no aplica la política de merge automático")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="textos por lote al codificar embeddings")
+    args = ap.parse_args()
+    build_bm25(merge=True if args.merge else (False if args.no_merge else None))
+    build_node_evidence()
+    build_faiss(batch_size=args.batch_size)
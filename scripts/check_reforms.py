@@ -1,11 +1,22 @@
-import os, sys, json, hashlib, difflib, datetime, pathlib
-from typing import Dict, List, Tuple
+import argparse, os, sys, json, hashlib, datetime, pathlib, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from lex_domus import linediff
+from lex_domus.analyzer import normalize_text
+from lex_domus.chunk_store import load_store
+from lex_domus.index import scan_chunks
+from lex_domus.refs import ArticleScanner
+
 CORPUS = ROOT / "data" / "corpus"
 BASELINE = ROOT / "data" / "snapshots" / "baseline"
 PROPOSED = ROOT / "data" / "snapshots" / "proposed"
 STATUS = ROOT / "data" / "status"
+CHUNKS = ROOT / "data" / "docs_chunks" / "chunks.jsonl"
+STORE = ROOT / "data" / "docs_chunks" / "chunks.lxcs"
 STATUS.mkdir(parents=True, exist_ok=True)
 BASELINE.mkdir(parents=True, exist_ok=True)
 PROPOSED.mkdir(parents=True, exist_ok=True)
@@ -39,17 +50,144 @@ def _write(p: pathlib.Path, txt: str):
     p.parent.mkdir(parents=True, exist_ok=True)
     p.write_text(txt, encoding="utf-8")
 
-def _unified_diff(a: str, b: str, fromfile: str, tofile: str) -> str:
-    return "\n".join(difflib.unified_diff(
-        a.splitlines(), b.splitlines(),
-        fromfile=fromfile, tofile=tofile, lineterm=""
-    ))
-
-def _ratio(a: str, b: str) -> float:
-    # 1.0 = idéntico; 0.0 = totalmente distinto
-    return difflib.SequenceMatcher(None, a, b).ratio()
+def _lines(txt: str) -> List[str]:
+    # mismas líneas que recorre ingest al leer el fichero (saltos universales)
+    lines = txt.split("\n")
+    return lines[:-1] if lines and lines[-1] == "" else lines
+
+def _ordinals(fp: List[int]) -> List[int]:
+    """Nº de líneas no vacías hasta cada posición (incluida): coordenadas de line_start/line_end de los chunks."""
+    out, n = [], 0
+    for h in fp:
+        n += 1 if h else 0
+        out.append(n)
+    return out
+
+def _changes(ops: List[linediff.Opcode], old_fp: List[int], new_fp: List[int]) -> List[Dict[str, List[int]]]:
+    """
+    Tramos cambiados en líneas no vacías 1-indexed (las de los chunks):
+    {"old": [a0, a1], "new": [b0, b1]}. Un tramo vacío (inserción o borrado
+    puro) queda como [p + 1, p], siendo p la línea anterior.
+    """
+    old_ord, new_ord = _ordinals(old_fp), _ordinals(new_fp)
+    out = []
+    for tag, i1, i2, j1, j2 in ops:
+        if tag == "equal" or not any(old_fp[i1:i2]) and not any(new_fp[j1:j2]):
+            continue  # solo líneas en blanco: ingest no las ve
+        a0 = old_ord[i1 - 1] if i1 else 0
+        b0 = new_ord[j1 - 1] if j1 else 0
+        out.append({"old": [a0 + 1, old_ord[i2 - 1] if i2 > i1 else a0],
+                    "new": [b0 + 1, new_ord[j2 - 1] if j2 > j1 else b0]})
+    return out
+
+def _spans(lines: List[str]) -> List[Tuple[str, int, int]]:
+    scanner = ArticleScanner()
+    for raw in lines:
+        line = normalize_text(raw).strip()
+        if line:
+            scanner.feed(line)
+    return scanner.spans()
+
+def _articles(changes: List[Dict[str, List[int]]], old_lines: List[str], new_lines: List[str]) -> List[str]:
+    """Artículos tocados: los de la baseline que se solapan con un tramo cambiado y los de la versión nueva."""
+    out: List[str] = []
+    for side, lines in (("old", old_lines), ("new", new_lines)):
+        for key, s0, s1 in _spans(lines):
+            # un tramo vacío [p + 1, p] toca el artículo que contiene p o p + 1
+            if key not in out and any(s0 <= c[side][1] + 1 and s1 >= c[side][0] - 1 for c in changes):
+                out.append(key)
+    return out
+
+def check_doc(fname: str) -> Dict[str, Any]:
+    """
+    Compara corpus/<fname> con su baseline. Si cambió, guarda la versión
+    propuesta y el parche. El diff alinea huellas de línea
+    (lex_domus.linediff): coste ~lineal con el tamaño de la norma.
+    """
+    src = CORPUS / fname
+    base = BASELINE / fname
+    if not src.exists():
+        # si falta el corpus fuente, seguimos pero lo marcamos como no disponible
+        return {"name": fname, "available": False, "changed": False, "url": URLS.get(fname, "")}
+
+    t0 = time.perf_counter()
+    cur = _read(src)
+    old = _read(base)
+    cur_h, old_h = _sha256(cur), _sha256(old) if old else ""
+    changed = (old != "" and cur_h != old_h)
+    old_lines, cur_lines = _lines(old), _lines(cur)
+    old_fp, cur_fp = linediff.fingerprints(old_lines), linediff.fingerprints(cur_lines)
+
+    entry = {
+        "name": fname,
+        "available": True,
+        "url": URLS.get(fname, ""),
+        "old_sha256": old_h,
+        "new_sha256": cur_h,
+        "changed": changed,
+        # 1.0 = idéntico; 0.0 = ninguna línea en común
+        "similarity": round(linediff.similarity(old_fp, cur_fp), 4) if old else 1.0,
+        "diff_path": None,
+        "proposed_path": None,
+        "baseline_path": str(base.relative_to(ROOT)) if base.exists() else None,
+    }
 
-def main():
+    if changed:
+        # guarda proposed para revisión
+        proposed = PROPOSED / fname
+        _write(proposed, cur)
+        entry["proposed_path"] = str(proposed.relative_to(ROOT))
+
+        # genera diff unificado
+        ops = linediff.opcodes(old_fp, cur_fp)
+        diff = "\n".join(linediff.unified_diff(old_lines, cur_lines, ops,
+                                               fromfile=f"baseline/{fname}", tofile=f"proposed/{fname}"))
+        diff_path = STATUS / f"diff_{fname.replace('.txt','')}.patch"
+        _write(diff_path, diff)
+        entry["diff_path"] = str(diff_path.relative_to(ROOT))
+
+        # mapa de impacto (los chunks afectados se añaden en main, con el corpus troceado)
+        entry["changes"] = _changes(ops, old_fp, cur_fp)
+        entry["articles"] = _articles(entry["changes"], old_lines, cur_lines)
+    entry["seconds"] = round(time.perf_counter() - t0, 3)
+    return entry
+
+def affected_chunks(docs: List[Dict[str, Any]]) -> None:
+    """
+    Añade a cada documento cambiado los doc_id de sus chunks (los de la
+    baseline troceada por ingest) afectados por algún tramo: los que lo
+    solapan y el inmediatamente anterior, cuyo corte depende de la línea
+    siguiente. Así ingest sabe desde qué chunk re-trocear.
+    """
+    changed = {pathlib.Path(d["name"]).stem: d for d in docs if d.get("changes")}
+    if not changed:
+        return
+    store = load_store(STORE, CHUNKS)
+    if store is not None:
+        rows = ((store.doc_id(i), store.value("line_start", i), store.value("line_end", i)) for i in range(len(store)))
+    elif CHUNKS.exists():
+        rows = ((r.get("doc_id", ""), r.get("line_start"), r.get("line_end")) for r in scan_chunks(CHUNKS)[0])
+    else:
+        rows = iter(())
+    for d in changed.values():
+        d["affected_chunks"] = []
+    for doc_id, l0, l1 in rows:
+        d = changed.get(doc_id.split("#")[0])
+        if d is None or l0 is None or l1 is None:
+            continue
+        # max(): un tramo vacío [p + 1, p] también toca el chunk que empieza en p + 1
+        if any(l0 <= max(c["old"]) and l1 + 1 >= c["old"][0] for c in d["changes"]):
+            d["affected_chunks"].append(doc_id)
+
+def run_checks(names: List[str], workers: int) -> List[Dict[str, Any]]:
+    """Un documento por proceso; map conserva el orden de `names` (informe determinista)."""
+    if workers <= 1 or len(names) <= 1:
+        return [check_doc(n) for n in names]
+    with ProcessPoolExecutor(max_workers=min(workers, len(names))) as pool:
+        return list(pool.map(check_doc, names))
+
+def main(workers: int = 0):
+    workers = workers or os.cpu_count() or 1
     ts = datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
     report = {
         "timestamp": ts,
@@ -66,49 +204,17 @@ def main():
             _write(base, _read(src))
             initialized = True
 
-    for fname in KNOWN_FULLS:
-        src = CORPUS / fname
-        base = BASELINE / fname
-        if not src.exists():
-            # si falta el corpus fuente, seguimos pero lo marcamos como no disponible
-            report["docs"].append({
-                "name": fname, "available": False, "changed": False,
-                "url": URLS.get(fname, "")
-            })
-            continue
-
-        cur = _read(src)
-        old = _read(base)
-        cur_h, old_h = _sha256(cur), _sha256(old) if old else ""
-        changed = (old != "" and cur_h != old_h)
-
-        entry = {
-            "name": fname,
-            "available": True,
-            "url": URLS.get(fname, ""),
-            "old_sha256": old_h,
-            "new_sha256": cur_h,
-            "changed": changed,
-            "similarity": _ratio(old, cur) if old else 1.0,
-            "diff_path": None,
-            "proposed_path": None,
-            "baseline_path": str(base.relative_to(ROOT)) if base.exists() else None,
-        }
-
-        if changed:
-            report["changed_count"] += 1
-            # guarda proposed para revisión
-            proposed = PROPOSED / fname
-            _write(proposed, cur)
-            entry["proposed_path"] = str(proposed.relative_to(ROOT))
-
-            # genera diff unificado
-            diff = _unified_diff(old, cur, fromfile=f"baseline/{fname}", tofile=f"proposed/{fname}")
-            diff_path = STATUS / f"diff_{fname.replace('.txt','')}.patch"
-            _write(diff_path, diff)
-            entry["diff_path"] = str(diff_path.relative_to(ROOT))
-
-        report["docs"].append(entry)
+    t0 = time.perf_counter()
+    report["docs"] = run_checks(KNOWN_FULLS, workers)
+    report["changed_count"] = sum(1 for d in report["docs"] if d["changed"])
+    affected_chunks(report["docs"])
+    report["affected"] = {
+        "doc_ids": [c for d in report["docs"] for c in d.get("affected_chunks", [])],
+        "articles": {d["name"]: d["articles"] for d in report["docs"] if d.get("articles")},
+    }
+    slowest = max(report["docs"], key=lambda d: d.get("seconds", 0.0))
+    print(f"[watch] {len(KNOWN_FULLS)} documentos en {time.perf_counter() - t0:.2f}s "
+          f"(más lento: {slowest['name']}, {slowest.get('seconds', 0.0):.2f}s)")
 
     # escribe reporte
     _write(STATUS / "reforms_report.json", json.dumps(report, ensure_ascii=False, indent=2))
@@ -123,6 +229,9 @@ def main():
             for d in report["docs"]:
                 if d["changed"]:
                     s.write(f"  - {d['name']}: similarity {d['similarity']:.3f} → diff: `{d['diff_path']}`\n")
+                    if d.get("articles"):
+                        s.write(f"    - artículos: {', '.join(d['articles'])}; "
+                                f"chunks afectados: {len(d.get('affected_chunks', []))}\n")
             if initialized:
                 s.write("\n_Nota:_ baseline inicializada con el corpus actual (no se marcan cambios en esta ejecución).\n")
 
@@ -131,4 +240,8 @@ def main():
     print(f"::set-output name=changed_count::{report['changed_count']}")
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=0,
+                    help="procesos para comparar en paralelo (0 = nº de CPUs, 1 = sin pool)")
+    args = ap.parse_args()
+    main(workers=args.workers)
@@ -4,6 +4,8 @@ from datetime import datetime
 from typing import Dict, List
 
 ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 CHUNKS = ROOT / "data" / "docs_chunks" / "chunks.jsonl"
 STATUS = ROOT / "data" / "status"
 STATUS.mkdir(parents=True, exist_ok=True)
@@ -18,6 +20,14 @@ def count_families() -> Dict[str,int]:
     counts: Dict[str,int] = {}
     if not CHUNKS.exists():
         return counts
+    try:
+        from lex_domus.chunk_store import load_store
+        store = load_store(CHUNKS.with_name("chunks.lxcs"), CHUNKS)
+    except Exception:
+        store = None
+    if store is not None:
+        # almacén binario: recuento por códigos de family, sin leer el JSONL
+        return dict(sorted(store.value_counts("family", missing="GEN").items(), key=lambda kv: kv[0]))
     with CHUNKS.open("r", encoding="utf-8") as f:
         for line in f:
             if not line.strip(): 
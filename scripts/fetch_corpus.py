@@ -1,10 +1,20 @@
-import re, requests, pathlib
+import argparse, hashlib, json, re, requests, pathlib, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Sequence, Tuple
 from bs4 import BeautifulSoup
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 OUT = ROOT / "data" / "corpus"
 OUT.mkdir(parents=True, exist_ok=True)
 
+# Validadores HTTP (ETag / Last-Modified) de la última descarga de cada fuente
+CACHE = ROOT / "data" / "status" / "fetch_cache.json"
+CACHE_SCHEMA = 1
+
+# Descargas simultáneas (hilos) y tiempo máximo por petición
+WORKERS = 8
+TIMEOUT = 30
+
 SOURCES = [
     # LPI (BOE consolidado)
     ("es_lpi_full.txt", "https://www.boe.es/buscar/act.php?id=BOE-A-1996-8930"),
@@ -29,21 +39,102 @@ def clean_text(html: str) -> str:
     text = re.sub(r"\n{3,}", "\n\n", text)
     return text
 
-def fetch_one(name: str, url: str):
-    print(f"[fetch] {name} <- {url}")
+def load_cache(path: pathlib.Path = CACHE) -> Dict[str, Dict[str, Any]]:
     try:
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        txt = clean_text(r.text)
-        # guarda
-        (OUT / name).write_text(txt, encoding="utf-8")
-        print(f"[fetch] OK -> {OUT/name}")
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return data.get("sources", {}) if data.get("schema") == CACHE_SCHEMA else {}
+
+def save_cache(entries: Dict[str, Dict[str, Any]], path: pathlib.Path = CACHE) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"schema": CACHE_SCHEMA, "sources": entries}, ensure_ascii=False, indent=1),
+                   encoding="utf-8")
+    tmp.replace(path)
+
+def make_session(workers: int = WORKERS) -> requests.Session:
+    """Sesión compartida por los hilos: un pool de conexiones por host (keep-alive)."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _local_sha256(path: pathlib.Path) -> Optional[str]:
+    """sha del texto del fichero descargado (mismo hash que la caché); None si no existe."""
+    try:
+        return hashlib.sha256(path.read_text(encoding="utf-8").encode("utf-8")).hexdigest()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+def fetch_one(session: requests.Session, name: str, url: str, out_dir: pathlib.Path,
+              cached: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Descarga condicional de una fuente. Con validadores en caché (y el
+    fichero local intacto: su sha es el de la caché) envía If-None-Match /
+    If-Modified-Since: un 304 no se descarga ni se parsea. Si el fichero
+    falta o se editó/truncó localmente, se descarga sin condiciones y se
+    restaura. Devuelve (estado, entrada de caché), con estado "unchanged"
+    (304), "same" (200 con el mismo texto que el fichero), "updated" o "error".
+    """
+    t0 = time.perf_counter()
+    dst = out_dir / name
+    local = _local_sha256(dst)
+    headers = {}
+    if cached and cached.get("url") == url and local is not None and local == cached.get("sha256"):
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        r = session.get(url, headers=headers, timeout=TIMEOUT)
+        if r.status_code == 304:
+            status, entry = "unchanged", dict(cached)
+        else:
+            r.raise_for_status()
+            txt = clean_text(r.text)
+            sha = hashlib.sha256(txt.encode("utf-8")).hexdigest()
+            status = "same" if local == sha else "updated"
+            if status == "updated":
+                dst.write_text(txt, encoding="utf-8")
+            entry = {
+                "url": url,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "sha256": sha,
+            }
     except Exception as e:
         print(f"[fetch] WARN: no se pudo descargar {url} ({type(e).__name__})")
+        return "error", dict(cached or {})
+    print(f"[fetch] {name}: {status} ({time.perf_counter() - t0:.2f}s)")
+    return status, entry
+
+def fetch_all(sources: Sequence[Tuple[str, str]], out_dir: pathlib.Path = OUT, cache_path: pathlib.Path = CACHE,
+              workers: int = WORKERS, session: Optional[requests.Session] = None) -> Dict[str, str]:
+    """
+    Descarga las fuentes en paralelo (hilos + sesión compartida) con
+    peticiones condicionales. Devuelve nombre -> estado (ver fetch_one) y
+    actualiza la caché de validadores.
+    """
+    cache = load_cache(cache_path)
+    session = session or make_session(workers)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources)))) as pool:
+        done = list(pool.map(lambda src: fetch_one(session, src[0], src[1], out_dir, cache.get(src[0])), sources))
+    results = {}
+    for (name, _url), (status, entry) in zip(sources, done):
+        results[name] = status
+        if entry:
+            cache[name] = entry
+    save_cache(cache, cache_path)
+    counts = {s: list(results.values()).count(s) for s in ("updated", "same", "unchanged", "error")}
+    print(f"[fetch] {len(sources)} fuentes en {time.perf_counter() - t0:.2f}s: "
+          + ", ".join(f"{n} {s}" for s, n in counts.items()))
+    return results
 
-def main():
-    for name, url in SOURCES:
-        fetch_one(name, url)
+def main(workers: int = WORKERS):
+    fetch_all(SOURCES, workers=workers)
     # crea extractos mínimos compatibles con tu pipeline actual (si no existen)
     def ensure_excerpt(src, dst, patterns):
         dstp = OUT / dst
@@ -69,4 +160,7 @@ def main():
     print("[fetch] done")
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=WORKERS, help="descargas simultáneas")
+    args = ap.parse_args()
+    main(workers=args.workers)
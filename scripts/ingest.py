@@ -1,11 +1,37 @@
-import os, json, re, pathlib
-from typing import List, Dict
+import argparse, hashlib, os, sys, json, re, pathlib, shutil, tempfile, time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from lex_domus.analyzer import normalize_text
+from lex_domus.chunk_store import load_store, write_store
+from lex_domus.dedup import collapse_stream
+from lex_domus.index import file_sha256, scan_chunks
+from lex_domus.refs import REFS_SCHEMA, ArticleScanner
+
 CORPUS_DIR = ROOT / "data" / "corpus"
 CHUNKS_DIR = ROOT / "data" / "docs_chunks"
 CHUNKS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Manifiesto de la ingesta: por fichero del corpus, hash de contenido, rango de
+# líneas y de bytes en chunks.jsonl y sus artículos; permite re-trocear solo lo que cambió
+MANIFEST = CHUNKS_DIR / "manifest.json"
+MANIFEST_SCHEMA = 4
+
+# Caché local (no versionada) de tamaño/mtime -> sha256 por fichero: evita releer el
+# corpus sin meter en el manifiesto datos que cambian en cada clon
+STAT_CACHE = CHUNKS_DIR / ".stat_cache.json"
+
+# Informe de check_reforms con el mapa de impacto (chunks afectados por norma)
+REFORMS = ROOT / "data" / "status" / "reforms_report.json"
+
+# Parámetros de troceado (si cambian, el manifiesto deja de valer)
+CHUNK_PARAMS = {"max_chars": 1000, "overlap_lines": 2}
+
 # --------- Helpers de metadatos ---------
 
 def detect_meta(path: pathlib.Path) -> Dict[str, str]:
@@ -64,54 +90,434 @@ def build_ref(chunk_text: str, family: str) -> Dict[str, str]:
         return {"ref_label": "17 USC (general)", "ref_url": "https://www.law.cornell.edu/uscode/text/17"}
     return {"ref_label": "", "ref_url": ""}
 
+def iter_chunks(lines: Iterable[str], max_chars=900, overlap_lines=2, start=1) -> Iterator[Tuple[int, int, str]]:
+    """
+    Agrupa líneas en bloques ~max_chars en streaming: (línea inicial, línea final, texto),
+    líneas 1-indexed (`start` = nº de la primera línea de `lines`). Una línea que no
+    cabe sola en max_chars se descarta.
+    `overlap_lines` se mantiene por compatibilidad: el avance siempre ha sido sin solape.
+    """
+    block: List[str] = []
+    size = first = 0
+    n = start - 1
+    for n, line in enumerate(lines, start):
+        if size + len(line) + 1 <= max_chars:
+            if not block:
+                first = n
+            block.append(line)
+            size += len(line) + 1
+            continue
+        if block:
+            yield first, n - 1, "\n".join(block).strip()
+        block, size = ([line], len(line) + 1) if len(line) + 1 <= max_chars else ([], 0)
+        first = n
+    if block:
+        yield first, n, "\n".join(block).strip()
+
 def group_lines(lines: List[str], max_chars=900, overlap_lines=2):
-    """Agrupa líneas en bloques ~max_chars controlando un solape pequeño (por líneas)."""
-    chunks = []
-    start = 0
-    while start < len(lines):
-        size = 0
-        end = start
-        while end < len(lines) and size + len(lines[end]) + 1 <= max_chars:
-            size += len(lines[end]) + 1
-            end += 1
-        # bloque
-        text = "\n".join(lines[start:end]).strip()
-        if text:
-            chunks.append((start+1, end, text))  # líneas 1-indexed
-        # avanza con solape
-        start = max(end - overlap_lines, end) if end > start else end + 1
-    return chunks
+    """Agrupa líneas en bloques ~max_chars (lista; ver iter_chunks)."""
+    return list(iter_chunks(lines, max_chars=max_chars, overlap_lines=overlap_lines))
+
+def iter_lines(f: pathlib.Path) -> Iterator[str]:
+    """Líneas no vacías del fichero, sin cargarlo entero (NFC, sin espacios de borde)."""
+    with f.open("r", encoding="utf-8") as fh:
+        for raw in fh:
+            # NFC + saltos de línea: mismo texto base que ve el analizador del índice
+            line = normalize_text(raw).strip()
+            if line:
+                yield line
+
+def article_locations(articles: List[Tuple[str, int, int]],
+                      chunks: List[Tuple[str, int, int]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    (artículo, {doc_id, line_start, line_end}) por cada chunk que contiene parte
+    de un artículo; las líneas son la intersección artículo ∩ chunk.
+    `articles` = [(clave, a0, a1)] (ArticleScanner.spans), `chunks` = [(doc_id, l0, l1)].
+    """
+    ends = [l1 for _, _, l1 in chunks]
+    out = []
+    for key, a0, a1 in articles:
+        for doc_id, l0, l1 in chunks[bisect_left(ends, a0):]:
+            if l0 > a1:
+                break
+            out.append((key, {"doc_id": doc_id, "line_start": max(a0, l0), "line_end": min(a1, l1)}))
+    return out
+
+# --------- Troceado por fichero ---------
+
+def file_records(f: pathlib.Path, out: BinaryIO,
+                 resume: Optional[Tuple[int, int, List[Tuple[str, int, int]]]] = None,
+                 ) -> Tuple[int, Dict[str, List[Dict[str, Any]]]]:
+    """
+    Trocea un fichero del corpus en streaming, escribiendo sus chunks (JSONL) en
+    `out`. Devuelve (nº de chunks escritos, artículos: clave -> ubicaciones en chunks).
+    resume = (k, línea, spans de los k primeros chunks): los k primeros chunks no
+    cambian (ver reform_resume) y solo se trocea desde `línea`, numerando desde k;
+    los artículos se siguen detectando en todo el fichero.
+    """
+    meta_base = detect_meta(f)
+    scanner = ArticleScanner()
+    first_idx, first_line, spans = resume or (0, 1, [])
+    spans = list(spans)
+    def scanned() -> Iterator[str]:
+        for n, line in enumerate(iter_lines(f), 1):
+            scanner.feed(line)
+            if n >= first_line:
+                yield line
+    n_written = 0
+    for idx, (l0, l1, text) in enumerate(iter_chunks(scanned(), start=first_line, **CHUNK_PARAMS), first_idx):
+        doc_id = f"{f.stem}#c{idx:03d}"
+        ref = build_ref(text, meta_base["family"])
+        record = {
+            "doc_id": doc_id,
+            "source": meta_base["source"],
+            "jurisdiction": meta_base["jurisdiction"],
+            "title": meta_base["title"],
+            "family": meta_base["family"],
+            "ref_label": ref["ref_label"],
+            "ref_url": ref["ref_url"],
+            "pinpoint": bool(ref["ref_label"]),   # True si detectamos referencia
+            "line_start": l0,
+            "line_end": l1,
+            "text": text
+        }
+        out.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        spans.append((doc_id, l0, l1))
+        n_written += 1
+    refs: Dict[str, List[Dict[str, Any]]] = {}
+    for key, loc in article_locations(scanner.spans(), spans):
+        locs = refs.setdefault(key, [])
+        # encabezados repetidos del mismo artículo en un chunk -> una sola ubicación
+        if locs and locs[-1]["doc_id"] == loc["doc_id"]:
+            locs[-1]["line_end"] = max(locs[-1]["line_end"], loc["line_end"])
+        else:
+            locs.append(loc)
+    return n_written, refs
+
+def ingest_file(job: Tuple[Any, ...]) -> Dict[str, Any]:
+    """
+    Tarea de un proceso: trocea `src` en el fichero temporal `dst` (una línea por
+    chunk). Un tercer elemento opcional es el `resume` de file_records.
+    """
+    src, dst = pathlib.Path(job[0]), pathlib.Path(job[1])
+    with open(dst, "wb") as out:
+        n_chunks, refs = file_records(src, out, job[2] if len(job) > 2 else None)
+    return {"chunks": n_chunks, "refs": refs, "family": detect_meta(src)["family"], "bytes": src.stat().st_size}
+
+# --------- Manifiesto (ingesta incremental) ---------
+
+def load_manifest(chunks_path: pathlib.Path) -> Dict[str, Any]:
+    """
+    Manifiesto de la última ingesta si sigue describiendo chunks.jsonl (mismo
+    esquema, mismos parámetros de troceado y mismo sha del fichero); si no, {}.
+    """
+    try:
+        man = json.loads(MANIFEST.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if man.get("schema") != MANIFEST_SCHEMA or man.get("params") != CHUNK_PARAMS:
+        return {}
+    if not chunks_path.exists() or man.get("chunks_sha") != file_sha256(chunks_path):
+        return {}
+    return man
+
+def load_stat_cache() -> Dict[str, Dict[str, Any]]:
+    try:
+        return json.loads(STAT_CACHE.read_text(encoding="utf-8")).get("files", {})
+    except Exception:
+        return {}
+
+def _file_state(f: pathlib.Path, entry: Optional[Dict[str, Any]],
+                cached: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
+    """(sin cambios respecto al manifiesto, sha256). Si tamaño y mtime coinciden con la caché local no se relee."""
+    st = f.stat()
+    if cached and (st.st_size, st.st_mtime_ns) == (cached.get("size"), cached.get("mtime_ns")):
+        sha = cached["sha256"]
+    else:
+        sha = file_sha256(f)
+    return bool(entry) and sha == entry.get("sha256"), sha
+
+def _write_if_changed(path: pathlib.Path, text: str) -> bool:
+    """Escribe solo si el contenido difiere (sin churn de mtime ni de git en ejecuciones sin cambios)."""
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return False
+    except OSError:
+        pass
+    path.write_text(text, encoding="utf-8")
+    return True
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, start: int, end: int) -> None:
+    src.seek(start)
+    left = end - start
+    while left > 0:
+        block = src.read(min(left, 1 << 20))
+        if not block:
+            break
+        dst.write(block)
+        left -= len(block)
+
+# --------- Reformas (mapa de impacto de check_reforms) ---------
+
+def load_reforms(path: pathlib.Path) -> Dict[str, Dict[str, Any]]:
+    """Documentos cambiados de reforms_report.json con su mapa de impacto: nombre -> entrada."""
+    try:
+        report = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    return {d["name"]: d for d in report.get("docs", []) if d.get("changed") and "affected_chunks" in d}
+
+def _text_sha256(f: pathlib.Path) -> str:
+    # mismo hash que check_reforms (texto con saltos universales), no el del fichero en bytes
+    return hashlib.sha256(f.read_text(encoding="utf-8").encode("utf-8")).hexdigest()
+
+def reform_resume(old: BinaryIO, entry: Dict[str, Any], reform: Dict[str, Any],
+                  f: pathlib.Path) -> Optional[Tuple[int, int, int, List]]:
+    """
+    Punto de reanudación del troceado de un fichero reformado: (k, línea,
+    bytes, spans). Los k chunks anteriores al primero afectado no cambian
+    (su corte depende solo de líneas anteriores al primer tramo cambiado):
+    se copian (`bytes` desde el inicio del fichero en chunks.jsonl) y se
+    trocea desde la línea siguiente al último. None si el informe no
+    describe la versión ingerida (otro sha), el corpus actual `f` ya no es la
+    versión que analizó (cambió después del informe) o no hay nada que conservar.
+    """
+    if reform.get("old_sha256") != entry.get("sha256") or not reform["affected_chunks"]:
+        return None
+    if reform.get("new_sha256") != _text_sha256(f):
+        return None
+    k = min(int(re.search(r"#c(\d+)$", d).group(1)) for d in reform["affected_chunks"])
+    if k <= 0:
+        return None
+    old.seek(entry["bytes"][0])
+    spans, size = [], 0
+    for _ in range(k):
+        raw = old.readline()
+        rec = json.loads(raw)
+        spans.append((rec["doc_id"], rec["line_start"], rec["line_end"]))
+        size += len(raw)
+    return k, spans[-1][2] + 1, size, spans
+
+def run_jobs(jobs: List[Tuple[Any, ...]], workers: int) -> List[Dict[str, Any]]:
+    """Trocea en paralelo; map conserva el orden de `jobs` (salida determinista)."""
+    if workers <= 1 or len(jobs) <= 1:
+        return [ingest_file(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(ingest_file, jobs))
+
+# --------- Casi duplicados ---------
+
+def dedup_chunks(path: pathlib.Path, files: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Marca los chunks casi duplicados de `path` entre versiones del corpus
+    (lex_domus.dedup): el canónico de cada grupo lleva "aliases" y el resto
+    "dup_of" (no se indexan). Reescribe el fichero y los rangos de bytes de
+    `files`. Las marcas se recalculan desde cero en cada pasada.
+
+    Memoria constante en el tamaño de los textos: una lectura en streaming
+    alimenta el LSH (solo doc_ids, offsets y bandas en memoria; los
+    candidatos se releen por offset) y otra reescribe cada línea con sus
+    marcas a un temporal.
+    """
+    offsets: List[int] = []
+
+    def records() -> Iterator[Tuple[str, str]]:
+        with open(path, "rb") as f:
+            pos = 0
+            for raw in f:
+                if raw.strip():
+                    rec = json.loads(raw)
+                    offsets.append(pos)
+                    yield rec["doc_id"], rec.get("text", "")
+                pos += len(raw)
+
+    with open(path, "rb") as reread:
+        def text_of(i: int) -> str:
+            reread.seek(offsets[i])
+            return json.loads(reread.readline()).get("text", "")
+        groups = collapse_stream(records(), text_of)
+    canon = {alias: doc_id for doc_id, aliases in groups.items() for alias in aliases}
+
+    tmp = path.with_name(path.name + ".tmp")
+    n = 0
+    canon_lines: Dict[str, List[int]] = {}  # canónico -> [line_start, line_end] (refs de sus alias)
+    with open(path, "rb") as src, open(tmp, "wb") as out:
+        lines = (raw for raw in src if raw.strip())
+        for name, entry in sorted(files.items(), key=lambda kv: kv[1]["chunks"][0]):
+            start = out.tell()
+            lo, hi = entry["chunks"]
+            for _ in range(hi - lo):
+                rec = json.loads(next(lines))
+                rec.pop("aliases", None)
+                rec.pop("dup_of", None)
+                doc_id = rec["doc_id"]
+                text = rec.pop("text")
+                if doc_id in groups:
+                    rec["aliases"] = groups[doc_id]
+                    canon_lines[doc_id] = [rec.get("line_start"), rec.get("line_end")]
+                elif doc_id in canon:
+                    rec["dup_of"] = canon[doc_id]
+                rec["text"] = text  # el texto sigue siendo el último campo
+                out.write((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+                n += 1
+            entry["bytes"] = [start, out.tell()]
+    os.replace(tmp, path)
+    return {
+        "chunks": n,
+        "groups": len(groups),
+        "duplicates": len(canon),
+        "indexed": n - len(canon),
+        "reduction": round(len(canon) / n, 4) if n else 0.0,
+        "aliases": dict(sorted(canon.items())),
+        "canon_lines": canon_lines,
+    }
 
 # --------- Main ---------
 
-def main():
+def main(full: bool = False, workers: int = 0, reforms: Optional[pathlib.Path] = None):
+    workers = workers or os.cpu_count() or 1
     out_path = CHUNKS_DIR / "chunks.jsonl"
-    with open(out_path, "w", encoding="utf-8") as out:
-        for f in sorted(CORPUS_DIR.glob("*.txt")):
-            meta_base = detect_meta(f)
-            raw = f.read_text(encoding="utf-8")
-            # normaliza saltos de línea (mejor para anchors de línea)
-            raw = re.sub(r"\r\n?", "\n", raw).strip()
-            lines = [ln.strip() for ln in raw.split("\n") if ln.strip()]
-            for idx, (l0, l1, text) in enumerate(group_lines(lines, max_chars=1000, overlap_lines=2)):
-                doc_id = f"{f.stem}#c{idx:03d}"
-                ref = build_ref(text, meta_base["family"])
-                record = {
-                    "doc_id": doc_id,
-                    "source": meta_base["source"],
-                    "jurisdiction": meta_base["jurisdiction"],
-                    "title": meta_base["title"],
-                    "family": meta_base["family"],
-                    "ref_label": ref["ref_label"],
-                    "ref_url": ref["ref_url"],
-                    "pinpoint": bool(ref["ref_label"]),   # True si detectamos referencia
-                    "line_start": l0,
-                    "line_end": l1,
-                    "text": text
-                }
-                out.write(json.dumps(record, ensure_ascii=False) + "\n")
-    print(f"[ingest] Chunks -> {out_path}")
+    man = {} if full else load_manifest(out_path)
+    old_files = man.get("files", {})
+    corpus = sorted(CORPUS_DIR.glob("*.txt"))
+    stat_cache = load_stat_cache()
+    states = {f.name: _file_state(f, old_files.get(f.name), stat_cache.get(f.name)) for f in corpus}
+    changed = [f for f in corpus if not states[f.name][0]]
+    removed = sorted(set(old_files) - set(states))
 
-if __name__ == "__main__":
-    main()
+    files: Dict[str, Dict[str, Any]] = {}
+    dedup: Optional[Dict[str, Any]] = None
+    if man and not changed and not removed:
+        print(f"[ingest] Sin cambios en {len(corpus)} ficheros; {out_path} intacto")
+    else:
+        with tempfile.TemporaryDirectory(dir=CHUNKS_DIR) as tmpdir:
+            # cada fichero cambiado se trocea (en paralelo) a su propio JSONL temporal
+            t0 = time.perf_counter()
+            # normas reformadas: se conservan los chunks anteriores al primero afectado
+            hints = load_reforms(reforms) if reforms and not full else {}
+            resume: Dict[str, Tuple[int, int, int, List]] = {}
+            if hints and old_files:
+                with open(out_path, "rb") as old:
+                    for f in changed:
+                        if f.name in hints and f.name in old_files:
+                            r = reform_resume(old, old_files[f.name], hints[f.name], f)
+                            if r is None:
+                                print(f"[ingest] {f.name}: el informe de reformas no describe la versión "
+                                      f"actual; se re-trocea completo")
+                            else:
+                                resume[f.name] = r
+                                print(f"[ingest] {f.name}: reforma, se conservan {r[0]} chunks y se "
+                                      f"re-trocea desde la línea {r[1]}")
+            jobs = []
+            for f in changed:
+                job = (str(f), str(pathlib.Path(tmpdir) / f"{f.name}.jsonl"))
+                if f.name in resume:
+                    k, line, _, spans = resume[f.name]
+                    job += ((k, line, spans),)
+                jobs.append(job)
+            done = dict(zip((f.name for f in changed), run_jobs(jobs, workers)))
+            elapsed = time.perf_counter() - t0
+            if changed:
+                mb = sum(r["bytes"] for r in done.values()) / 1e6
+                n_new = sum(r["chunks"] for r in done.values())
+                print(f"[ingest] {len(changed)} ficheros ({mb:.1f} MB) troceados en {elapsed:.2f} s con "
+                      f"{min(workers, len(changed))} procesos: {mb / max(elapsed, 1e-9):.1f} MB/s, "
+                      f"{n_new / max(elapsed, 1e-9):.0f} chunks/s")
+
+            # ensamblado en orden de corpus: bloques sin cambios por rango de bytes, el resto del temporal
+            tmp = out_path.with_name(out_path.name + ".tmp")
+            n_out = 0
+            with open(tmp, "wb") as out, (open(out_path, "rb") if old_files else open(os.devnull, "rb")) as old:
+                for f in corpus:
+                    start = out.tell()
+                    if f.name in done:
+                        res = done[f.name]
+                        kept = 0
+                        if f.name in resume:
+                            kept, _, size, _ = resume[f.name]
+                            _copy_range(old, out, old_files[f.name]["bytes"][0], old_files[f.name]["bytes"][0] + size)
+                        with open(pathlib.Path(tmpdir) / f"{f.name}.jsonl", "rb") as part:
+                            shutil.copyfileobj(part, out, 1 << 20)
+                        family, file_refs, n_chunks = res["family"], res["refs"], kept + res["chunks"]
+                    else:
+                        # mismo contenido: se copian sus líneas tal cual (doc_ids estables)
+                        entry = old_files[f.name]
+                        _copy_range(old, out, *entry["bytes"])
+                        family, file_refs = entry["family"], entry["refs"]
+                        n_chunks = entry["chunks"][1] - entry["chunks"][0]
+                    files[f.name] = {
+                        "family": family,
+                        "chunks": [n_out, n_out + n_chunks],
+                        "bytes": [start, out.tell()],
+                        "refs": file_refs,
+                    }
+                    n_out += n_chunks
+            os.replace(tmp, out_path)
+        print(f"[ingest] Chunks -> {out_path} ({n_out} chunks; {len(corpus) - len(changed)} ficheros sin cambios, "
+              f"{len(changed)} re-troceados, {len(removed)} eliminados)")
+
+        dedup = dedup_chunks(out_path, files)
+        print(f"[ingest] Casi duplicados: {dedup['duplicates']} chunks en {dedup['groups']} grupos pasan a alias "
+              f"-> {dedup['indexed']} chunks indexables ({dedup['reduction']:.1%} menos en el índice)")
+        aliases, canon_lines = dedup["aliases"], dedup["canon_lines"]
 
+        refs: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for name in sorted(files):
+            fam = refs.setdefault(files[name]["family"], {})
+            for key, locs in files[name]["refs"].items():
+                fam.setdefault(key, []).extend(locs)
+        # las ubicaciones en chunks alias no se resuelven (el alias no está indexado): sobran si el
+        # artículo tiene otras; si son las únicas, pasan al chunk canónico del alias (el chunk entero)
+        for fam in refs.values():
+            for key, locs in fam.items():
+                kept = [l for l in locs if l["doc_id"] not in aliases]
+                if not kept:
+                    canons = dict.fromkeys(aliases[l["doc_id"]] for l in locs)
+                    kept = [{"doc_id": c, "line_start": canon_lines[c][0], "line_end": canon_lines[c][1]}
+                            for c in canons]
+                fam[key] = kept
+        refs_path = CHUNKS_DIR / "refs.json"
+        refs_path.write_text(json.dumps({"schema": REFS_SCHEMA, "refs": refs}, ensure_ascii=False), encoding="utf-8")
+        print(f"[ingest] Referencias ({sum(len(v) for v in refs.values())} artículos) -> {refs_path}")
+
+    # almacén binario (chunks.lxcs) que leen retriever y scripts en lugar de chunks.jsonl
+    chunks_sha = file_sha256(out_path)
+    store_path = CHUNKS_DIR / "chunks.lxcs"
+    store = load_store(store_path, out_path)
+    if store is None or store.corpus_sha != chunks_sha:
+        records, _, _ = scan_chunks(out_path)
+        st = out_path.stat()
+        n = write_store(records, store_path, corpus_sha=chunks_sha, chunks_size=st.st_size, chunks_mtime_ns=st.st_mtime_ns)
+        print(f"[ingest] Almacén binario ({n} chunks) -> {store_path}")
+
+    # el manifiesto solo guarda hashes de contenido y se escribe si cambió algo;
+    # tamaño/mtime van a la caché local
+    stats = {}
+    for f in corpus:
+        st = f.stat()
+        entry = files.get(f.name) or {k: old_files[f.name][k] for k in ("family", "chunks", "bytes", "refs")}
+        files[f.name] = {"sha256": states[f.name][1], **entry}
+        stats[f.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": states[f.name][1]}
+    if dedup is None:
+        dedup = man.get("dedup")
+    text = json.dumps({
+        "schema": MANIFEST_SCHEMA,
+        "params": CHUNK_PARAMS,
+        "chunks_sha": chunks_sha,
+        "dedup": {k: v for k, v in (dedup or {}).items() if k not in ("aliases", "canon_lines")},
+        "files": files,
+    }, ensure_ascii=False)
+    if _write_if_changed(MANIFEST, text):
+        print(f"[ingest] Manifiesto -> {MANIFEST}")
+    _write_if_changed(STAT_CACHE, json.dumps({"files": stats}, ensure_ascii=False))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--full", action="store_true", help="ignorar el manifiesto y re-trocear todo el corpus")
+    ap.add_argument("--workers", type=int, default=0,
+                    help="procesos para trocear en paralelo (0 = nº de CPUs, 1 = sin pool)")
+    ap.add_argument("--reforms", nargs="?", type=pathlib.Path, const=REFORMS, default=None,
+                    help="reforms_report.json de check_reforms: re-trocear las normas reformadas "
+                         "solo desde su primer chunk afectado")
+    args = ap.parse_args()
+    main(full=args.full, workers=args.workers, reforms=args.reforms)
@@ -12,14 +12,28 @@ STATUS_DIR.mkdir(parents=True, exist_ok=True)
 
 HIST_CSV = STATUS_DIR / "families_history.csv"
 
+def _chunk_store(path: Path):
+    # almacén binario junto a chunks.jsonl (lo escribe ingest); None si falta o está desfasado
+    try:
+        from lex_domus.chunk_store import load_store
+    except Exception:
+        return None
+    return load_store(path.with_name("chunks.lxcs"), path)
+
 def read_jsonl_count(path: Path) -> int:
     if not path.exists(): return 0
+    store = _chunk_store(path)
+    if store is not None:
+        return len(store)
     with path.open("r", encoding="utf-8") as f:
         return sum(1 for _ in f if _.strip())
 
 def read_chunks_families(path: Path) -> Dict[str, int]:
     fam: Dict[str,int] = {}
     if not path.exists(): return fam
+    store = _chunk_store(path)
+    if store is not None:
+        return dict(sorted(store.value_counts("family", missing="GEN").items(), key=lambda kv: kv[0]))
     with path.open("r", encoding="utf-8") as f:
         for line in f:
             if not line.strip(): continue
@@ -111,7 +125,7 @@ def main():
 
     chunks = ROOT / "data" / "docs_chunks" / "chunks.jsonl"
     indices = ROOT / "indices"
-    bm25_ok = (indices / "bm25.pkl").exists()
+    bm25_ok = (indices / "bm25" / "segments.json").exists()
     faiss_ok = (indices / "faiss.index").exists()
     emb_ok = (indices / "embeddings.npy").exists()
 
@@ -0,0 +1,131 @@
+import difflib, json, random
+
+from lex_domus import linediff
+from scripts import check_reforms
+
+def _apply(a, b, ops):
+    out = []
+    for tag, i1, i2, j1, j2 in ops:
+        out += a[i1:i2] if tag == "equal" else b[j1:j2]
+    return out
+
+def test_fingerprint_diff_reconstructs_and_matches_difflib_format():
+    rng = random.Random(7)
+    old = [f"Artículo {i}. Texto del artículo {i}." if i % 5 else "" for i in range(400)]
+    new = list(old)
+    new[10] = "Artículo 10. Texto reformado."
+    del new[50:53]
+    new[200:200] = ["Artículo 199 bis. Nuevo."]
+    new += ["Disposición final."]
+    for _ in range(20):
+        new.insert(rng.randrange(len(new)), "")
+    ops = linediff.opcodes(linediff.fingerprints(old), linediff.fingerprints(new))
+    assert _apply(old, new, ops) == new
+    assert sum(i2 - i1 for t, i1, i2, _, _ in ops if t == "equal") >= len(old) - 5
+
+    a, b = old[:30], new[:30]
+    ops = linediff.opcodes(linediff.fingerprints(a), linediff.fingerprints(b))
+    assert list(linediff.unified_diff(a, b, ops, "x", "y")) == list(
+        difflib.unified_diff(a, b, fromfile="x", tofile="y", lineterm=""))
+
+    fp = linediff.fingerprints(old)
+    assert linediff.similarity(fp, fp) == 1.0
+    assert 0.95 < linediff.similarity(fp, linediff.fingerprints(new)) < 1.0
+    assert linediff.fingerprint("  Artículo 14\t") == linediff.fingerprint("Artículo 14")
+    # ingest conserva los espacios internos: una edición solo de espacios es un cambio
+    assert linediff.fingerprint("Artículo  14") != linediff.fingerprint("Artículo 14")
+
+def test_check_reforms_reports_changed_docs(tmp_path, monkeypatch):
+    for name in ("CORPUS", "BASELINE", "PROPOSED", "STATUS"):
+        (tmp_path / name).mkdir()
+        monkeypatch.setattr(check_reforms, name, tmp_path / name)
+    monkeypatch.setattr(check_reforms, "ROOT", tmp_path)
+    monkeypatch.setattr(check_reforms, "KNOWN_FULLS", ["a.txt", "b.txt", "c.txt"])
+    (tmp_path / "BASELINE" / "a.txt").write_text("Artículo 1\nUno\nArtículo 2\nDos\n", encoding="utf-8")
+    (tmp_path / "CORPUS" / "a.txt").write_text("Artículo 1\nUno\nArtículo 2\nDos reformado\n", encoding="utf-8")
+    (tmp_path / "BASELINE" / "b.txt").write_text("igual\n", encoding="utf-8")
+    (tmp_path / "CORPUS" / "b.txt").write_text("igual\n", encoding="utf-8")
+    check_reforms.main(workers=1)
+
+    report = json.loads((tmp_path / "STATUS" / "reforms_report.json").read_text(encoding="utf-8"))
+    a, b, c = report["docs"]
+    assert report["changed_count"] == 1
+    assert a["changed"] and a["similarity"] == 0.75 and not b["changed"] and not c["available"]
+    patch = (tmp_path / a["diff_path"]).read_text(encoding="utf-8")
+    assert "-Dos\n+Dos reformado" in patch
+
+def test_reform_impact_map_drives_partial_rechunk(tmp_path, monkeypatch, capsys):
+    from scripts import ingest
+    corpus, chunks = tmp_path / "corpus", tmp_path / "chunks"
+    for d in (corpus, chunks):
+        d.mkdir()
+    monkeypatch.setattr(ingest, "CORPUS_DIR", corpus)
+    monkeypatch.setattr(ingest, "CHUNKS_DIR", chunks)
+    monkeypatch.setattr(ingest, "MANIFEST", chunks / "manifest.json")
+    monkeypatch.setattr(ingest, "STAT_CACHE", chunks / ".stat_cache.json")
+    old = "".join(f"Artículo {i}. Título {i}.\n" + f"Texto del artículo {i}, párrafo único. " * 4 + "\n\n"
+                  for i in range(1, 41))
+    (corpus / "lpi.txt").write_text(old, encoding="utf-8")
+    ingest.main(workers=1)
+
+    for name in ("BASELINE", "PROPOSED", "STATUS"):
+        (tmp_path / name).mkdir()
+        monkeypatch.setattr(check_reforms, name, tmp_path / name)
+    monkeypatch.setattr(check_reforms, "ROOT", tmp_path)
+    monkeypatch.setattr(check_reforms, "CORPUS", corpus)
+    monkeypatch.setattr(check_reforms, "CHUNKS", chunks / "chunks.jsonl")
+    monkeypatch.setattr(check_reforms, "STORE", chunks / "chunks.lxcs")
+    monkeypatch.setattr(check_reforms, "KNOWN_FULLS", ["lpi.txt"])
+    (tmp_path / "BASELINE" / "lpi.txt").write_text(old, encoding="utf-8")
+    new = old.replace("Texto del artículo 30,", "Texto reformado del artículo 30,")
+    new = new.replace("Artículo 31. Título 31.\n", "Artículo 30 bis. Nuevo.\nTexto nuevo.\nArtículo 31. Título 31.\n")
+    (corpus / "lpi.txt").write_text(new, encoding="utf-8")
+    check_reforms.main(workers=1)
+
+    report = json.loads((tmp_path / "STATUS" / "reforms_report.json").read_text(encoding="utf-8"))
+    doc = report["docs"][0]
+    assert doc["articles"] == ["30", "31", "30bis"]
+    before = [json.loads(l) for l in (chunks / "chunks.jsonl").read_text(encoding="utf-8").splitlines()]
+    first = before.index(next(r for r in before if r["doc_id"] == doc["affected_chunks"][0]))
+    assert first > 0 and report["affected"]["doc_ids"] == doc["affected_chunks"]
+    assert all(r["line_end"] < 30 * 2 - 1 for r in before[:first])
+
+    ingest.main(workers=1, reforms=tmp_path / "STATUS" / "reforms_report.json")
+    assert f"se conservan {first} chunks" in capsys.readouterr().out
+    partial = (chunks / "chunks.jsonl").read_bytes()
+    ingest.main(workers=1, full=True)
+    assert partial == (chunks / "chunks.jsonl").read_bytes()
+
+def test_whitespace_only_reform_is_rechunked(tmp_path, monkeypatch):
+    from scripts import ingest
+    corpus, chunks = tmp_path / "corpus", tmp_path / "chunks"
+    for d in (corpus, chunks):
+        d.mkdir()
+    monkeypatch.setattr(ingest, "CORPUS_DIR", corpus)
+    monkeypatch.setattr(ingest, "CHUNKS_DIR", chunks)
+    monkeypatch.setattr(ingest, "MANIFEST", chunks / "manifest.json")
+    monkeypatch.setattr(ingest, "STAT_CACHE", chunks / ".stat_cache.json")
+    old = "".join(f"Artículo {i}. Título {i}.\n" + f"Texto del artículo {i}, párrafo único. " * 4 + "\n\n"
+                  for i in range(1, 41))
+    (corpus / "lpi.txt").write_text(old, encoding="utf-8")
+    ingest.main(workers=1)
+
+    for name in ("BASELINE", "PROPOSED", "STATUS"):
+        (tmp_path / name).mkdir()
+        monkeypatch.setattr(check_reforms, name, tmp_path / name)
+    monkeypatch.setattr(check_reforms, "ROOT", tmp_path)
+    monkeypatch.setattr(check_reforms, "CORPUS", corpus)
+    monkeypatch.setattr(check_reforms, "CHUNKS", chunks / "chunks.jsonl")
+    monkeypatch.setattr(check_reforms, "STORE", chunks / "chunks.lxcs")
+    monkeypatch.setattr(check_reforms, "KNOWN_FULLS", ["lpi.txt"])
+    (tmp_path / "BASELINE" / "lpi.txt").write_text(old, encoding="utf-8")
+    (corpus / "lpi.txt").write_text(old.replace("Texto del artículo 30,", "Texto del  artículo 30,"), encoding="utf-8")
+    check_reforms.main(workers=1)
+
+    doc = json.loads((tmp_path / "STATUS" / "reforms_report.json").read_text(encoding="utf-8"))["docs"][0]
+    assert doc["changes"] and "30" in doc["articles"] and doc["affected_chunks"]
+    ingest.main(workers=1, reforms=tmp_path / "STATUS" / "reforms_report.json")
+    partial = (chunks / "chunks.jsonl").read_bytes()
+    assert "del  artículo 30".encode("utf-8") in partial
+    ingest.main(workers=1, full=True)
+    assert partial == (chunks / "chunks.jsonl").read_bytes()
@@ -0,0 +1,51 @@
+import json
+
+from lex_domus.chunk_store import ChunkStore, load_store, write_store
+from lex_domus.index import file_sha256
+
+RECORDS = [
+    {"doc_id": "lpi#c000", "source": "BOE", "family": "LPI", "pinpoint": True, "line_start": 1, "line_end": 9,
+     "text": "Artículo 14. Derechos morales."},
+    {"doc_id": "berne#c000", "source": "WIPO/OMPI", "family": "BERNE", "nota": [1, 2], "text": "Article 6bis"},
+    {"doc_id": "x#c000", "text": "Sin metadatos."},
+]
+
+
+def test_chunk_store_roundtrip_lookup_and_counts(tmp_path):
+    chunks = tmp_path / "chunks.jsonl"
+    chunks.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in RECORDS), encoding="utf-8")
+    path = tmp_path / "chunks.lxcs"
+    sha = file_sha256(chunks)
+    write_store(RECORDS, path, corpus_sha=sha, chunks_size=chunks.stat().st_size)
+    store = load_store(path, chunks)
+    assert store is not None and len(store) == 3 and store.corpus_sha == sha
+    assert list(store) == RECORDS
+    assert store.row_of("berne#c000") == 1 and store.row_of("nada#c000") is None
+    assert store.by_doc_id("lpi#c000")["line_start"] == 1 and store.value("family", 2) is None
+    assert store.value_counts("family", missing="GEN") == {"LPI": 1, "BERNE": 1, "GEN": 1}
+    out = tmp_path / "export.jsonl"
+    store.export_jsonl(out)
+    assert out.read_bytes() == chunks.read_bytes()
+    # chunks.jsonl cambiado después, aunque tenga el mismo tamaño: el almacén no vale
+    text = chunks.read_text(encoding="utf-8")
+    chunks.write_text(text.replace("Derechos morales", "Derechos MORALES"), encoding="utf-8")
+    assert chunks.stat().st_size == len(text.encode("utf-8")) and load_store(path, chunks) is None
+    chunks.write_text("{}\n", encoding="utf-8")
+    assert load_store(path, chunks) is None and len(ChunkStore.open(path)) == 3
+
+
+def test_chunk_table_rows_behave_like_records():
+    from lex_domus.chunk_table import ChunkTable
+    from lex_domus.index import InvertedIndex
+    from lex_domus.retriever import _citation
+    table = ChunkTable.from_records(RECORDS)
+    assert list(table) == RECORDS and [r.to_dict() for r in table] == RECORDS
+    row = table[1]
+    assert row["family"] == "BERNE" and row.get("line_start") is None and "line_start" not in row
+    assert row["nota"] == [1, 2] and list(row) == ["doc_id", "source", "family", "nota", "text"]
+    # mismo valor categórico: misma cadena internada, un código por fila
+    assert ChunkTable.from_records(RECORDS * 2)[3]["source"] is table[0]["source"]
+    idx = InvertedIndex.from_records(RECORDS)
+    assert isinstance(idx.records, ChunkTable) and idx.doc_id(2) == "x#c000"
+    cit = _citation(idx.record(0))
+    assert type(cit["meta"]) is dict and cit["meta"]["family"] == "LPI" and cit["text"].startswith("Artículo 14")
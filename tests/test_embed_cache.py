@@ -0,0 +1,26 @@
+import numpy as np
+
+from lex_domus.embed_cache import EmbeddingCache, text_key
+
+
+def test_embedding_cache_encodes_only_unseen_texts(tmp_path):
+    calls = []
+    def encode(batch):
+        calls.append(list(batch))
+        return np.array([[len(t), 1.0] for t in batch], dtype=np.float32)
+
+    texts = ["Artículo 14.", "Derechos  morales", "Plazo de protección."]
+    with EmbeddingCache(tmp_path / "cache.sqlite", "m1") as cache:
+        X, st = cache.encode(texts, encode, batch_size=2)
+    assert [len(b) for b in calls] == [2, 1] and st["hits"] == 0 and X.shape == (3, 2)
+
+    calls.clear()
+    with EmbeddingCache(tmp_path / "cache.sqlite", "m1") as cache:
+        Y, st = cache.encode(texts[::-1] + ["Derechos morales", "Nuevo"], encode)
+    assert calls == [["Nuevo"]]
+    assert (st["hits"], st["misses"], st["hit_rate"]) == (4, 1, 0.8)
+    assert np.array_equal(Y[:3], X[::-1]) and np.array_equal(Y[3], X[1])
+    assert text_key("a  b\n") == text_key("a b")
+    # otro modelo: otra clave
+    with EmbeddingCache(tmp_path / "cache.sqlite", "m2") as cache:
+        assert len(cache) == 0
@@ -0,0 +1,62 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts import fetch_corpus
+
+PAGES = {"/lpi": "<html><body><p>Artículo 14</p><script>x</script></body></html>"}
+
+class _Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        if self.path not in PAGES:
+            self.send_error(404)
+            return
+        body = PAGES[self.path].encode("utf-8")
+        etag = f'"{hash(body) & 0xFFFF:x}"'
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_conditional_fetch_skips_parsing_on_304(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    sources = [("lpi.txt", url + "/lpi"), ("missing.txt", url + "/nope")]
+    cache = tmp_path / "fetch_cache.json"
+    parsed = []
+    real = fetch_corpus.clean_text
+    monkeypatch.setattr(fetch_corpus, "clean_text", lambda html: parsed.append(1) or real(html))
+    try:
+        first = fetch_corpus.fetch_all(sources, out_dir=tmp_path, cache_path=cache, workers=2)
+        assert first == {"lpi.txt": "updated", "missing.txt": "error"}
+        assert (tmp_path / "lpi.txt").read_text(encoding="utf-8") == "Artículo 14"
+
+        second = fetch_corpus.fetch_all(sources, out_dir=tmp_path, cache_path=cache, workers=2)
+        assert second["lpi.txt"] == "unchanged" and len(parsed) == 1
+        assert [h for p, h in _Handler.requests if p == "/lpi"][-1] is not None
+
+        (tmp_path / "lpi.txt").write_text("Artí", encoding="utf-8")  # truncado localmente: se restaura
+        restored = fetch_corpus.fetch_all(sources, out_dir=tmp_path, cache_path=cache, workers=2)
+        assert restored["lpi.txt"] == "updated" and [h for p, h in _Handler.requests if p == "/lpi"][-1] is None
+        assert (tmp_path / "lpi.txt").read_text(encoding="utf-8") == "Artículo 14"
+
+        PAGES["/lpi"] = "<p>Artículo 14 reformado</p>"
+        third = fetch_corpus.fetch_all(sources, out_dir=tmp_path, cache_path=cache, workers=2)
+        assert third["lpi.txt"] == "updated"
+        assert (tmp_path / "lpi.txt").read_text(encoding="utf-8") == "Artículo 14 reformado"
+    finally:
+        server.shutdown()
+        PAGES["/lpi"] = "<html><body><p>Artículo 14</p><script>x</script></body></html>"
@@ -0,0 +1,148 @@
+import json, os
+from pathlib import Path
+
+from scripts import ingest
+
+def _run(tmp_path, monkeypatch, **kwargs):
+    monkeypatch.setattr(ingest, "CHUNKS_DIR", tmp_path / "chunks")
+    monkeypatch.setattr(ingest, "MANIFEST", tmp_path / "chunks" / "manifest.json")
+    monkeypatch.setattr(ingest, "STAT_CACHE", tmp_path / "chunks" / ".stat_cache.json")
+    ingest.main(**kwargs)
+    out = (tmp_path / "chunks" / "chunks.jsonl").read_text(encoding="utf-8")
+    return [json.loads(l) for l in out.splitlines()]
+
+def test_incremental_ingest_rechunks_only_changed_files(tmp_path, monkeypatch):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (tmp_path / "chunks").mkdir()
+    monkeypatch.setattr(ingest, "CORPUS_DIR", corpus)
+    (corpus / "a_lpi.txt").write_text("Artículo 14. Derechos morales.\nEl autor...\n", encoding="utf-8")
+    (corpus / "b_berne.txt").write_text("Article 6\nbis\nMoral Rights\n", encoding="utf-8")
+    (corpus / "c_usc_17.txt").write_text("§106\nExclusive rights\n", encoding="utf-8")
+    first = _run(tmp_path, monkeypatch)
+
+    calls = []
+    real = ingest.ingest_file
+    monkeypatch.setattr(ingest, "ingest_file", lambda job: calls.append(Path(job[0]).name) or real(job))
+    (corpus / "b_berne.txt").write_text("Article 6\nbis\nMoral Rights, reformed\n", encoding="utf-8")
+    (corpus / "c_usc_17.txt").unlink()
+    (corpus / "d_infosoc.txt").write_text("Article 2\nReproduction right\n", encoding="utf-8")
+    second = _run(tmp_path, monkeypatch, workers=1)
+
+    assert calls == ["b_berne.txt", "d_infosoc.txt"]
+    assert second[0] == first[0]
+    assert [r["doc_id"] for r in second] == ["a_lpi#c000", "b_berne#c000", "d_infosoc#c000"]
+    assert second == _run(tmp_path, monkeypatch, full=True)
+    refs = json.loads((tmp_path / "chunks" / "refs.json").read_text(encoding="utf-8"))["refs"]
+    assert set(refs) == {"LPI", "BERNE", "INFOSOC"} and "106" not in json.dumps(refs)
+
+def test_noop_ingest_leaves_manifest_untouched(tmp_path, monkeypatch):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (tmp_path / "chunks").mkdir()
+    monkeypatch.setattr(ingest, "CORPUS_DIR", corpus)
+    (corpus / "a_lpi.txt").write_text("Artículo 14. Derechos morales.\nEl autor...\n", encoding="utf-8")
+    _run(tmp_path, monkeypatch)
+    manifest = tmp_path / "chunks" / "manifest.json"
+    before = (manifest.read_bytes(), manifest.stat().st_mtime_ns)
+    assert "mtime_ns" not in before[0].decode("utf-8") and "size" not in json.loads(before[0])["files"]["a_lpi.txt"]
+
+    # un clon nuevo (mtime distinto, sin caché local) relee y no reescribe nada
+    (tmp_path / "chunks" / ".stat_cache.json").unlink()
+    os.utime(corpus / "a_lpi.txt", ns=(1, 1))
+    _run(tmp_path, monkeypatch)
+    assert (manifest.read_bytes(), manifest.stat().st_mtime_ns) == before
+    cached = json.loads((tmp_path / "chunks" / ".stat_cache.json").read_text(encoding="utf-8"))["files"]
+    assert cached["a_lpi.txt"]["mtime_ns"] == 1
+
+    # con la caché al día no se vuelve a leer el fichero
+    read = []
+    real_sha = ingest.file_sha256
+    monkeypatch.setattr(ingest, "file_sha256", lambda p: read.append(p.name) or real_sha(p))
+    _run(tmp_path, monkeypatch)
+    assert (manifest.read_bytes(), manifest.stat().st_mtime_ns) == before
+    assert "a_lpi.txt" not in read
+
+def test_parallel_ingest_is_deterministic(tmp_path, monkeypatch):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (tmp_path / "chunks").mkdir()
+    monkeypatch.setattr(ingest, "CORPUS_DIR", corpus)
+    for i in range(5):
+        body = "\r\n".join(f"Artículo {n}. Texto {i}-{n} " + "x" * 300 for n in range(1, 12))
+        (corpus / f"f{i}_lpi.txt").write_text(body, encoding="utf-8")
+    serial = _run(tmp_path, monkeypatch, full=True, workers=1)
+    refs = (tmp_path / "chunks" / "refs.json").read_text(encoding="utf-8")
+    assert _run(tmp_path, monkeypatch, full=True, workers=3) == serial
+    assert (tmp_path / "chunks" / "refs.json").read_text(encoding="utf-8") == refs
+    assert [r["doc_id"] for r in serial[:2]] == ["f0_lpi#c000", "f0_lpi#c001"]
+    assert serial[0]["line_start"] == 1 and serial[0]["text"].startswith("Artículo 1.")
+
+def test_near_duplicate_chunks_collapse_to_canonical(tmp_path, monkeypatch):
+    from lex_domus.index import InvertedIndex
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (tmp_path / "chunks").mkdir()
+    monkeypatch.setattr(ingest, "CORPUS_DIR", corpus)
+    article = "Artículo 14. Contenido y características del derecho moral.\nCorresponden al autor los siguientes derechos irrenunciables e inalienables."
+    (corpus / "a_lpi_full.txt").write_text("Preámbulo de la ley.\n" + "x " * 600 + "\n" + article + "\n", encoding="utf-8")
+    (corpus / "b_lpi_excerpt.txt").write_text(article.replace("siguientes", "siguientes,") + "\n", encoding="utf-8")
+    recs = _run(tmp_path, monkeypatch, full=True, workers=1)
+    by_id = {r["doc_id"]: r for r in recs}
+    assert by_id["b_lpi_excerpt#c000"]["dup_of"] == "a_lpi_full#c001"
+    assert by_id["a_lpi_full#c001"]["aliases"] == ["b_lpi_excerpt#c000"]
+    assert list(by_id["a_lpi_full#c001"])[-1] == "text"
+    man = json.loads((tmp_path / "chunks" / "manifest.json").read_text(encoding="utf-8"))
+    assert man["dedup"]["duplicates"] == 1 and man["dedup"]["indexed"] == len(recs) - 1
+    idx = InvertedIndex.from_chunks(tmp_path / "chunks" / "chunks.jsonl")
+    assert idx.doc_index("b_lpi_excerpt#c000") is None and len(idx) == len(recs) - 1
+    refs = json.loads((tmp_path / "chunks" / "refs.json").read_text(encoding="utf-8"))["refs"]
+    assert [l["doc_id"] for l in refs["LPI"]["14"]] == ["a_lpi_full#c001"]
+
+def test_refs_only_in_alias_chunks_resolve_to_canonical(tmp_path, monkeypatch):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (tmp_path / "chunks").mkdir()
+    monkeypatch.setattr(ingest, "CORPUS_DIR", corpus)
+    body = "Corresponden al autor los derechos de reproducción, distribución, comunicación pública y transformación de su obra " * 3
+    # la versión completa no rotula el artículo; el extracto (alias suyo) sí
+    (corpus / "a_lpi_full.txt").write_text("Preámbulo.\n" + "x " * 600 + "\n17. Derecho exclusivo.\n" + body + "\n",
+                                           encoding="utf-8")
+    (corpus / "b_lpi_excerpt.txt").write_text("Artículo 17. Derecho exclusivo.\n" + body + "\n", encoding="utf-8")
+    recs = _run(tmp_path, monkeypatch, full=True, workers=1)
+    canon = {r["doc_id"]: r for r in recs}["b_lpi_excerpt#c000"]["dup_of"]
+    refs = json.loads((tmp_path / "chunks" / "refs.json").read_text(encoding="utf-8"))["refs"]
+    rec = {r["doc_id"]: r for r in recs}[canon]
+    assert refs["LPI"]["17"] == [{"doc_id": canon, "line_start": rec["line_start"], "line_end": rec["line_end"]}]
+
+def test_reforms_ignore_report_when_corpus_changed_afterwards(tmp_path, monkeypatch, capsys):
+    from scripts import check_reforms
+    corpus, chunks = tmp_path / "corpus", tmp_path / "chunks"
+    for d in (corpus, chunks):
+        d.mkdir()
+    monkeypatch.setattr(ingest, "CORPUS_DIR", corpus)
+    old = "".join(f"Artículo {i}. Título {i}.\n" + f"Texto del artículo {i}, párrafo único. " * 4 + "\n\n"
+                  for i in range(1, 41))
+    (corpus / "lpi.txt").write_text(old, encoding="utf-8")
+    _run(tmp_path, monkeypatch, workers=1)
+
+    for name in ("BASELINE", "PROPOSED", "STATUS"):
+        (tmp_path / name).mkdir()
+        monkeypatch.setattr(check_reforms, name, tmp_path / name)
+    monkeypatch.setattr(check_reforms, "ROOT", tmp_path)
+    monkeypatch.setattr(check_reforms, "CORPUS", corpus)
+    monkeypatch.setattr(check_reforms, "CHUNKS", chunks / "chunks.jsonl")
+    monkeypatch.setattr(check_reforms, "STORE", chunks / "chunks.lxcs")
+    monkeypatch.setattr(check_reforms, "KNOWN_FULLS", ["lpi.txt"])
+    (tmp_path / "BASELINE" / "lpi.txt").write_text(old, encoding="utf-8")
+    new = old.replace("Texto del artículo 30,", "Texto reformado del artículo 30,")
+    (corpus / "lpi.txt").write_text(new, encoding="utf-8")
+    check_reforms.main(workers=1)
+
+    # el corpus vuelve a cambiar (p. ej. fetch_corpus) antes de ingest --reforms, por encima del tramo afectado
+    (corpus / "lpi.txt").write_text(new.replace("Texto del artículo 2,", "Texto CAMBIADO del artículo 2,"),
+                                    encoding="utf-8")
+    partial = _run(tmp_path, monkeypatch, workers=1, reforms=tmp_path / "STATUS" / "reforms_report.json")
+    assert "se re-trocea completo" in capsys.readouterr().out
+    assert any("CAMBIADO" in r["text"] for r in partial)
+    assert partial == _run(tmp_path, monkeypatch, workers=1, full=True)
@@ -0,0 +1,148 @@
+from app import pipeline
+
+def test_engine_resolves_stages_once_and_reloads_policy_on_change(tmp_path, monkeypatch):
+    policy = tmp_path / "policy.yaml"
+    policy.write_text("sources:\n  allowed: [BOE]\n", encoding="utf-8")
+    monkeypatch.setattr(pipeline, "POLICY_PATH", policy)
+    engine = pipeline.AnalysisEngine()
+    reads = []
+    monkeypatch.setattr(engine, "load_policy", lambda: reads.append(1) or pipeline._safe_load_policy())
+
+    first = engine.analyze("El autor cede sus derechos de reproducción.", "ES")
+    engine.analyze("Las partes acuerdan cooperar de buena fe.", "ES")
+    assert len(reads) == 1 and engine.policy["sources"]["allowed"] == ["BOE"]
+    assert first["per_node"] and first["gate"]["status"] in ("OK", "NO_EVIDENCE")
+
+    policy.write_text("sources:\n  allowed: [BOE, WIPO]\n", encoding="utf-8")
+    assert engine.policy["sources"]["allowed"] == ["BOE", "WIPO"] and len(reads) == 2
+    assert pipeline.get_engine() is pipeline.get_engine()
+
+def test_stage_adapters_bind_once_and_count_failures():
+    from app.stages import StageAdapter
+
+    calls = []
+    def score_eee(analysis):
+        calls.append(analysis)
+        raise ValueError("boom")
+    eee = StageAdapter("eee", score_eee, pipeline.SHAPES["eee"], pipeline._safe_eee, pipeline._normalize_eee)
+    assert eee.selected.endswith("score_eee(analysis)")
+    assert eee(per_node=[], flags=[], gate={}, analysis={"flags": []}) == {"T": 0.0, "J": 0.0, "P": 0.0}
+    assert calls == [{"flags": []}]
+    assert eee.info()["errors"] == 1 and eee.info()["last_error"] == "ValueError: boom"
+
+    # un parámetro llamado "jurisdiction" no recibe las flags aunque la aridad encaje
+    alt = StageAdapter("alternative", lambda clause, jurisdiction: jurisdiction,
+                       pipeline.SHAPES["alternative"], pipeline._safe_propose_alt)
+    assert alt(clause="c", jurisdiction="ES", flags=["x"]) == "ES"
+    log = StageAdapter("log", lambda path, record, prev_hash: 1, pipeline.SHAPES["log"], pipeline._no_log)
+    assert log.selected.startswith("fallback") and log(clause="c", jurisdiction="ES", result={}) is None
+
+def test_node_retrieval_runs_concurrently_in_node_order():
+    import time
+    from app.stages import StageAdapter
+
+    def sra(question, jurisdiction=None, policy=None):
+        time.sleep(0.2)
+        hit = "[Texto de la cláusula]" in question or not question.startswith("sin")
+        return {"status": "OK" if hit else "NO_EVIDENCE", "citations": [{"text": question, "meta": {}}] if hit else []}
+
+    engine = pipeline.AnalysisEngine(node_workers=4)
+    nodes = [{"question": q} for q in ("q1", "sin citas", "q3", "q4")]
+    engine.stages["inquiry"] = StageAdapter("inquiry", lambda clause, jurisdiction: nodes,
+                                            pipeline.SHAPES["inquiry"], pipeline._default_nodes)
+    engine.stages["sra_many"] = StageAdapter("sra_many", None, pipeline.SHAPES["sra_many"], pipeline._none)
+    engine.stages["sra"] = StageAdapter("sra", sra, pipeline.SHAPES["sra"], pipeline._none,
+                                        pipeline._normalize_retrieval)
+    t0 = time.perf_counter()
+    res = engine.analyze("Cláusula de prueba", "ES")
+    assert time.perf_counter() - t0 < 0.6  # secuencial: 5 consultas x 0.2 s
+    used = [it["used_query"] for it in res["per_node"]]
+    assert used[0] == "q1" and used[2:] == ["q3", "q4"]
+    assert used[1].startswith("sin citas\n\n[Texto de la cláusula]")
+    assert all(it["retrieval"]["status"] == "OK" for it in res["per_node"])
+
+
+def test_precomputed_evidence_skips_retrieval_until_stale(tmp_path):
+    import json
+    from app.stages import StageAdapter
+    from lex_domus.evidence import EVIDENCE_SCHEMA, fingerprint, refs_sha
+
+    calls = []
+    def pinpoint(ref, jurisdiction=None, policy=None):
+        calls.append(ref)
+        return {"status": "OK", "citations": [{"text": "vivo", "meta": {}}]}
+
+    engine = pipeline.AnalysisEngine(node_workers=1)
+    nodes = [{"pregunta": "¿Derechos morales?", "encaje_ref": "LPI art. 14"}]
+    engine.stages["inquiry"] = StageAdapter("inquiry", lambda clause, jurisdiction: nodes,
+                                            pipeline.SHAPES["inquiry"], pipeline._default_nodes)
+    engine.stages["pinpoint"] = StageAdapter("pinpoint", pinpoint, pipeline.SHAPES["pinpoint"], pipeline._none,
+                                             pipeline._normalize_retrieval)
+    engine.templates_sha, engine.corpus_version = "t1", lambda: "c1"
+    engine.evidence_path = tmp_path / "node_evidence.json"
+    engine.refs_path = tmp_path / "refs.json"
+    engine.refs_path.write_text('{"schema": 1, "refs": {}}', encoding="utf-8")
+    pre = {"status": "OK", "citations": [{"text": "precalculada", "meta": {}}]}
+    engine.evidence_path.write_text(json.dumps({
+        "schema": EVIDENCE_SCHEMA, **fingerprint("c1", "t1", engine.policy, refs_sha(engine.refs_path)),
+        "jurisdictions": {"ES": {"questions": {}, "refs": {"LPI art. 14": pre}}},
+    }), encoding="utf-8")
+
+    res = engine.analyze("Cláusula de prueba", "ES")
+    assert res["per_node"][0]["retrieval"] == pre and not calls
+    assert engine.stage_info()["evidence"]["hits"] == 1
+    res["per_node"][0]["retrieval"]["citations"].clear()  # lo servido es una copia
+    assert engine.analyze("Cláusula de prueba", "ES")["per_node"][0]["retrieval"] == pre
+
+    engine.corpus_version = lambda: "c2"  # corpus reconstruido: la tabla ya no vale
+    res = engine.analyze("Cláusula de prueba", "ES")
+    assert res["per_node"][0]["retrieval"]["citations"][0]["text"] == "vivo" and calls == ["LPI art. 14"]
+    assert engine.stage_info()["evidence"]["valid"] is False
+
+    engine.corpus_version = lambda: "c1"  # mismo corpus, pero refs.json (pinpoints) regenerado
+    assert engine.stage_info()["evidence"]["valid"] is True
+    engine.refs_path.write_text('{"schema": 1, "refs": {"LPI": {}}}', encoding="utf-8")
+    engine.analyze("Cláusula de prueba", "ES")
+    assert calls == ["LPI art. 14"] * 2 and engine.stage_info()["evidence"]["valid"] is False
+
+
+def test_evidence_rebuilds_when_refs_or_index_version_change(tmp_path, monkeypatch):
+    from lex_domus import evidence
+
+    path, refs = tmp_path / "node_evidence.json", tmp_path / "refs.json"
+    refs.write_text('{"schema": 1, "refs": {}}', encoding="utf-8")
+    build = lambda: evidence.build_evidence({}, "c1", "t1", {}, path=path, refs_path=refs)["rebuilt"]
+    assert build() is True and build() is False
+    refs.write_text('{"schema": 1, "refs": {"LPI": {}}}', encoding="utf-8")
+    assert build() is True and build() is False
+    monkeypatch.setattr(evidence, "INDEX_VERSION", evidence.INDEX_VERSION + "|otro")
+    assert build() is True
+
+
+def test_result_cache_tiers_and_invalidation(tmp_path):
+    from app.result_cache import ResultCache
+
+    db = tmp_path / "results.sqlite"
+    engine = pipeline.AnalysisEngine(node_workers=1, result_cache=ResultCache(8, db))
+    engine.corpus_version = lambda: "c1"
+    clause = "El autor cede   todos los derechos de explotación."
+
+    first = engine.analyze(clause, "ES")
+    assert first["cache"]["status"] == "miss"
+    first["flags"].append("mutado")  # lo cacheado no comparte objetos con la respuesta
+    again = engine.analyze(clause.replace("   ", " "), "ES")
+    assert again["cache"] == {"status": "hit", "tier": "memory", "key": first["cache"]["key"]}
+    assert "mutado" not in again["flags"]
+
+    other = pipeline.AnalysisEngine(node_workers=1, result_cache=ResultCache(8, db))
+    other.corpus_version = lambda: "c1"
+    assert other.analyze(clause, "ES")["cache"]["tier"] == "disk"
+
+    other.corpus_version = lambda: "c2"  # corpus reconstruido: nada de lo anterior se sirve
+    assert other.analyze(clause, "ES")["cache"]["status"] == "miss"
+    assert other.stage_info()["result_cache"]["disk_versions"] == 2  # la vieja caduca por TTL/LRU
+    other.corpus_version = lambda: "c1"
+    other.refs_path = tmp_path / "refs.json"  # refs.json regenerado con el mismo corpus
+    other.refs_path.write_text('{"schema": 1, "refs": {}}', encoding="utf-8")
+    assert other.analyze(clause, "ES")["cache"]["status"] == "miss"
+    assert pipeline.AnalysisEngine(node_workers=1).analyze(clause, "ES")["cache"] == {"status": "off"}
@@ -0,0 +1,36 @@
+from lex_domus.refs import RefIndex, find_articles, parse_refs
+from lex_domus.retriever import pinpoint_candidates
+
+def test_parse_refs_expands_ranges_and_aliases():
+    assert parse_refs("LPI art. 17-19; Berna art. 6bis") == [
+        ("LPI", "17"), ("LPI", "18"), ("LPI", "19"), ("BERNE", "6bis"),
+    ]
+    assert parse_refs("17 USC §106; InfoSoc arts. 2 y 3; Foo art. 1") == [
+        ("USC17", "106"), ("INFOSOC", "2"), ("INFOSOC", "3"),
+    ]
+
+def test_find_articles_skips_toc_entries_and_joins_suffix_line():
+    lines = ["Artículo 14", "Artículo 15", "Índice", "Artículo 14. Derecho moral.", "Texto.",
+             "Article 6", "bis", "Moral Rights", "§106", "Exclusive rights"]
+    assert find_articles(lines) == [("15", 2, 3), ("14", 4, 5), ("6bis", 6, 8), ("106", 9, 10)]
+    idx = RefIndex({"LPI": {"14": [{"doc_id": "a#c000", "line_start": 4, "line_end": 5}]}})
+    assert idx.resolve("LPI art. 14; Berna art. 6bis") == [
+        {"family": "LPI", "article": "14", "ref_label": "LPI art. 14",
+         "doc_id": "a#c000", "line_start": 4, "line_end": 5},
+    ]
+
+def test_find_articles_prefers_article_over_toc_entry_with_summary():
+    lines = ["Article 6", "bis", "Moral Rights: 1. To claim authorship", "Article 7", "Term of Protection",
+             "Article 6", "bis", "Moral Rights", "(1) Independently of the author's economic rights,",
+             "(2) The rights granted to the author...", "Article 7", "(1) The term of protection...", "(2) ..."]
+    assert find_articles(lines) == [("6bis", 6, 10), ("7", 11, 13)]
+
+def test_pinpoint_candidates_return_article_lines():
+    cands = pinpoint_candidates("LPI art. 14; Berna art. 6bis", k=4)
+    assert cands, "falta data/docs_chunks/refs.json (scripts/ingest.py)"
+    assert {c["meta"]["ref_label"] for c in cands} == {"LPI art. 14", "Berna art. 6bis"}
+    assert all(c["meta"]["pinpoint"] and c["text"] for c in cands)
+    berne = [c for c in cands if c["meta"]["ref_label"] == "Berna art. 6bis"]
+    # el artículo, no su entrada del índice de berne_full ("Article 6 / bis / : / Moral Rights: ...")
+    assert berne and not any("bis\n:\n" in c["text"] for c in berne)
+    assert pinpoint_candidates("LPI art. 14", filters={"source": ["USC"]}) == []
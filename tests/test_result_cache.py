@@ -0,0 +1,41 @@
+import time
+
+from app.result_cache import ResultCache, clause_key
+
+
+def test_key_normalizes_clause_and_separates_context():
+    k = clause_key("Cede  los\nderechos ", "ES", "MOCK", "v1")
+    assert k == clause_key("Cede los derechos", "ES", "MOCK", "v1")
+    assert k != clause_key("Cede los derechos", "EU", "MOCK", "v1")
+    assert k != clause_key("Cede los derechos", "ES", "LLM", "v1")
+    assert k != clause_key("Cede los derechos", "ES", "MOCK", "v2")
+
+
+def test_ttl_size_limits_and_versions(tmp_path):
+    cache = ResultCache(2, tmp_path / "r.sqlite", ttl=0.2, max_rows=2)
+    for i in range(3):
+        cache.put(f"k{i}", "v1", {"i": i})
+    info = cache.info()
+    assert info["size"] == 2 and info["evictions"] == 1 and info["disk_rows"] == 2
+    assert cache.get("k0", "v1") == (None, None)  # podada de memoria y de disco
+    assert cache.get("k2", "v1") == ({"i": 2}, "memory")
+
+    time.sleep(0.25)
+    assert cache.get("k2", "v1") == (None, None) and cache.info()["expired"] >= 1
+
+    cache.put("k3", "v1", {"i": 3})
+    assert cache.get("k3", "v2") == (None, None)  # otra versión: no se sirve, pero tampoco se purga
+    assert cache.get("k3", "v1") == ({"i": 3}, "memory")
+    cache.close()
+
+
+def test_workers_on_different_versions_share_the_disk(tmp_path):
+    # despliegue escalonado: un worker con la versión vieja y otro con la nueva sobre el mismo SQLite
+    old, new = ResultCache(0, tmp_path / "r.sqlite"), ResultCache(0, tmp_path / "r.sqlite")
+    old.put("a", "v1", {"v": 1})
+    new.put("b", "v2", {"v": 2})
+    assert old.get("a", "v1") == ({"v": 1}, "disk") and new.get("b", "v2") == ({"v": 2}, "disk")
+    assert old.get("b", "v1") == (None, None)
+    assert new.info()["disk_rows"] == 2 and new.info()["disk_versions"] == 2
+    old.close()
+    new.close()
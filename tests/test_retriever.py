@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+from lex_domus.index import InvertedIndex
+from lex_domus.retriever import backend_info, retrieve_candidates, retrieve_candidates_many
+
+DOCS = [
+    {"doc_id": "a#c000", "text": "Derechos morales del autor: paternidad e integridad."},
+    {"doc_id": "b#c000", "text": "Derechos de explotación: reproducción y distribución."},
+    {"doc_id": "c#c000", "text": "Plazo de protección."},
+]
+
+def test_index_overlap_and_bm25():
+    idx = InvertedIndex.from_records(DOCS)
+    top = idx.search("derechos morales", k=2, scoring="overlap")
+    assert [d for d, _ in top] == [0, 1]
+    assert top[0][1] == 2
+    assert idx.search("derechos morales", k=1, scoring="bm25")[0][0] == 0
+    assert idx.search("inexistente", k=3) == []
+
+def test_retrieve_candidates_shape():
+    cands = retrieve_candidates("derechos morales", k=3)
+    assert len(cands) <= 3
+    assert all("text" in c and "meta" in c for c in cands)
+
+def test_backend_info_reports_latency():
+    retrieve_candidates("derechos morales", k=1)
+    info = backend_info()
+    assert info["backend"] in ("bm25", "scan")
+    assert info["queries"] >= 1 and info["query_ms"]["last"] is not None
+
+def test_score_many_matches_single_queries():
+    idx = InvertedIndex.from_records(DOCS)
+    queries = [["derechos", "morales"], ["plazo"], ["nada"]]
+    batch = idx.score_many(queries, scoring="bm25")
+    for row, q in zip(batch, queries):
+        assert list(row) == list(idx.score(q, scoring="bm25"))
+
+def test_binary_index_roundtrip(tmp_path):
+    chunks = tmp_path / "chunks.jsonl"
+    chunks.write_text("".join(json.dumps(d, ensure_ascii=False) + "\n" for d in DOCS), encoding="utf-8")
+    built = InvertedIndex.from_chunks(chunks)
+    built.save(tmp_path / "bm25.idx")
+    loaded = InvertedIndex.load(tmp_path / "bm25.idx", chunks)
+    assert loaded.search("derechos morales", k=3, scoring="bm25") == built.search("derechos morales", k=3, scoring="bm25")
+    assert loaded.record(1)["doc_id"] == "b#c000" and loaded.doc_id(2) == "c#c000"
+
+def test_retrieve_candidates_many_matches_single():
+    queries = ["¿Se respetan los derechos morales?", "plazo de protección", ""]
+    assert retrieve_candidates_many(queries, k=4) == [retrieve_candidates(q, k=4) for q in queries]
+
+def test_query_cache_hits_and_invalidates_on_rebuild(tmp_path, monkeypatch):
+    from lex_domus import retriever
+    chunks = tmp_path / "chunks.jsonl"
+    chunks.write_text("".join(json.dumps(d, ensure_ascii=False) + "\n" for d in DOCS), encoding="utf-8")
+    monkeypatch.setattr(retriever, "CHUNKS", chunks)
+    monkeypatch.setattr(retriever, "BM25_PATH", tmp_path / "bm25" / "segments.json")
+    monkeypatch.setattr(retriever, "_CACHE", retriever.QueryCache(8))
+
+    first = retrieve_candidates("derechos morales", k=2)
+    assert retrieve_candidates("Morales, derechos", k=2) == first  # mismo conjunto de términos
+    assert backend_info()["cache"]["hits"] == 1
+    info = backend_info()  # sin indices/bm25: backend "scan" con aviso explícito
+    assert info["backend"] == "scan" and "build_index.py" in info["warning"]
+
+    chunks.write_text(json.dumps({"doc_id": "z#c000", "text": "Derechos morales."}) + "\n", encoding="utf-8")
+    assert [c["text"] for c in retrieve_candidates("derechos morales", k=2)] == ["Derechos morales."]
+    assert backend_info()["cache"]["invalidations"] == 1
+
+def test_filters_apply_during_scoring_with_source_aliases():
+    docs = [
+        {"doc_id": f"blog#c{i:03d}", "source": "blogs sin revisión", "text": "derechos morales derechos morales"}
+        for i in range(8)
+    ] + [{"doc_id": "berne#c000", "source": "WIPO/OMPI", "text": "Artículo 6bis. Derechos morales."}]
+    idx = InvertedIndex.from_records(docs)
+    assert 8 not in [d for d, _ in idx.search("derechos morales", k=6, scoring="bm25")]
+    top = idx.search("derechos morales", k=6, scoring="bm25", filters={"source": ["BOE", "WIPO"]})
+    assert [d for d, _ in top] == [8]
+    # sin valor en el campo filtrado: no se excluye
+    assert idx.search("derechos morales", k=6, filters={"family": ["LPI"]}) == idx.search("derechos morales", k=6)
+
+
+def test_analyzer_folds_accents_drops_stopwords_and_stems():
+    from lex_domus.analyzer import analyze
+    assert analyze("La cesión de los derechos") == analyze("cesiones derecho")
+    assert analyze("the rights of the author") == ["right", "author"]
+    assert analyze("Berna art. 6bis") == ["bern", "art", "6bis"]
+    idx = InvertedIndex.from_records(DOCS)
+    assert idx.vocab.get("de") is None
+    assert [d for d, _ in idx.search("derecho moral", k=1)] == [0]
+
+
+def test_phrase_and_proximity_boosts_use_positions(tmp_path):
+    docs = [
+        {"doc_id": "x#c000", "text": "Obras del autor en cualquier soporte, conocido o futuro."},
+        {"doc_id": "y#c000", "text": "Cesión en cualquier soporte conocido o por conocerse."},
+    ]
+    idx = InvertedIndex.from_records(docs)
+    plain = idx.score(idx.terms("soporte conocido conocerse"), scoring="bm25")
+    exact = idx.search('"cualquier soporte conocido o por conocerse"', k=2, scoring="bm25")
+    assert [d for d, _ in exact] == [1, 0]
+    assert [sc for _, sc in exact] == pytest.approx([2 * plain[1], plain[0]])
+    assert list(idx.phrase_match(idx.parse('"conocido soporte"')[1][0])[0]) == []
+    assert list(idx.phrase_match(idx.parse('"conocido soporte"~2')[1][0])[0]) == [0, 1]
+    chunks = tmp_path / "chunks.jsonl"
+    chunks.write_text("".join(json.dumps(d, ensure_ascii=False) + "\n" for d in docs), encoding="utf-8")
+    InvertedIndex.from_chunks(chunks).save(tmp_path / "bm25.idx")
+    loaded = InvertedIndex.load(tmp_path / "bm25.idx", chunks)
+    assert loaded.search('"soporte conocido"~1', k=2, scoring="bm25") == idx.search('"soporte conocido"~1', k=2, scoring="bm25")
+
+
+def test_segment_update_matches_full_build(tmp_path):
+    from lex_domus.segments import SegmentedIndex, update_segments
+    chunks, root = tmp_path / "chunks.jsonl", tmp_path / "bm25"
+    def write(docs):
+        chunks.write_text("".join(json.dumps(d, ensure_ascii=False) + "\n" for d in docs), encoding="utf-8")
+    write(DOCS)
+    assert update_segments(chunks, root)["added"] == 3
+    # reforma: cambia un chunk, desaparece otro y llega uno nuevo -> segmento pequeño + tombstones
+    docs = [dict(DOCS[0], text="Derechos morales: paternidad."), DOCS[1],
+            {"doc_id": "d#c000", "text": "Derechos morales del artista intérprete."}]
+    write(docs)
+    st = update_segments(chunks, root, merge=False)
+    assert (st["added"], st["deleted"], st["segments"]) == (2, 2, 2)
+    seg, full = SegmentedIndex.load(root, chunks), InvertedIndex.from_chunks(chunks)
+    for q in ("derechos morales", "plazo", '"derechos morales"'):
+        got = [(seg.doc_id(d), s) for d, s in seg.search(q, k=4, scoring="bm25")]
+        assert got == [(full.doc_id(d), pytest.approx(s)) for d, s in full.search(q, k=4, scoring="bm25")]
+    assert seg.doc_index("c#c000") is None and len(seg) == 3
+    # los segmentos no guardan registros: se leen del chunks.jsonl vigente aunque se hayan desplazado
+    assert [seg.record(seg.doc_index(d["doc_id"])) for d in docs] == docs
+    assert update_segments(chunks, root, merge=True)["segments"] == 1
+    assert sorted(p.name for p in root.glob("seg_*.idx")) == ["seg_000003.idx"]
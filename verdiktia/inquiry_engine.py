@@ -1,5 +1,6 @@
 from dataclasses import dataclass, asdict
 from typing import List, Dict
+import hashlib, json
 
 @dataclass
 class InquiryNode:
@@ -9,22 +10,37 @@ class InquiryNode:
     evidencias_requeridas: List[str]
     alternativa: str
 
+# Jurisdicciones que admite el análisis (las de la UI/API)
+JURISDICTIONS = ("ES", "EU", "US", "INT")
+
+# Plantilla fija de nodos: sus preguntas y referencias no dependen de la cláusula,
+# así que scripts/build_index.py precalcula su evidencia (lex_domus.evidence)
+TEMPLATES = [
+    InquiryNode(
+        pregunta="¿Qué derechos patrimoniales se transfieren?",
+        encaje_ref="LPI art. 17-23",
+        principio="seguridad jurídica",
+        evidencias_requeridas=["Texto cláusula", "Art. concretos"],
+        alternativa="Licencia no exclusiva limitada a soportes listados"
+    ),
+    InquiryNode(
+        pregunta="¿Se respetan los derechos morales?",
+        encaje_ref="LPI art. 14; Berna art. 6bis",
+        principio="favor auctoris",
+        evidencias_requeridas=["Referencia expresa a paternidad e integridad"],
+        alternativa="Prever autorización previa para modificaciones sustanciales"
+    ),
+]
+
+def template_nodes(jurisdiction: str) -> List[Dict]:
+    """Nodos de la plantilla para una jurisdicción (los que devuelve decompose_clause)."""
+    return [asdict(n) for n in TEMPLATES]
+
+def templates_sha() -> str:
+    """Huella de la plantilla: si cambia, la evidencia precalculada deja de valer."""
+    payload = json.dumps([asdict(n) for n in TEMPLATES], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 def decompose_clause(clause: str, jurisdiction: str) -> List[Dict]:
     # TODO: implementar descomposición real (plantilla mínima)
-    nodes = [
-        InquiryNode(
-            pregunta="¿Qué derechos patrimoniales se transfieren?",
-            encaje_ref="LPI art. 17-23",
-            principio="seguridad jurídica",
-            evidencias_requeridas=["Texto cláusula", "Art. concretos"],
-            alternativa="Licencia no exclusiva limitada a soportes listados"
-        ),
-        InquiryNode(
-            pregunta="¿Se respetan los derechos morales?",
-            encaje_ref="LPI art. 14; Berna art. 6bis",
-            principio="favor auctoris",
-            evidencias_requeridas=["Referencia expresa a paternidad e integridad"],
-            alternativa="Prever autorización previa para modificaciones sustanciales"
-        )
-    ]
-    return [asdict(n) for n in nodes]
+    return template_nodes(jurisdiction)